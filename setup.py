@@ -49,6 +49,8 @@ analytic tools for the results they produce.
         'console_scripts': [
             'yandex-tank = yandextank.core.cli:main',
             'tank-postloader = yandextank.plugins.DataUploader.cli:post_loader',
+            'tank-aggregate = yandextank.aggregator.cli:main',
+            'tank-stpd-convert = yandextank.stepper.cli:convert',
             'tank-docs-gen = yandextank.validator.docs_gen:main'
         ],
     },
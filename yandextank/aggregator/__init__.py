@@ -1,2 +1,3 @@
 from .chopper import TimeChopper  # noqa
 from .tank_aggregator import TankAggregator  # noqa
+from .tags import TagDictionary  # noqa
@@ -1,8 +1,19 @@
 # -*- coding: UTF-8 -*-
 import logging
+import multiprocessing
 import numpy as np
+import pandas as pd
+import queue as q
+import threading
 import time
-from collections import Counter
+from functools import reduce
+from concurrent.futures import ProcessPoolExecutor
+
+from .chopper import LATE
+from .histogram import BinLayout, DEFAULT_LAYOUT
+from .second import AggregatedSecond, TaggedView, ScalarColumn, HistogramColumn, CountColumn, SketchColumn, \
+    QuantileColumn
+from .sketch import LatencySketch, DEFAULT_ALPHA
 
 logger = logging.getLogger(__name__)
 
@@ -12,8 +23,24 @@ phout_columns = [
     'proto_code'
 ]
 
+# section of aggregator config with histogram layout, not a data column
+HISTOGRAM_SECTION = "histogram"
+# section of aggregator config with percentiles: {"default": [...], "tagged": {tag: [...]}}
+QUANTILES_SECTION = "quantiles"
+
+DEFAULT_QUANTILES = (50, 75, 80, 85, 90, 95, 98, 99, 100)
+
+# response time corrected for coordinated omission: what a request sent on schedule would wait
+CORRECTED_COLUMN = "interval_real_corrected"
+CORRECTED_AGGREGATES = ["total", "max", "min", "q", "len"]
+
+# columns computed from other columns of a chunk: {name: (columns it needs, function of chunk)}
+DERIVED_COLUMNS = {
+    CORRECTED_COLUMN: (("interval_real", "send_delay"), lambda data: data["interval_real"] + data["send_delay"]),
+}
+
 phantom_config = {
-    "interval_real": ["total", "max", "min", "hist", "q", "len"],
+    "interval_real": ["total", "max", "min", "hist", "sketch", "q", "len"],
     "connect_time": ["total", "max", "min", "len"],
     "send_time": ["total", "max", "min", "len"],
     "latency": ["total", "max", "min", "len"],
@@ -21,48 +48,56 @@ phantom_config = {
     "interval_event": ["total", "max", "min", "len"],
     "size_out": ["total", "max", "min", "len"],
     "size_in": ["total", "max", "min", "len"],
+    "send_delay": ["total", "max", "min", "len"],
     "net_code": ["count"],
     "proto_code": ["count"],
 }
 
 
+def interpolate(low, high, gamma):
+    """ linear interpolation, the same arithmetic as in np.percentile """
+    diff = high - low
+    return np.where(gamma >= 0.5, high - diff * (1 - gamma), low + diff * gamma)
+
+
+def partition_quantiles(values, percentiles):
+    """
+    np.percentile(values, percentiles) with a single partition of values
+    for all the percentiles
+
+    :param percentiles: sorted array of percentiles in range [0, 100]
+    """
+    size = len(values)
+    if not size:
+        return np.full(len(percentiles), None)
+    virtual = (size - 1) * np.true_divide(percentiles, 100)
+    previous = np.floor(virtual).astype(np.intp)
+    following = np.minimum(previous + 1, size - 1)
+    partitioned = np.partition(values, np.union1d(previous, following))
+    return interpolate(partitioned[previous], partitioned[following], virtual - previous)
+
+
 class Worker(object):
     """
     Aggregate Pandas dataframe or dict with numpy ndarrays in it
     """
 
     def __init__(self, config, verbose_histogram):
-        if verbose_histogram:
-            bins = np.linspace(0, 4990, 500)  # 10µs accuracy
-            bins = np.append(bins,
-                             np.linspace(5000, 9900, 50))  # 100µs accuracy
-            bins = np.append(bins,
-                             np.linspace(10, 499, 490) * 1000)  # 1ms accuracy
-            bins = np.append(bins,
-                             np.linspace(500, 2995, 500) * 1000)  # 5ms accuracy
-            bins = np.append(bins, np.linspace(3000, 9990, 700) * 1000)  # 10ms accuracy
-            bins = np.append(bins, np.linspace(10000, 29950, 400) * 1000)  # 50ms accuracy
-            bins = np.append(bins, np.linspace(30000, 119900, 900) * 1000)  # 100ms accuracy
-            bins = np.append(bins, np.linspace(120, 300, 181) * 1000000)  # 1s accuracy
-        else:
-            # yapf: disable
-            bins = np.array([
-                0, 1, 2, 3, 4, 5, 6, 7, 8, 9,
-                10, 20, 30, 40, 50, 60, 70, 80, 90,
-                100, 150, 200, 250, 300, 350, 400, 450,
-                500, 600, 650, 700, 750, 800, 850, 900, 950,
-                1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500,
-                5000, 5500, 6000, 6500, 7000, 7500, 8000, 8500, 9000, 9500, 10000, 11000,
-                12000, 13000, 14000, 15000, 20000, 25000, 30000, 35000, 40000, 45000, 50000,
-                55000, 60000,
-            ]) * 1000
-            # yapf: enable
-
-        self.bins = bins
-        self.percentiles = np.array([50, 75, 80, 85, 90, 95, 98, 99, 100])
+        config = dict(config)
+        layout = config.pop(HISTOGRAM_SECTION, DEFAULT_LAYOUT)
+        self.histogram = BinLayout(layout['verbose' if verbose_histogram else 'compact'])
+        self.bins = self.histogram.edges
+        quantiles = config.pop(QUANTILES_SECTION, {})
+        self.percentiles = np.array(sorted(set(quantiles.get('default', DEFAULT_QUANTILES))))
+        # tags with extra percentiles get them along with the default ones
+        self.tag_percentiles = {
+            tag: np.union1d(self.percentiles, extra) for tag, extra in quantiles.get('tagged', {}).items()
+        }
         self.config = config
+        self.sketch_alpha = DEFAULT_ALPHA
         self.aggregators = {
             "hist": self._histogram,
+            "sketch": self._sketch,
             "q": self._quantiles,
             "mean": self._mean,
             "total": self._total,
@@ -73,13 +108,17 @@ class Worker(object):
         }
 
     def _histogram(self, series):
-        data, bins = np.histogram(series, bins=self.bins)
-        mask = data > 0
+        index = self.histogram.index(series.to_numpy())
+        data = np.bincount(index[index >= 0], minlength=self.histogram.size)
+        mask = np.flatnonzero(data)
         return {
-            "data": [e.item() for e in data[mask]],
-            "bins": [e.item() for e in bins[1:][mask]],
+            "data": data[mask].tolist(),
+            "bins": self.histogram.upper_edges(mask).tolist(),
         }
 
+    def _sketch(self, series):
+        return LatencySketch.from_values(series.to_numpy(), self.sketch_alpha).to_dict()
+
     def _mean(self, series):
         return series.mean().item()
 
@@ -93,26 +132,283 @@ class Worker(object):
         return series.min().item()
 
     def _count(self, series):
-        return {str(k): v for k, v in dict(Counter(series)).items()}
+        codes, counts = np.unique(series.to_numpy(), return_counts=True)
+        return dict(zip(map(str, codes.tolist()), counts.tolist()))
 
     def _len(self, series):
         return len(series)
 
-    def _quantiles(self, series):
+    def percentiles_for(self, tag):
+        return self.tag_percentiles.get(tag, self.percentiles)
+
+    def _quantiles(self, series, tag=None):
+        percentiles = self.percentiles_for(tag)
         return {
-            "q": list(self.percentiles),
-            "value": list(np.percentile(series, self.percentiles)),
+            "q": percentiles.tolist(),
+            "value": partition_quantiles(series.to_numpy(), percentiles).tolist(),
         }
 
-    def aggregate(self, data):
+    @staticmethod
+    def column(data, key):
+        """ column of a chunk, derived columns are computed; None if the reader doesn't provide it """
+        if key in data:
+            return data[key]
+        if key in DERIVED_COLUMNS:
+            required, derive = DERIVED_COLUMNS[key]
+            if all(column in data for column in required):
+                return derive(data)
+        return None
+
+    def aggregate(self, data, tag=None):
+        columns = {key: self.column(data, key) for key in self.config}
         return {
             key: {
-                aggregate: self.aggregators.get(aggregate)(data[key])
+                aggregate: self._quantiles(series, tag) if aggregate == "q"
+                else self.aggregators.get(aggregate)(series)
                 for aggregate in self.config[key]
             }
-            for key in self.config
+            for key, series in columns.items() if series is not None
         }
 
+    def aggregate_tagged(self, data, groupby):
+        """
+        Aggregate data for every value of `groupby` column and overall
+
+        :returns: (tagged, overall)
+        """
+        tagged = {tag: self.aggregate(group, tag) for tag, group in data.groupby(groupby, observed=True)}
+        return tagged, self.aggregate(data)
+
+    def aggregate_columns(self, data, groupby):
+        """
+        Aggregate data into columns of AggregatedSecond
+
+        :returns: (tags, {column: {aggregate: values of every tag}}, overall)
+        """
+        tagged, overall = self.aggregate_tagged(data, groupby)
+        tags = list(tagged)
+        columns = {
+            key: {aggregate: [tagged[tag][key][aggregate] for tag in tags] for aggregate in self.config[key]}
+            for key in overall
+        }
+        return tags, columns, overall
+
+
+class Segments(object):
+    """
+    Rows of a column grouped into contiguous segments (one segment per tag)
+
+    :param ids: segment number for every row, non-decreasing
+    :param starts: index of the first row of every segment
+    :param counts: number of rows in every segment
+    :param tags: tag of every segment, None for rows without a tag and overall
+    """
+
+    def __init__(self, ids, starts, counts, tags=None):
+        self.ids = ids
+        self.starts = starts
+        self.counts = counts
+        self.tags = tags if tags is not None else [None] * len(starts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_codes(cls, sorted_codes):
+        if len(sorted_codes) == 0:
+            return cls.single(0)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_codes)) + 1))
+        counts = np.diff(np.append(starts, len(sorted_codes)))
+        ids = np.repeat(np.arange(len(starts)), counts)
+        return cls(ids, starts, counts)
+
+    @classmethod
+    def single(cls, size):
+        return cls(np.zeros(size, dtype=np.intp), np.array([0]), np.array([size]))
+
+    def split(self, segment_ids):
+        """ bounds of every segment in an array of sorted segment ids """
+        return np.searchsorted(segment_ids, np.arange(len(self) + 1))
+
+
+class ColumnarWorker(Worker):
+    """
+    Aggregate all tags of a dataframe at once.
+
+    Rows are sorted by tag code once, then every configured aggregate is
+    computed for all the tags in a single vectorized pass over the sorted
+    column. Result dicts are built only when the numbers are ready.
+    """
+
+    # histograms of all the tags are counted in a single dense array up to this size
+    MAX_DENSE_CELLS = 1 << 22
+    # quantiles of segments are found with a partition per segment when segments are
+    # this large on average, and with a single sort of the column otherwise
+    MIN_PARTITION_ROWS = 256
+
+    def __init__(self, config, verbose_histogram):
+        super(ColumnarWorker, self).__init__(config, verbose_histogram)
+        self.segment_aggregators = {
+            "hist": self._segments_histogram,
+            "sketch": self._segments_sketch,
+            "q": self._segments_quantiles,
+            "mean": self._segments_mean,
+            "total": self._segments_total,
+            "min": self._segments_min,
+            "max": self._segments_max,
+            "count": self._segments_count,
+            "len": self._segments_len,
+        }
+        # aggregates computed for the segments and overall in one pass
+        self.combined_aggregators = {
+            "count": self._count_with_overall,
+        }
+
+    def _segments_histogram(self, values, segments):
+        n_bins = self.histogram.size
+        idx = self.histogram.index(values)
+        valid = idx >= 0
+        cells = segments.ids[valid] * n_bins + idx[valid]
+        if len(segments) * n_bins <= self.MAX_DENSE_CELLS:
+            data = np.bincount(cells, minlength=len(segments) * n_bins)
+            cells = np.flatnonzero(data)
+            data = data[cells]
+        else:
+            cells, data = np.unique(cells, return_counts=True)
+        cell_segments = cells // n_bins
+        bins = self.histogram.upper_edges(cells % n_bins)
+        return HistogramColumn(segments.split(cell_segments), bins, data)
+
+    def _segments_sketch(self, values, segments):
+        positive = values > 0
+        zero = np.bincount(segments.ids[~positive], minlength=len(segments))
+        ids = segments.ids[positive]
+        index = LatencySketch.bucket_index(values[positive], self.sketch_alpha)
+        offset = index.min() if len(index) else 0
+        span = index.max() - offset + 1 if len(index) else 1
+        cells, data = np.unique(ids * span + (index - offset), return_counts=True)
+        cell_segments = cells // span
+        index = cells % span + offset
+        return SketchColumn(segments.split(cell_segments), self.sketch_alpha, index, data, zero)
+
+    def _segments_mean(self, values, segments):
+        return ScalarColumn(np.add.reduceat(values, segments.starts) / segments.counts)
+
+    def _segments_total(self, values, segments):
+        return ScalarColumn(np.add.reduceat(values, segments.starts))
+
+    def _segments_max(self, values, segments):
+        return ScalarColumn(np.maximum.reduceat(values, segments.starts))
+
+    def _segments_min(self, values, segments):
+        return ScalarColumn(np.minimum.reduceat(values, segments.starts))
+
+    def _segments_count(self, values, segments):
+        return self._count_with_overall(values, segments)[0]
+
+    def _count_with_overall(self, values, segments):
+        """
+        Count codes of every segment; overall counts are summed from the
+        segments, so every row is counted once.
+        """
+        low = values.min() if len(values) else 0
+        span = values.max() - low + 1 if len(values) else 1
+        if np.issubdtype(values.dtype, np.integer) and len(segments) * span <= self.MAX_DENSE_CELLS:
+            # codes are small integers: count all the segments in a dense matrix
+            matrix = np.bincount(segments.ids * span + (values - low), minlength=len(segments) * span)
+            matrix = matrix.reshape(len(segments), span)
+            rows, columns = np.nonzero(matrix)
+            counts = matrix[rows, columns]
+            codes = columns + low
+            overall_counts = matrix.sum(axis=0)
+            overall_codes = np.flatnonzero(overall_counts)
+            overall_counts = overall_counts[overall_codes]
+            overall_codes = overall_codes + low
+        else:
+            order = np.lexsort((values, segments.ids))
+            values, ids = values[order], segments.ids[order]
+            firsts = np.flatnonzero(np.concatenate(([True], (values[1:] != values[:-1]) | (ids[1:] != ids[:-1]))))
+            counts = np.diff(np.append(firsts, len(values)))
+            codes, rows = values[firsts], ids[firsts]
+            overall_codes, inverse = np.unique(codes, return_inverse=True)
+            overall_counts = np.bincount(inverse, weights=counts, minlength=len(overall_codes)).astype(np.int64)
+        tagged = CountColumn(segments.split(rows), codes, counts)
+        return tagged, dict(zip(map(str, overall_codes.tolist()), overall_counts.tolist()))
+
+    def _segments_len(self, values, segments):
+        return ScalarColumn(segments.counts)
+
+    def _segments_quantiles(self, values, segments):
+        percentiles = [self.percentiles_for(tag) for tag in segments.tags]
+        if len(values) >= self.MIN_PARTITION_ROWS * len(segments):
+            # every segment is partitioned once for all of its percentiles
+            result = [
+                partition_quantiles(values[start:start + count], segment_percentiles)
+                for start, count, segment_percentiles in zip(
+                    segments.starts.tolist(), segments.counts.tolist(), percentiles)
+            ]
+        else:
+            # many small segments: sort them all at once
+            every = reduce(np.union1d, self.tag_percentiles.values(), self.percentiles)
+            matrix = self._sorted_quantiles(values, segments, every)
+            if not self.tag_percentiles:
+                return QuantileColumn(percentiles, matrix)
+            result = [
+                row[np.searchsorted(every, segment_percentiles)]
+                for row, segment_percentiles in zip(matrix, percentiles)
+            ]
+        return QuantileColumn(percentiles, result)
+
+    @staticmethod
+    def _sorted_quantiles(values, segments, percentiles):
+        """ quantiles of all the segments with a single sort, a row per segment """
+        values = values[np.lexsort((values, segments.ids))]
+        sizes = segments.counts[:, np.newaxis]
+        virtual = (sizes - 1) * np.true_divide(percentiles, 100)
+        above = virtual >= sizes - 1
+        previous = np.where(above, sizes - 1, np.floor(virtual))
+        gamma = virtual - previous
+        previous = previous.astype(np.intp)
+        following = np.where(above, previous, previous + 1)
+        offsets = segments.starts[:, np.newaxis]
+        return interpolate(values[offsets + previous], values[offsets + following], gamma)
+
+    def aggregate_columns(self, data, groupby):
+        if isinstance(data[groupby].dtype, pd.CategoricalDtype):
+            # tags are already encoded, e.g. with a TagDictionary
+            codes = data[groupby].cat.codes.to_numpy().astype(np.intp)
+            tags = data[groupby].cat.categories
+        else:
+            codes, tags = pd.factorize(data[groupby], sort=True)
+        # rows without a tag are aggregated only into overall
+        codes[codes < 0] = len(tags)
+        order = np.argsort(codes, kind='stable')
+        segments = Segments.from_codes(codes[order])
+        segment_tags = [tags[code] for code in codes[order][segments.starts] if code < len(tags)]
+        segments.tags = segment_tags + [None] * (len(segments) - len(segment_tags))
+        overall_segment = Segments.single(len(data))
+        columns = {}
+        overall = {}
+        for key in self.config:
+            column = self.column(data, key)
+            if column is None:
+                continue
+            column = column.to_numpy()
+            sorted_column = column[order]
+            for aggregate in self.config[key]:
+                if aggregate in self.combined_aggregators:
+                    values, overall_value = self.combined_aggregators[aggregate](sorted_column, segments)
+                else:
+                    values = self.segment_aggregators.get(aggregate)(sorted_column, segments)
+                    overall_value = self.segment_aggregators.get(aggregate)(column, overall_segment)[0]
+                columns.setdefault(key, {})[aggregate] = values
+                overall.setdefault(key, {})[aggregate] = overall_value
+        return segment_tags, columns, overall
+
+    def aggregate_tagged(self, data, groupby):
+        tags, columns, overall = self.aggregate_columns(data, groupby)
+        return dict(TaggedView(tags, columns)), overall
+
 
 class DataPoller:
     def __init__(self, *, poll_period=0.5, max_wait):
@@ -128,6 +424,8 @@ class DataPoller:
 
 
 def _data_poller(source, poll_period, max_wait):
+    # sources that can wake up on new data provide their own wait(timeout)
+    wait = getattr(source, 'wait', time.sleep)
     wait_cntr_max = max_wait // poll_period or 1
     wait_counter = 0
     for chunk in source:
@@ -140,7 +438,7 @@ def _data_poller(source, poll_period, max_wait):
             logger.warning('Data poller has been receiving no data for {} seconds.\n'
                            'Closing data poller'.format(wait_cntr_max * poll_period))
             break
-        time.sleep(poll_period)
+        wait(poll_period)
 
 
 def to_utc(ts):
@@ -153,23 +451,108 @@ def to_utc(ts):
 
 
 class Aggregator(object):
-    def __init__(self, source, config, verbose_histogram):
-        self.worker = Worker(config, verbose_histogram)
+    def __init__(self, source, config, verbose_histogram, worker_class=ColumnarWorker):
+        self.worker = worker_class(config, verbose_histogram)
         self.source = source
         self.groupby = 'tag'
+        self.aggregation_time = 0.
 
     def __iter__(self):
         for ts, chunk, rps in self.source:
-            by_tag = list(chunk.groupby(self.groupby))
             start_time = time.time()
-            result = {
-                "ts": ts,
-                "tagged":
-                {tag: self.worker.aggregate(data)
-                 for tag, data in by_tag},
-                "overall": self.worker.aggregate(chunk),
-                "counted_rps": rps
-            }
-            logger.debug(
-                "Aggregation time: %.2fms", (time.time() - start_time) * 1000)
+            tags, columns, overall = self.worker.aggregate_columns(chunk, self.groupby)
+            result = AggregatedSecond(ts, tags, columns, overall, rps)
+            if chunk.attrs.get(LATE):
+                result["correction"] = True
+            self.aggregation_time = time.time() - start_time
+            logger.debug("Aggregation time: %.2fms", self.aggregation_time * 1000)
             yield result
+
+
+_process_worker = None
+
+
+def _init_process_worker(worker_class, config, verbose_histogram):
+    global _process_worker
+    _process_worker = worker_class(config, verbose_histogram)
+
+
+def _aggregate_in_process(chunk, groupby):
+    # columns are a few arrays per aggregate, they are much cheaper to pickle than dicts of every tag
+    return _process_worker.aggregate_columns(chunk, groupby)
+
+
+class ParallelAggregator(object):
+    """
+    Aggregate seconds in a pool of worker processes.
+
+    Seconds are submitted to the pool as soon as the source emits them and
+    results are yielded strictly in the order of the source, so listeners
+    get timestamps in the same order as with Aggregator. At most
+    `max_pending` seconds are in flight at a time. aggregation_time of a
+    second includes the time it waited for a free worker. An exception of the
+    source is raised to the consumer after the seconds before it.
+    """
+    # seconds between checks of the stop flag while the queue is full
+    PUT_TIMEOUT = 0.5
+
+    def __init__(self, source, config, verbose_histogram, workers, worker_class=ColumnarWorker, max_pending=None):
+        self.source = source
+        self.groupby = 'tag'
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self._initargs = (worker_class, config, verbose_histogram)
+        self.aggregation_time = 0.
+        self.feeder = None
+        self.stopped = threading.Event()
+
+    def __iter__(self):
+        pool = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_process_worker,
+            initargs=self._initargs)
+        pending = q.Queue(self.max_pending)
+        self.feeder = threading.Thread(target=self.__feed, args=(pool, pending), daemon=True)
+        self.feeder.start()
+        try:
+            for item in iter(pending.get, None):
+                if isinstance(item, Exception):
+                    raise item
+                ts, rps, late, future, submitted = item
+                tags, columns, overall = future.result()
+                self.aggregation_time = time.time() - submitted
+                logger.debug("Parallel aggregation time: %.2fms", self.aggregation_time * 1000)
+                result = AggregatedSecond(ts, tags, columns, overall, rps)
+                if late:
+                    result["correction"] = True
+                yield result
+        finally:
+            self.stopped.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """ Stop feeding seconds to the pool, the feeder thread exits """
+        self.stopped.set()
+
+    def __put(self, pending, item):
+        """ Queue item unless stopped, returns False if stopped """
+        while not self.stopped.is_set():
+            try:
+                pending.put(item, timeout=self.PUT_TIMEOUT)
+                return True
+            except q.Full:
+                pass
+        return False
+
+    def __feed(self, pool, pending):
+        try:
+            for ts, chunk, rps in self.source:
+                if not self.__put(pending, (ts, rps, chunk.attrs.get(LATE, False),
+                                            pool.submit(_aggregate_in_process, chunk, self.groupby), time.time())):
+                    return
+        except Exception as e:
+            logger.debug('Source of parallel aggregation failed', exc_info=True)
+            self.__put(pending, e)
+        else:
+            self.__put(pending, None)
@@ -0,0 +1,300 @@
+"""
+Aggregator throughput benchmark.
+
+Synthesizes a phout stream and runs it through the real pipeline
+(PhantomReader, DataPoller, TimeChopper, Aggregator, TankAggregator and a
+result listener), without a load generator. Reports rows/s, time spent in
+every stage, peak RSS and end-to-end lag, and writes them to a json file,
+so that results of different builds can be compared::
+
+    python -m yandextank.aggregator.benchmark --rps 20000 --duration 60 -o new.json --compare old.json
+
+By default the stream is replayed as fast as the pipeline takes it. With
+--realtime every second is handed to the reader when it is over, as a
+generator would write it, and the lag is measured against the wall clock.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .aggregator import DataPoller
+from .tags import TagDictionary
+from .tank_aggregator import TankAggregator
+from yandextank.common.interfaces import AggregateResultListener, StatsReader
+from yandextank.plugins.Phantom.reader import PhantomReader, bytes_to_df, string_to_df, phout_columns
+
+logger = logging.getLogger(__name__)
+
+PARSERS = {'bytes': bytes_to_df, 'string': string_to_df}
+LATENCY_DISTRIBUTIONS = ('lognormal', 'exponential')
+
+
+class PhoutGenerator(object):
+    """
+    Synthetic phout lines, second by second, ordered by response time
+
+    :param rps: responses per second
+    :param tags: number of distinct tags, tag frequencies follow Zipf's law
+    :param latency: one of LATENCY_DISTRIBUTIONS
+    :param latency_median: median response time, µs
+    :param latency_sigma: sigma of lognormal distribution
+    :param error_rate: share of responses with HTTP 500, half of them are network timeouts
+    """
+
+    def __init__(self, rps=10000, tags=10, latency='lognormal', latency_median=20000, latency_sigma=1.,
+                 error_rate=0.01, seed=0):
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError('Unknown latency distribution {}, expected one of {}'.format(
+                latency, LATENCY_DISTRIBUTIONS))
+        self.rps = rps
+        self.tags = np.array(['/api/handle{}'.format(i) for i in range(tags)])
+        weights = 1. / np.arange(1, tags + 1)
+        self.tag_weights = weights / weights.sum()
+        self.latency = latency
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rng = np.random.default_rng(seed)
+
+    def _intervals(self, size):
+        if self.latency == 'lognormal':
+            intervals = self.rng.lognormal(np.log(self.latency_median), self.latency_sigma, size)
+        else:
+            intervals = self.rng.exponential(self.latency_median / np.log(2), size)
+        return np.maximum(intervals, 1).astype(np.int64)
+
+    def second(self, ts):
+        """ phout lines of responses received during second ts """
+        size = self.rps
+        # send_ts is written with ms precision, keep responses off the borders of the second
+        receive_us = ts * 1000000 + np.sort(self.rng.integers(1000, 999000, size))
+        send_ms = (receive_us - self._intervals(size)) // 1000
+        interval_real = receive_us - send_ms * 1000
+        connect_time = interval_real // 10
+        send_time = interval_real // 100
+        receive_time = interval_real // 20
+        errors = self.rng.random(size) < self.error_rate
+        timeouts = errors & (self.rng.random(size) < 0.5)
+        frame = pd.DataFrame({
+            'send_ts': send_ms / 1000.,
+            'tag': self.rng.choice(self.tags, size, p=self.tag_weights),
+            'interval_real': interval_real,
+            'connect_time': connect_time,
+            'send_time': send_time,
+            'latency': interval_real - connect_time - send_time - receive_time,
+            'receive_time': receive_time,
+            'interval_event': interval_real,
+            'size_out': self.rng.integers(100, 1000, size),
+            'size_in': np.where(errors, 0, self.rng.integers(1000, 100000, size)),
+            'net_code': np.where(timeouts, 110, 0),
+            'proto_code': np.where(errors, np.where(timeouts, 0, 500), 200),
+        }, columns=phout_columns)
+        return frame.to_csv(sep='\t', header=False, index=False, float_format='%.3f').encode('utf-8')
+
+
+class _SyntheticPhout(object):
+    """
+    File-like object for PhantomReader. Returns one second of phout per read,
+    None at the end. In realtime mode a second is returned only after it is over.
+    """
+
+    def __init__(self, generator, start, duration, realtime=False):
+        self.generator = generator
+        self.start = start
+        self.duration = duration
+        self.realtime = realtime
+        self.seconds = [] if realtime else [generator.second(start + i) for i in range(duration)]
+        self.offered = {}
+        self.bytes = 0
+        self._next = 0
+
+    def read(self, size=None):
+        if self._next >= self.duration:
+            return None
+        ts = self.start + self._next
+        if self.realtime:
+            if time.time() < ts + 1:
+                return b''
+            data = self.generator.second(ts)
+        else:
+            data = self.seconds[self._next]
+        self.offered[ts] = time.time()
+        self.bytes += len(data)
+        self._next += 1
+        return data
+
+
+class _StatsReader(StatsReader):
+    def __init__(self, start, duration, rps):
+        self.items = [[StatsReader.stats_item(start + i, 1, rps)] for i in range(duration)]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def close(self):
+        pass
+
+
+class _Generator(object):
+    """ stands for a generator plugin in TankAggregator """
+
+    def __init__(self, reader, stats_reader):
+        self.reader = reader
+        self.stats_reader = stats_reader
+
+    def get_reader(self):
+        return self.reader
+
+    def get_stats_reader(self):
+        return self.stats_reader
+
+    def end_test(self, retcode):
+        return retcode
+
+
+class _CountingListener(AggregateResultListener):
+    def __init__(self, phout):
+        self.phout = phout
+        self.rows = 0
+        self.seconds = 0
+        self.delays = []
+
+    def on_aggregated_data(self, data, stats):
+        self.rows += data['overall']['interval_real']['len']
+        self.seconds += 1
+        # time from the moment the reader got the second to the moment listeners got it
+        self.delays.append(time.time() - self.phout.offered[data['ts']])
+
+
+def _percentiles(values):
+    if not len(values):
+        return {}
+    return dict(zip(('p50', 'p99', 'max'), np.percentile(values, [50, 99, 100]).tolist()))
+
+
+def run(generator, duration=30, workers=0, parser='bytes', realtime=False, poll_period=0.1, max_tags=0):
+    """
+    Run a synthetic stream through the pipeline
+
+    :rtype: dict
+    """
+    start = int(time.time()) + 1 if realtime else 1500000000
+    phout = _SyntheticPhout(generator, start, duration, realtime)
+    reader = PhantomReader(phout, parser=PARSERS[parser], tags=TagDictionary())
+    samples = []
+    aggregator = TankAggregator(
+        _Generator(reader, _StatsReader(start, duration, generator.rps)),
+        DataPoller(poll_period=poll_period, max_wait=max(10, 3 * poll_period)),
+        workers=workers, max_tags=max_tags, publish=lambda key, value: samples.append(value))
+    listener = _CountingListener(phout)
+    aggregator.add_result_listener(listener)
+
+    started = time.time()
+    aggregator.start_test()
+    collect_time = 0.
+    while not aggregator.is_aggr_finished():
+        collect_start = time.time()
+        aggregator.is_test_finished()
+        collect_time += time.time() - collect_start
+        time.sleep(poll_period)
+    collect_start = time.time()
+    aggregator.end_test(0)
+    collect_time += time.time() - collect_start
+    elapsed = time.time() - started
+
+    rusage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rusage = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    lags = [sample['lag'] for sample in samples]
+    return {
+        "rows": listener.rows,
+        "seconds": listener.seconds,
+        "bytes": phout.bytes,
+        "elapsed": elapsed,
+        "rows_per_second": listener.rows / elapsed if elapsed else 0.,
+        "stages": {
+            "parse": sum(sample['reader']['parse_time'] for sample in samples),
+            "aggregation": sum(sample['aggregation_time'] or 0 for sample in samples),
+            "collect": collect_time,
+            "listeners": sum(sum(sample['listeners'].values()) for sample in samples),
+        },
+        "chopper_emit_lag": _percentiles([sample['chopper']['emit_lag'] for sample in samples]),
+        "pipeline_delay": _percentiles(listener.delays),
+        # wall clock minus ts of the second, only makes sense in realtime
+        "lag": _percentiles(lags) if realtime else {},
+        # kilobytes on Linux
+        "peak_rss_kb": rusage,
+        "peak_children_rss_kb": children_rusage,
+    }
+
+
+def compare(result, baseline):
+    """ relative change of the main figures, >0 means the new build is better """
+    new, old = result['results'], baseline['results']
+    report = {"rows_per_second": new['rows_per_second'] / old['rows_per_second'] - 1
+              if old['rows_per_second'] else None}
+    for stage, value in new['stages'].items():
+        old_value = old['stages'].get(stage)
+        report[stage] = 1 - value / old_value if old_value else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregator throughput benchmark')
+    parser.add_argument('--rps', type=int, default=10000, help='responses per second, default: %(default)s')
+    parser.add_argument('--duration', type=int, default=30, help='seconds of data, default: %(default)s')
+    parser.add_argument('--tags', type=int, default=10, help='number of distinct tags, default: %(default)s')
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='lognormal',
+                        help='response time distribution, default: %(default)s')
+    parser.add_argument('--latency-median', type=int, default=20000,
+                        help='median response time in µs, default: %(default)s')
+    parser.add_argument('--latency-sigma', type=float, default=1.,
+                        help='sigma of lognormal distribution, default: %(default)s')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='share of errors, default: %(default)s')
+    parser.add_argument('--parser', choices=sorted(PARSERS), default='bytes', help='phout parser, default: %(default)s')
+    parser.add_argument('--workers', type=int, default=0, help='aggregator processes, default: %(default)s')
+    parser.add_argument('--max-tags', type=int, default=0, help='aggregator_max_tags, default: %(default)s')
+    parser.add_argument('--realtime', action='store_true', help='hand a second to the reader when it is over')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='json file to write results to')
+    parser.add_argument('--compare', help='results of another build to compare with')
+    args = parser.parse_args()
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+    generator = PhoutGenerator(args.rps, args.tags, args.latency, args.latency_median, args.latency_sigma,
+                               args.error_rate, args.seed)
+    result = {
+        "params": params,
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "cpus": multiprocessing.cpu_count(),
+            "platform": platform.platform(),
+        },
+        "results": run(generator, args.duration, args.workers, args.parser, args.realtime,
+                       max_tags=args.max_tags),
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('params') != params:
+            logger.warning('Benchmark parameters differ from those of %s, comparison is meaningless', args.compare)
+        result['comparison'] = compare(result, baseline)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
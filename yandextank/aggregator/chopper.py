@@ -2,8 +2,21 @@
 Split incoming DataFrames into chunks, cache them, union chunks with same key
 and pass to the underlying aggregator.
 """
+import logging
+import time
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+logger = logging.getLogger(__name__)
+
+
+DROP = 'drop'
+CORRECT = 'correct'
+LATE_POLICIES = (DROP, CORRECT)
+# DataFrame.attrs key of chunks with late rows of an already emitted second
+LATE = 'late'
 
 
 class TimeChopper(object):
@@ -11,13 +24,42 @@ class TimeChopper(object):
     TimeChopper splits incoming dataframes by index. Chunks are cached and
     chunks for same key from different DFs are joined. Then chunks are passed
     further as (<timestamp>, <dataframe>) tuples.
+
+    Every incoming dataframe is sorted by index once and cut into per-second
+    slices without copying. Slices of the same second are kept in a list
+    and concatenated only once, when the second is emitted.
+
+    A second is emitted when all the sources have passed it by more than
+    `lateness` seconds (the watermark). Rows that come after their second
+    was emitted are late: they are counted and either dropped or, with the
+    `correct` policy, emitted as a correction chunk of that second, marked
+    with chunk.attrs[LATE].
+
+    cache_size is the number of rows waiting in cache, emit_lag is the time
+    in seconds the last emitted second spent in cache.
     """
 
-    def __init__(self, sources):
-        # self.cache_size = cache_size
+    def __init__(self, sources, lateness=0, late_policy=DROP):
+        if late_policy not in LATE_POLICIES:
+            raise ValueError('Unknown late data policy {}, expected one of {}'.format(late_policy, LATE_POLICIES))
         self.sources = {i: src for i, src in enumerate(sources)}
         self.recent_ts = {i: 0 for i in range(len(self.sources))}
+        self.lateness = lateness
+        self.late_policy = late_policy
         self.cache = {}
+        self.cache_size = 0
+        self.emit_lag = 0.
+        self.emitted_ts = None
+        self.late_rows = 0
+        self.dropped_rows = 0
+        self._arrived = {}
+        self._emitted = set()
+        self._corrections = {}
+
+    @property
+    def oldest_ts(self):
+        """ oldest second waiting in cache """
+        return min(self.cache) if self.cache else None
 
     def __iter__(self):
         for _ in range(len(self.sources)):
@@ -26,26 +68,100 @@ class TimeChopper(object):
                     for n, source in self.sources.items():
                         chunk = next(source)
                         if chunk is not None:
-                            self.recent_ts[n] = chunk.index[-1]
-                            grouped = chunk.groupby(level=0)
-                            for ts, group_data in list(grouped):
-                                if ts in self.cache:
-                                    self.cache[ts] = pd.concat(
-                                        [self.cache[ts], group_data])
-                                else:
-                                    self.cache[ts] = group_data
-                    last_ready_ts = min(self.recent_ts.values()) - 1
-                    for ts in sorted(filter(lambda x: x <= last_ready_ts, self.cache)):
-                        data = self.cache.pop(ts)
-                        yield ts, data, len(data)
+                            self.recent_ts[n] = max(self.recent_ts[n], chunk.index.max())
+                            self.__put(chunk)
+                    for ts in sorted(self._corrections):
+                        yield self.__pop_correction(ts)
+                    watermark = min(self.recent_ts.values()) - 1 - self.lateness
+                    for ts in sorted(filter(lambda x: x <= watermark, self.cache)):
+                        yield self.__pop(ts)
             except StopIteration:
                 self.sources.pop(n)
                 self.recent_ts.pop(n)
+        for ts in sorted(self._corrections):
+            yield self.__pop_correction(ts)
         while self.cache:
-            yield self.__get_result()
+            yield self.__pop(self.oldest_ts)
+
+    def __put(self, chunk):
+        index = chunk.index.to_numpy()
+        if not chunk.index.is_monotonic_increasing:
+            order = np.argsort(index, kind='stable')
+            chunk = chunk.take(order)
+            index = index[order]
+        if self.emitted_ts is not None and index[0] <= self.emitted_ts:
+            stale = np.unique(index[:np.searchsorted(index, self.emitted_ts, side='right')])
+            emitted = [ts for ts in stale.tolist() if ts in self._emitted]
+            if emitted:
+                late = np.isin(index, emitted)
+                self.__put_late(chunk.iloc[late], index[late])
+                chunk, index = chunk.iloc[~late], index[~late]
+                if not len(index):
+                    return
+        arrived = time.time()
+        for ts, part in _split(chunk, index):
+            self.cache.setdefault(ts, []).append(part)
+            self._arrived.setdefault(ts, arrived)
+        self.cache_size += len(chunk)
 
-    def __get_result(self):
-        ts = min(self.cache.keys())
-        result = self.cache.pop(ts, None)
-        cardinality = len(result) if result is not None else 0
-        return ts, result, cardinality
+    def __put_late(self, chunk, index):
+        if not self.late_rows:
+            logger.warning('Got data for seconds that were already aggregated, consider increasing allowed lateness')
+        self.late_rows += len(chunk)
+        if self.late_policy == CORRECT:
+            for ts, part in _split(chunk, index):
+                self._corrections.setdefault(ts, []).append(part)
+        else:
+            self.dropped_rows += len(chunk)
+        logger.debug('%s late rows for seconds %s..%s', len(chunk), index[0], index[-1])
+
+    def __pop(self, ts):
+        parts = self.cache.pop(ts)
+        result = parts[0] if len(parts) == 1 else pd.concat(_align_categories(parts))
+        self.cache_size -= len(result)
+        self.emit_lag = time.time() - self._arrived.pop(ts)
+        self.emitted_ts = ts if self.emitted_ts is None else max(self.emitted_ts, ts)
+        self._emitted.add(ts)
+        logger.debug('Chopper emits %s: %s rows from %s chunks, %s rows left in cache',
+                     ts, len(result), len(parts), self.cache_size)
+        return ts, result, len(result)
+
+    def __pop_correction(self, ts):
+        parts = self._corrections.pop(ts)
+        result = pd.concat(_align_categories(parts)) if len(parts) > 1 else parts[0].copy()
+        result.attrs[LATE] = True
+        logger.debug('Chopper emits correction for %s: %s rows', ts, len(result))
+        return ts, result, len(result)
+
+
+def _split(chunk, index):
+    """ (ts, slice) for every second of a chunk sorted by index """
+    bounds = np.flatnonzero(np.diff(index)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.append(bounds, len(index))
+    for ts, start, end in zip(index[starts].tolist(), starts, ends):
+        yield ts, chunk.iloc[start:end]
+
+
+def _align_categories(parts):
+    """
+    Cast categorical columns of all the parts to the same dtype, otherwise
+    pd.concat falls back to object columns. Chunks encoded with a shared
+    TagDictionary differ only by a tail of categories, so their codes are
+    kept as is; unrelated categories are merged and recoded.
+    """
+    for column, dtype in parts[0].dtypes.items():
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        categories = {id(part[column].cat.categories): part[column].cat.categories for part in parts}
+        if len(categories) == 1:
+            continue
+        widest = max(categories.values(), key=len)
+        if all(widest[:len(c)].equals(c) for c in categories.values()):
+            common = pd.CategoricalDtype(widest)
+            parts = [part.assign(**{column: pd.Categorical.from_codes(part[column].cat.codes, dtype=common)})
+                     for part in parts]
+        else:
+            common = union_categoricals([pd.Categorical([], dtype=part[column].dtype) for part in parts]).dtype
+            parts = [part.assign(**{column: part[column].astype(common)}) for part in parts]
+    return parts
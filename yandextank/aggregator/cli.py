@@ -0,0 +1,47 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import sys
+
+from .offline import OfflineAggregator, FORMATS
+from .windows import DEFAULT_WINDOWS
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Aggregate phout, bfgout.log or jtl file of a finished test, output is in json_report format')
+    parser.add_argument('result_file', help='phout, bfgout.log (--format bfg) or jtl file')
+    parser.add_argument('-o', '--output', default='test_data.log', help='output file, default: %(default)s')
+    parser.add_argument('-f', '--format', default='phout', choices=sorted(FORMATS),
+                        help='result file format, default: %(default)s')
+    parser.add_argument('-c', '--config',
+                        help='aggregator config in json, see yandextank/aggregator/config/phout.json')
+    parser.add_argument('-j', '--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='number of worker processes, 0 to aggregate in one process, default: %(default)s')
+    parser.add_argument('-l', '--lateness', type=int, default=10,
+                        help='max distance in seconds between rows of the same second in the file, '
+                             'rows that are further are dropped, default: %(default)s')
+    parser.add_argument('--compact-histogram', action='store_true', help='use compact histogram bins')
+    parser.add_argument('-w', '--windows', type=int, nargs='*', default=list(DEFAULT_WINDOWS),
+                        help='sliding windows in seconds, default: %(default)s')
+    parser.add_argument('-v', '--verbose', action='store_true', help='debug logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(name)s %(message)s')
+    config = None
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    aggregator = OfflineAggregator(
+        args.result_file, args.format, config, args.workers, args.lateness,
+        verbose_histogram=not args.compact_histogram, windows=args.windows)
+    seconds = aggregator.write_json(args.output)
+    logging.info('%s seconds written to %s', seconds, args.output)
+
+
+if __name__ == '__main__':
+    main()
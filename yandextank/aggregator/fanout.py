@@ -0,0 +1,154 @@
+"""
+Delivery of aggregated data to result listeners. A slow listener (e.g. an
+uploader waiting for its server) gets its own bounded queue and thread, so
+it doesn't hold up the core loop and the other listeners.
+
+Overflow policies of a full queue:
+
+* block - wait for the listener, slows down the core loop like a
+  synchronous listener does, but nothing is lost;
+* drop_oldest - discard the oldest pending second;
+* coalesce - discard all pending seconds, the listener gets the latest one.
+  For listeners that only show current state.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from .second import materialize
+
+logger = logging.getLogger(__name__)
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+COALESCE = 'coalesce'
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, COALESCE)
+
+LATE_AFTER = 1.0
+
+
+def listener_name(listener):
+    return getattr(listener, 'cfg_section_name', type(listener).__name__)
+
+
+class Notifier(object):
+    """ Notifies a listener synchronously, in the thread that puts the data """
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.name = listener_name(listener)
+        self.notification_time = 0.
+        self.delivered = 0
+
+    def put(self, data, stats):
+        start = time.time()
+        self.listener.on_aggregated_data(data, stats)
+        self.notification_time = time.time() - start
+        self.delivered += 1
+
+    def correct(self, data):
+        """ pass aggregated late rows of an already notified second to the listener, if it accepts them """
+        handler = getattr(self.listener, 'on_aggregated_correction', None)
+        if handler:
+            handler(data)
+
+    def counters(self):
+        return {}
+
+    def close(self, timeout=None):
+        pass
+
+
+class QueuedNotifier(Notifier):
+    """
+    Notifies a listener from a thread of its own. Seconds are delivered in
+    the order they were put, the listener gets copies of them.
+
+    :param size: max number of pending seconds
+    :param overflow: one of OVERFLOW_POLICIES
+    :param late_after: a second is counted as late if it waited longer than
+        this in the queue, seconds
+    """
+
+    def __init__(self, listener, size, overflow=BLOCK, late_after=LATE_AFTER):
+        super(QueuedNotifier, self).__init__(listener)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy {}, expected one of {}'.format(overflow, OVERFLOW_POLICIES))
+        self.size = max(size, 1)
+        self.overflow = overflow
+        self.late_after = late_after
+        self.dropped = 0
+        self.late = 0
+        self.error = None
+        self._pending = deque()
+        self._finished = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='{} listener'.format(self.name), daemon=True)
+
+    def put(self, data, stats):
+        """ raises the exception the listener failed with since the previous put, if any """
+        self._enqueue(self.listener.on_aggregated_data, (materialize(data), stats))
+
+    def correct(self, data):
+        handler = getattr(self.listener, 'on_aggregated_correction', None)
+        if handler:
+            self._enqueue(handler, (materialize(data),))
+
+    def _enqueue(self, handler, args):
+        with self._condition:
+            if not self._thread.ident:
+                self._thread.start()
+            error, self.error = self.error, None
+            if len(self._pending) >= self.size:
+                if self.overflow == BLOCK:
+                    while len(self._pending) >= self.size:
+                        self._condition.wait()
+                elif self.overflow == DROP_OLDEST:
+                    self._pending.popleft()
+                    self.dropped += 1
+                else:
+                    self.dropped += len(self._pending)
+                    self._pending.clear()
+            self._pending.append((time.time(), handler, args))
+            self._condition.notify_all()
+        if error:
+            raise error
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._finished:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                queued, handler, args = self._pending.popleft()
+                self._condition.notify_all()
+            start = time.time()
+            if start - queued > self.late_after:
+                self.late += 1
+            try:
+                handler(*args)
+            except Exception as exc:
+                logger.error('Result listener %s failed', self.name, exc_info=True)
+                with self._condition:
+                    self.error = exc
+            self.notification_time = time.time() - start
+            self.delivered += 1
+
+    def counters(self):
+        return {"pending": len(self._pending), "dropped": self.dropped, "late": self.late}
+
+    def close(self, timeout=None):
+        """ deliver pending seconds and stop the thread """
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning('Result listener %s didn\'t process %s pending seconds in time',
+                               self.name, len(self._pending))
+        if self.dropped or self.late:
+            logger.info('Result listener %s: %s seconds delivered, %s dropped, %s late',
+                        self.name, self.delivered, self.dropped, self.late)
@@ -0,0 +1,65 @@
+"""
+Piecewise linear histogram layout. Bin index of a value is computed
+arithmetically from the range it falls into, instead of a binary search
+over thousands of explicit edges.
+
+Layout is a list of contiguous ranges, every range has a start value, a bin
+width and a number of bins (values are in microseconds)::
+
+    [{"from": 0, "step": 10, "count": 500}, {"from": 5000, "step": 100, "count": 50}, ...]
+
+Bins are half-open except the last one, which is closed, as in np.histogram.
+
+Layouts are kept in the "histogram" section of config/phout.json, an
+aggregator config without the section gets DEFAULT_LAYOUT, the shipped one.
+"""
+import json
+
+import numpy as np
+from pkg_resources import resource_string
+
+# "verbose" bins are 10µs wide for fast responses and up to 1s for slow ones, "compact" bins are coarse
+DEFAULT_LAYOUT = json.loads(resource_string(__name__, 'config/phout.json').decode('utf8'))['histogram']
+
+
+class BinLayout(object):
+    """
+    :param ranges: list of {"from", "step", "count"} dicts, sorted and contiguous
+    """
+
+    def __init__(self, ranges):
+        if not ranges:
+            raise ValueError('Histogram layout should have at least one range')
+        self.starts = np.array([r['from'] for r in ranges], dtype=np.int64)
+        self.steps = np.array([r['step'] for r in ranges], dtype=np.int64)
+        counts = np.array([r['count'] for r in ranges], dtype=np.int64)
+        if (self.steps <= 0).any() or (counts <= 0).any():
+            raise ValueError('Histogram ranges should have positive step and count: {}'.format(ranges))
+        ends = self.starts + self.steps * counts
+        if (self.starts[1:] != ends[:-1]).any():
+            raise ValueError('Histogram ranges should be sorted and contiguous: {}'.format(ranges))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self.end = ends[-1].item()
+        self.size = int(counts.sum())
+        self.edges = np.concatenate(
+            [start + step * np.arange(count) for start, step, count in zip(self.starts, self.steps, counts)]
+            + [[self.end]]).astype(np.float64)
+
+    def index(self, values):
+        """
+        Bin number for every value, -1 for values out of the layout
+        :type values: np.ndarray
+        """
+        values = np.asarray(values)
+        ranges = np.searchsorted(self.starts, values, side='right') - 1
+        valid = (ranges >= 0) & (values <= self.end)
+        ranges[~valid] = 0
+        index = self.offsets[ranges] + (values - self.starts[ranges]) // self.steps[ranges]
+        # the last bin is closed
+        index[values == self.end] = self.size - 1
+        index[~valid] = -1
+        return index.astype(np.intp)
+
+    def upper_edges(self, index):
+        """ right edge of every bin, as reported in aggregated data """
+        return self.edges[np.asarray(index) + 1]
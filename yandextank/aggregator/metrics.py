@@ -0,0 +1,132 @@
+"""
+Self-instrumentation of the aggregation pipeline. Every stage reports what
+it costs, so that a slow test run can be attributed to parsing, chopping,
+aggregation or one of the listeners.
+
+One sample is taken per aggregated second, right after listeners were
+notified::
+
+    {"ts": 1502376593, "time": 1502376595.02, "lag": 2.02,
+     "reader": {"rows": 5000, "rows_per_second": 4998.1, "parse_time": 0.012},
+     "chopper": {"cache_size": 120, "oldest_ts": 1502376594, "emit_lag": 1.01,
+                 "late_rows": 0, "dropped_rows": 0},
+     "aggregation_time": 0.004,
+     "queues": {"results": 0, "stats_results": 1},
+     "listeners": {"console": 0.002, "json_report": 0.001},
+     "listener_queues": {"json_report": {"pending": 0, "dropped": 0, "late": 0}}}
+
+``reader`` counters are accumulated since the previous sample. Listener
+time is the time of the last notification, for queued listeners it may be
+of an earlier second.
+"""
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TimedSource(object):
+    """
+    Wraps a reader and reports the number of rows it returns and the time
+    spent in it to PipelineMetrics. Other attributes (e.g. wait) are those of
+    the wrapped reader.
+    """
+
+    def __init__(self, source, metrics):
+        self.source = source
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    def __iter__(self):
+        iterator = iter(self.source)
+        while True:
+            start = time.time()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            self.metrics.add_parsed(0 if chunk is None else len(chunk), time.time() - start)
+            yield chunk
+
+
+class PipelineMetrics(object):
+    """
+    Collects per-stage metrics of the pipeline, keeps the last sample and
+    writes all of them to a file as json lines
+
+    :param filename: time series artifact, None to keep the last sample only
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.last = {}
+        self._rows = 0
+        self._parse_time = 0.
+        self._sampled = time.time()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def add_parsed(self, rows, duration):
+        """ called from reader threads """
+        with self._lock:
+            self._rows += rows
+            self._parse_time += duration
+
+    def sample(self, ts, chopper=None, pipeline=None, queues=None, listeners=None, listener_queues=None):
+        """
+        :param chopper: TimeChopper
+        :param pipeline: Aggregator or ParallelAggregator
+        :param queues: {name: queue.Queue}
+        :param listeners: {listener name: notification time in seconds}
+        :param listener_queues: {listener name: counters of its queue}
+        :rtype: dict
+        """
+        now = time.time()
+        with self._lock:
+            rows, parse_time = self._rows, self._parse_time
+            self._rows, self._parse_time = 0, 0.
+        elapsed, self._sampled = now - self._sampled, now
+        sample = {
+            "ts": ts,
+            "time": now,
+            "lag": now - ts,
+            "reader": {
+                "rows": rows,
+                "rows_per_second": rows / elapsed if elapsed > 0 else 0.,
+                "parse_time": parse_time,
+            },
+            "chopper": {
+                "cache_size": chopper.cache_size,
+                "oldest_ts": chopper.oldest_ts,
+                "emit_lag": chopper.emit_lag,
+                "late_rows": chopper.late_rows,
+                "dropped_rows": chopper.dropped_rows,
+            } if chopper else {},
+            "aggregation_time": pipeline.aggregation_time if pipeline else None,
+            "queues": {name: queue.qsize() for name, queue in (queues or {}).items()},
+            "listeners": dict(listeners or {}),
+            "listener_queues": dict(listener_queues or {}),
+        }
+        self.last = sample
+        self._write(sample)
+        return sample
+
+    def _write(self, sample):
+        if not self.filename:
+            return
+        try:
+            if not self._file:
+                self._file = open(self.filename, 'w')
+            self._file.write(json.dumps(sample) + '\n')
+        except (IOError, OSError, ValueError):
+            logger.warning('Failed to write pipeline metrics to %s', self.filename, exc_info=True)
+            self.filename = None
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
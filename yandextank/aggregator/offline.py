@@ -0,0 +1,198 @@
+"""
+Re-aggregation of test results after the test, as fast as the disk and
+the CPUs allow.
+
+The result file is split into byte ranges at line boundaries, ranges are
+parsed and aggregated in worker processes. Seconds are owned by ranges:
+range i owns seconds from the first second of range i up to the first
+second of range i + 1. Rows near the borders of owned seconds (within
+`lateness` seconds) may come from a neighbour range, so they are not
+aggregated by workers but sent back raw and aggregated together at the
+end. Rows that fall further away from their owner are late, they are
+counted and dropped, the same way TimeChopper drops them in a live test.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .aggregator import Aggregator, HISTOGRAM_SECTION
+from .chopper import TimeChopper, _align_categories
+from .histogram import BinLayout, DEFAULT_LAYOUT
+from .tank_aggregator import TankAggregator
+from .windows import HistogramWindows, DEFAULT_WINDOWS
+from yandextank.common.interfaces import StatsReader
+from yandextank.plugins.Bfg.reader import bfgout_to_df
+from yandextank.plugins.JMeter.reader import string_to_df as jtl_to_df
+from yandextank.plugins.JsonReport.plugin import NumpyEncoder
+from yandextank.plugins.Phantom.reader import bytes_to_df
+
+logger = logging.getLogger(__name__)
+
+# format: (parser, parser takes bytes)
+FORMATS = {
+    'phout': (bytes_to_df, True),
+    'bfg': (bfgout_to_df, True),
+    'jtl': (jtl_to_df, False),
+}
+
+BLOCK_SIZE = 32 * 1024 * 1024
+
+
+def split_ranges(filename, parts):
+    """
+    Split a file into at most `parts` byte ranges that start and end at line boundaries
+
+    :rtype: list of (start, end)
+    """
+    size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _parse(data, fmt):
+    parser, binary = FORMATS[fmt]
+    return parser(data if binary else data.decode('utf-8'))
+
+
+def read_range(filename, start, end, fmt, block_size=BLOCK_SIZE):
+    """ parsed chunks of a byte range, every chunk is at most block_size bytes of complete lines """
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        tail = b''
+        while start < end:
+            data = tail + f.read(min(block_size, end - start))
+            start = f.tell()
+            if start < end:
+                data, newline, tail = data.rpartition(b'\n')
+                data += newline
+            if data:
+                chunk = _parse(data, fmt)
+                if chunk is not None and len(chunk):
+                    yield chunk
+
+
+def first_second(filename, start, fmt):
+    """ second of the first row of a range """
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        chunk = _parse(f.readline(), fmt)
+    return chunk.index[0] if chunk is not None and len(chunk) else None
+
+
+def _owned(seconds, own_from, own_to, margin):
+    """ mask of seconds that only the owner of [own_from, own_to) can have """
+    return (seconds >= own_from + margin) & (seconds < own_to - margin)
+
+
+def aggregate_range(filename, start, end, fmt, own_from, own_to, margin, config, verbose_histogram):
+    """
+    Aggregate owned seconds of a range, return rows of the other seconds as is
+
+    :returns: (aggregated seconds, raw rows, number of late rows)
+    """
+    raw = []
+
+    def owned_chunks():
+        for chunk in read_range(filename, start, end, fmt):
+            owned = _owned(chunk.index.to_numpy(), own_from, own_to, margin)
+            if not owned.all():
+                raw.append(chunk[~owned])
+            yield chunk[owned] if owned.any() else None
+
+    chopper = TimeChopper([owned_chunks()], lateness=margin)
+    seconds = list(Aggregator(chopper, config, verbose_histogram))
+    rows = pd.concat(_align_categories(raw)) if len(raw) > 1 else (raw[0] if raw else None)
+    return seconds, rows, chopper.late_rows
+
+
+class OfflineAggregator(object):
+    """
+    :param filename: phout, bfgout.log or jtl file
+    :param fmt: one of FORMATS
+    :param config: aggregator config, config/phout.json by default
+    :param workers: number of processes, 0 to aggregate in this process
+    :param lateness: how far (seconds) rows of a second can be from each other in the file
+    """
+
+    def __init__(self, filename, fmt='phout', config=None, workers=0, lateness=10,
+                 verbose_histogram=True, windows=DEFAULT_WINDOWS):
+        if fmt not in FORMATS:
+            raise ValueError('Unknown result file format {}, expected one of {}'.format(fmt, list(FORMATS)))
+        self.filename = filename
+        self.fmt = fmt
+        self.config = config or TankAggregator.load_config()
+        self.workers = workers
+        self.lateness = lateness
+        self.verbose_histogram = verbose_histogram
+        self.window_sizes = windows
+        self.late_rows = 0
+
+    def __tasks(self):
+        ranges = split_ranges(self.filename, max(self.workers, 1) * 4)
+        starts = [first_second(self.filename, start, self.fmt) for start, _ in ranges]
+        # ranges without a parsable first line belong to the previous one
+        firsts = [s for s in starts if s is not None]
+        if not firsts:
+            return [], np.array([])
+        owners = np.maximum.accumulate(np.array([s if s is not None else firsts[0] for s in starts], dtype=np.float64))
+        owners[0] = -np.inf
+        bounds = np.append(owners, np.inf)
+        tasks = [(self.filename, start, end, self.fmt, bounds[i], bounds[i + 1], self.lateness,
+                  self.config, self.verbose_histogram) for i, (start, end) in enumerate(ranges)]
+        return tasks, bounds
+
+    def aggregate(self):
+        """
+        :returns: aggregated seconds sorted by ts
+        :rtype: list of dict
+        """
+        start_time = time.time()
+        tasks, bounds = self.__tasks()
+        if self.workers > 0:
+            with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(aggregate_range, *zip(*tasks))) if tasks else []
+        else:
+            results = [aggregate_range(*task) for task in tasks]
+        seconds = [second for range_seconds, _, _ in results for second in range_seconds]
+        self.late_rows = sum(late for _, _, late in results)
+        raw = [rows for _, rows, _ in results if rows is not None and len(rows)]
+        if raw:
+            rows = pd.concat(_align_categories(raw)) if len(raw) > 1 else raw[0]
+            index = rows.index.to_numpy()
+            owner = np.searchsorted(bounds, index, side='right') - 1
+            late = _owned(index, bounds[owner], bounds[owner + 1], self.lateness)
+            self.late_rows += int(np.count_nonzero(late))
+            seconds += Aggregator(TimeChopper([iter([rows[~late]])]), self.config, self.verbose_histogram)
+        seconds.sort(key=lambda second: second['ts'])
+        logger.info('%s seconds aggregated in %.2fs, %s late rows dropped',
+                    len(seconds), time.time() - start_time, self.late_rows)
+        return seconds
+
+    def write_json(self, output):
+        """ write aggregated seconds in JsonReport format """
+        windows = None
+        if 'hist' in self.config.get('interval_real', []):
+            layout = self.config.get(HISTOGRAM_SECTION, DEFAULT_LAYOUT)
+            windows = HistogramWindows(
+                BinLayout(layout['verbose' if self.verbose_histogram else 'compact']), self.window_sizes)
+        seconds = self.aggregate()
+        with open(output, 'wb') as f:
+            for second in seconds:
+                if windows:
+                    windows.attach(second)
+                stats = StatsReader.stats_item(second['ts'], 0, 0)
+                json_string = json.dumps({'data': second, 'stats': stats}, cls=NumpyEncoder)
+                f.write('{}\n'.format(json_string).encode('utf-8'))
+        return len(seconds)
@@ -0,0 +1,232 @@
+"""
+Compact representation of an aggregated second.
+
+Aggregates of all the tags are kept in NumPy arrays, one column per
+(data column, aggregate) pair, e.g. a vector of totals or sparse histogram
+cells of all the tags. AggregatedSecond is a mapping of the same shape as the
+dicts listeners always got::
+
+    {"ts": 1502376593, "counted_rps": 5000,
+     "tagged": {tag: {"interval_real": {"len": ..., "q": ...}, ...}},
+     "overall": {"interval_real": {...}, ...}}
+
+but dicts of a tag are built only when the tag is looked up, so a listener
+that reads overall numbers or a single tag does not pay for hundreds of
+tags. Listeners that know the layout can read the columns directly::
+
+    second.column("interval_real", "len")  # ndarray, one value per tag in second.tags
+
+Use ``json.dumps(second, default=dict)`` or JsonReport's NumpyEncoder to
+serialize a second.
+"""
+import copy
+from collections.abc import Mapping, MutableMapping, Sequence
+
+import numpy as np
+
+from .sketch import LatencySketch
+
+
+class ScalarColumn(Sequence):
+    """ a number per tag """
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i].item()
+
+
+class RaggedColumn(Sequence):
+    """ cells of tag i are cells[bounds[i]:bounds[i + 1]] """
+    __slots__ = ('bounds',)
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    def _cells(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return slice(self.bounds[i], self.bounds[i + 1])
+
+
+class HistogramColumn(RaggedColumn):
+    """ sparse histograms, {"data": [...], "bins": [...]} per tag """
+    __slots__ = ('bins', 'data')
+
+    def __init__(self, bounds, bins, data):
+        super(HistogramColumn, self).__init__(bounds)
+        self.bins = bins
+        self.data = data
+
+    def __getitem__(self, i):
+        cells = self._cells(i)
+        return {"data": self.data[cells].tolist(), "bins": self.bins[cells].tolist()}
+
+
+class CountColumn(RaggedColumn):
+    """ counts of codes, {"200": 10, "404": 1} per tag """
+    __slots__ = ('codes', 'counts')
+
+    def __init__(self, bounds, codes, counts):
+        super(CountColumn, self).__init__(bounds)
+        self.codes = codes
+        self.counts = counts
+
+    def __getitem__(self, i):
+        cells = self._cells(i)
+        return dict(zip(map(str, self.codes[cells].tolist()), self.counts[cells].tolist()))
+
+
+class SketchColumn(RaggedColumn):
+    """ LatencySketch buckets per tag """
+    __slots__ = ('alpha', 'index', 'data', 'zeros')
+
+    def __init__(self, bounds, alpha, index, data, zeros):
+        super(SketchColumn, self).__init__(bounds)
+        self.alpha = alpha
+        self.index = index
+        self.data = data
+        self.zeros = zeros
+
+    def __getitem__(self, i):
+        cells = self._cells(i)
+        return LatencySketch(self.alpha, self.index[cells], self.data[cells], self.zeros[i].item()).to_dict()
+
+
+class QuantileColumn(Sequence):
+    """
+    :param percentiles: array of percentiles of every tag
+    :param values: matrix or list of arrays, quantiles of every tag
+    """
+    __slots__ = ('percentiles', 'values')
+
+    def __init__(self, percentiles, values):
+        self.percentiles = percentiles
+        self.values = values
+
+    def __len__(self):
+        return len(self.percentiles)
+
+    def __getitem__(self, i):
+        return {"q": self.percentiles[i].tolist(), "value": self.values[i].tolist()}
+
+
+class TaggedView(Mapping):
+    """ read-only {tag: {column: {aggregate: value}}}, dicts of a tag are built on first access """
+    __slots__ = ('tags', 'columns', '_index', '_cache')
+
+    def __init__(self, tags, columns):
+        self.tags = tags
+        self.columns = columns
+        self._index = None
+        self._cache = {}
+
+    def __getitem__(self, tag):
+        if tag in self._cache:
+            return self._cache[tag]
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.tags)}
+        i = self._index[tag]
+        result = self._cache[tag] = {
+            key: {aggregate: values[i] for aggregate, values in aggregates.items()}
+            for key, aggregates in self.columns.items()
+        }
+        return result
+
+    def __iter__(self):
+        return iter(self.tags)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __repr__(self):
+        return 'TaggedView({})'.format(self.tags)
+
+
+class AggregatedSecond(MutableMapping):
+    """
+    :param tags: tag names, the order of values in columns
+    :param columns: {column: {aggregate: sequence of values}}, values of tags
+        are followed by values of rows without a tag, if any
+    :param overall: {column: {aggregate: value}}
+    """
+    __slots__ = ('ts', 'counted_rps', 'tags', 'columns', 'overall', '_tagged', '_extra')
+
+    KEYS = ('ts', 'tagged', 'overall', 'counted_rps')
+
+    def __init__(self, ts, tags, columns, overall, counted_rps=None):
+        self.ts = ts
+        self.tags = tags
+        self.columns = columns
+        self.overall = overall
+        self.counted_rps = counted_rps
+        self._tagged = None
+        self._extra = {}
+
+    def column(self, key, aggregate):
+        """
+        values of an aggregate for every tag: ndarray for numeric aggregates,
+        a sequence of per-tag values otherwise
+        """
+        values = self.columns[key][aggregate]
+        if isinstance(values, ScalarColumn):
+            return values.values[:len(self.tags)]
+        return values
+
+    def __getitem__(self, key):
+        if key == 'ts':
+            return self.ts
+        if key == 'tagged':
+            if self._tagged is None:
+                self._tagged = TaggedView(self.tags, self.columns)
+            return self._tagged
+        if key == 'overall':
+            return self.overall
+        if key == 'counted_rps':
+            return self.counted_rps
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key == 'tagged':
+            self._tagged = value
+        elif key in self.KEYS:
+            setattr(self, key, value)
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.KEYS:
+            raise KeyError('{} can not be deleted from aggregated second'.format(key))
+        del self._extra[key]
+
+    def __iter__(self):
+        yield from self.KEYS
+        yield from self._extra
+
+    def __len__(self):
+        return len(self.KEYS) + len(self._extra)
+
+    def __repr__(self):
+        return 'AggregatedSecond(ts={}, tags={}, keys={})'.format(self.ts, len(self.tags), list(self))
+
+
+def materialize(data):
+    """
+    Plain dict copy of an aggregated second, with dicts of all the tags built.
+    Lazy parts of a second are filled without locks, a listener in another
+    thread gets a copy instead.
+    """
+    if isinstance(data, AggregatedSecond):
+        data = {key: ({tag: data['tagged'][tag] for tag in data['tagged']} if key == 'tagged' else data[key])
+                for key in data}
+    return copy.deepcopy(data)
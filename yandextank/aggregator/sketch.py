@@ -0,0 +1,126 @@
+"""
+Mergeable quantile sketch with fixed relative error (DDSketch-like).
+
+Values are put into logarithmic buckets: bucket ``i`` holds values from
+``gamma ** (i - 1)`` to ``gamma ** i`` where
+``gamma = (1 + alpha) / (1 - alpha)``, so any quantile is estimated with
+relative error not greater than ``alpha``. Sketches with the same ``alpha``
+are merged by adding bucket counters, which makes it possible to get
+quantiles for a minute or for the whole test from per-second sketches
+in O(buckets), without the raw data.
+
+Serialized form (as found in aggregated data)::
+
+    {"alpha": 0.01, "zero": 0, "index": [200, 201, ...], "data": [5, 3, ...]}
+"""
+import numpy as np
+
+DEFAULT_ALPHA = 0.01
+
+
+def _combine(index, data, other_index, other_data):
+    """ add two sparse bucket arrays """
+    merged, inverse = np.unique(np.concatenate((index, other_index)), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate((data, other_data)), minlength=len(merged))
+    counts = counts.astype(np.int64)
+    mask = counts != 0
+    return merged[mask], counts[mask]
+
+
+class LatencySketch(object):
+    """
+    Sparse logarithmic histogram with relative accuracy ``alpha``
+
+    :param index: sorted bucket numbers
+    :param data: counters for the buckets
+    :param zero: counter of values that are less than or equal to zero
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA, index=(), data=(), zero=0):
+        if not 0 < alpha < 1:
+            raise ValueError('Sketch relative accuracy should be in (0, 1), got {}'.format(alpha))
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.index = np.asarray(index, dtype=np.int64)
+        self.data = np.asarray(data, dtype=np.int64)
+        self.zero = int(zero)
+
+    @staticmethod
+    def bucket_index(values, alpha=DEFAULT_ALPHA):
+        """ bucket numbers for positive values """
+        gamma = (1 + alpha) / (1 - alpha)
+        return np.ceil(np.log(values) / np.log(gamma)).astype(np.int64)
+
+    @classmethod
+    def from_values(cls, values, alpha=DEFAULT_ALPHA):
+        values = np.asarray(values)
+        positive = values > 0
+        index, data = np.unique(cls.bucket_index(values[positive], alpha), return_counts=True)
+        return cls(alpha, index, data, len(values) - np.count_nonzero(positive))
+
+    @classmethod
+    def from_dict(cls, serialized):
+        return cls(serialized['alpha'], serialized['index'], serialized['data'], serialized['zero'])
+
+    def to_dict(self):
+        return {
+            "alpha": self.alpha,
+            "zero": self.zero,
+            "index": self.index.tolist(),
+            "data": self.data.tolist(),
+        }
+
+    def copy(self):
+        return LatencySketch(self.alpha, self.index.copy(), self.data.copy(), self.zero)
+
+    def __len__(self):
+        return self.zero + int(self.data.sum())
+
+    def _check_compatible(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError('Unable to merge sketches with different accuracy: {} and {}'.format(self.alpha, other.alpha))
+
+    def merge(self, other):
+        """ add counters of other sketch to this one, in place """
+        self._check_compatible(other)
+        self.index, self.data = _combine(self.index, self.data, other.index, other.data)
+        self.zero += other.zero
+        return self
+
+    def subtract(self, other):
+        """ remove counters of other sketch that was merged into this one earlier, in place """
+        self._check_compatible(other)
+        self.index, self.data = _combine(self.index, self.data, other.index, -other.data)
+        self.zero -= other.zero
+        return self
+
+    def values(self):
+        """ value estimate for every bucket """
+        return 2 * np.power(self.gamma, self.index) / (self.gamma + 1)
+
+    def quantiles(self, percentiles):
+        """
+        Estimate quantiles of merged data
+
+        :param percentiles: percentiles in range [0, 100]
+        :rtype: list of float
+        """
+        total = len(self)
+        if not total:
+            return [None for _ in percentiles]
+        ranks = np.asarray(percentiles, dtype=np.float64) / 100 * (total - 1)
+        cumulative = self.zero + np.cumsum(self.data)
+        positions = np.searchsorted(cumulative, ranks, side='right')
+        estimates = np.append(self.values(), 0)
+        return np.where(ranks < self.zero, 0, estimates[positions]).tolist()
+
+    def quantile(self, percentile):
+        return self.quantiles([percentile])[0]
+
+
+def merge_sketches(serialized_sketches, alpha=DEFAULT_ALPHA):
+    """ merge an iterable of serialized sketches into one LatencySketch """
+    result = LatencySketch(alpha)
+    for serialized in serialized_sketches:
+        result.merge(LatencySketch.from_dict(serialized))
+    return result
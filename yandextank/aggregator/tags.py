@@ -0,0 +1,156 @@
+"""
+Per-test dictionary of tags. Every distinct tag gets a small integer code
+once, so that tags travel from readers through the chopper to the
+aggregator as a categorical column instead of Python strings.
+"""
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class TagDictionary(object):
+    """
+    Append-only mapping of tags to codes
+
+    Codes never change, so categories of an earlier dtype are always a
+    prefix of the current ones and chunks encoded at different moments
+    share codes. All readers of a test should use the same dictionary.
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._tags = []
+        self._dtype = pd.CategoricalDtype([])
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __contains__(self, tag):
+        return tag in self._codes
+
+    @property
+    def dtype(self):
+        """ categorical dtype with all the tags known so far """
+        return self._dtype
+
+    def _code(self, tag):
+        code = self._codes.get(tag)
+        if code is None:
+            code = self._codes[tag] = len(self._tags)
+            self._tags.append(tag)
+        return code
+
+    def encode(self, tags):
+        """
+        :param tags: tag column, object or categorical; missing tags stay missing
+        :type tags: pd.Series
+        :rtype: pd.Categorical
+        """
+        if isinstance(tags.dtype, pd.CategoricalDtype):
+            chunk_codes, chunk_tags = tags.cat.codes.to_numpy(), tags.cat.categories
+        else:
+            chunk_codes, chunk_tags = pd.factorize(tags)
+        with self._lock:
+            mapping = [self._code(tag) for tag in chunk_tags]
+            if len(self._tags) != len(self._dtype.categories):
+                self._dtype = pd.CategoricalDtype(self._tags)
+            dtype = self._dtype
+        # code -1 (no tag) stays -1
+        mapping = np.append(np.asarray(mapping, dtype=np.int64), -1)
+        return pd.Categorical.from_codes(mapping[chunk_codes], dtype=dtype)
+
+    def encode_chunk(self, chunk):
+        """ replace tag column of a parsed chunk with codes from this dictionary, in place """
+        if chunk is not None:
+            chunk['tag'] = self.encode(chunk['tag'])
+        return chunk
+
+
+OTHER_TAG = '__other__'
+
+
+class SpaceSaving(object):
+    """
+    Space-Saving summary of tag frequencies
+
+    At most `capacity` counters are kept. A tag that is not tracked yet
+    starts from the smallest counter of a full summary, so counts are
+    overestimated by not more than `floor`, and every tag with frequency
+    above `floor` is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.floor = 0
+
+    def update(self, counts):
+        """
+        :param counts: number of rows of every tag in a chunk
+        :type counts: pd.Series
+        """
+        merged = self.counts.add(counts, fill_value=0).astype(np.int64)
+        if self.floor:
+            merged[~merged.index.isin(self.counts.index)] += self.floor
+        if len(merged) > self.capacity:
+            merged = merged.nlargest(self.capacity)
+        self.counts = merged
+        self.floor = int(merged.min()) if len(merged) >= self.capacity else 0
+
+    def top(self, k):
+        """ k most frequent tags """
+        return self.counts.nlargest(k).index
+
+
+class TopTags(object):
+    """
+    Bounds the number of tags aggregated individually.
+
+    Sits between TimeChopper and Aggregator. Tags are counted with
+    SpaceSaving over the whole test; in every second only `max_tags` most
+    frequent ones are kept, rows of other tags are folded into OTHER_TAG.
+    Rows without a tag stay as they are.
+    """
+
+    def __init__(self, source, max_tags, capacity=None):
+        self.source = source
+        self.max_tags = max_tags
+        self.hitters = SpaceSaving(capacity or 4 * max_tags)
+        self.folded_rows = 0
+        self.groupby = 'tag'
+
+    def __iter__(self):
+        for ts, chunk, rps in self.source:
+            yield ts, self.fold(chunk), rps
+
+    def fold(self, chunk):
+        column = chunk[self.groupby]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes, tags = column.cat.codes.to_numpy(), column.cat.categories
+        else:
+            codes, tags = pd.factorize(column)
+        counts = np.bincount(codes[codes >= 0], minlength=len(tags))
+        present = counts > 0
+        self.hitters.update(pd.Series(counts[present], index=tags[present]))
+        if len(self.hitters.counts) <= self.max_tags:
+            return chunk
+        kept = tags.isin(self.hitters.top(self.max_tags)) & (tags != OTHER_TAG)
+        if (kept | ~present).all():
+            return chunk
+        folded = int(counts[~kept].sum())
+        if not self.folded_rows:
+            logger.warning('More than %s tags in test data, rows of less frequent tags are aggregated as %s',
+                           self.max_tags, OTHER_TAG)
+        self.folded_rows += folded
+        categories = tags[kept].append(pd.Index([OTHER_TAG]))
+        mapping = np.where(kept, np.cumsum(kept) - 1, len(categories) - 1)
+        # code -1 (no tag) stays -1
+        mapping = np.append(mapping, -1)
+        chunk = chunk.assign(**{self.groupby: pd.Categorical.from_codes(mapping[codes], categories)})
+        logger.debug('%s rows of %s tags folded into %s', folded, np.count_nonzero(~kept & present), OTHER_TAG)
+        return chunk
@@ -1,15 +1,21 @@
 """ Core module to calculate aggregate data """
 import json
 import logging
-import queue as q
 from datetime import datetime
 
 from pkg_resources import resource_string
 from typing import Collection
 
-from .aggregator import Aggregator, DataPoller
-from .chopper import TimeChopper
+from .aggregator import Aggregator, DataPoller, ParallelAggregator, HISTOGRAM_SECTION, QUANTILES_SECTION, \
+    DEFAULT_QUANTILES, CORRECTED_COLUMN, CORRECTED_AGGREGATES
+from .histogram import BinLayout, DEFAULT_LAYOUT
+from .chopper import TimeChopper, DROP
+from .fanout import Notifier, QueuedNotifier, BLOCK
+from .metrics import PipelineMetrics, TimedSource
+from .tags import TopTags, OTHER_TAG
+from .windows import HistogramWindows, DEFAULT_WINDOWS, CONSOLE_WINDOW
 from yandextank.common.interfaces import AggregateResultListener, StatsReader
+from yandextank.common.util import SignallingQueue
 
 from yandextank.contrib.netort.netort.data_processing import Drain, Chopper, get_nowait_from_queue
 
@@ -20,7 +26,7 @@ class LoggingListener(AggregateResultListener):
     """ Log aggregated results """
 
     def on_aggregated_data(self, data, stats):
-        logger.info("Got aggregated sample:\n%s", json.dumps(data, indent=2))
+        logger.info("Got aggregated sample:\n%s", json.dumps(data, indent=2, default=dict))
         logger.info("Stats:\n%s", json.dumps(stats, indent=2))
 
 
@@ -35,16 +41,40 @@ class TankAggregator(object):
     def get_key():
         return __file__
 
-    def __init__(self, generator, poller: DataPoller, termination_timeout: float = 60):
+    def __init__(self, generator, poller: DataPoller, termination_timeout: float = 60, workers: int = 0,
+                 max_tags: int = 0, windows=DEFAULT_WINDOWS, publish=None, metrics_file=None,
+                 listeners_queue: int = 0, listeners_overflow: str = BLOCK, data_ready=None,
+                 lateness: int = 0, late_data: str = DROP, quantiles=DEFAULT_QUANTILES, tag_quantiles=None,
+                 corrected_latency: bool = False, verbose_histogram: bool = True):
         # AbstractPlugin.__init__(self, core, cfg)
         """
 
         :type generator: GeneratorPlugin
+        :param workers: number of processes to aggregate data in, 0 to aggregate in a thread
+        :param max_tags: number of most frequent tags aggregated individually, 0 for no limit
+        :param windows: sizes of sliding windows in seconds, summaries of the windows
+            are passed to listeners along with every second; the Console window is always added
+        :param publish: callable(key, value) to publish pipeline metrics with, e.g. to core.info
+        :param metrics_file: file to write pipeline metrics of every second to
+        :param listeners_queue: number of seconds queued for every listener that is
+            notified from a thread of its own, 0 to notify all listeners synchronously
+        :param listeners_overflow: overflow policy of listener queues, see fanout
+        :param data_ready: threading.Event set whenever aggregated data or stats are ready to be collected
+        :param lateness: seconds to wait for late rows before a second is aggregated
+        :param late_data: what to do with rows that come even later, drop or pass to listeners as corrections
+        :param quantiles: response time percentiles of every second
+        :param tag_quantiles: {tag: extra percentiles of the tag}
+        :param corrected_latency: aggregate interval_real + send_delay as interval_real_corrected
+            when the generator reports send delays
+        :param verbose_histogram: use the verbose histogram layout of the config, the compact one otherwise
         """
         self.generator = generator
         self.listeners = []  # [LoggingListener()]
-        self.results = q.Queue()
-        self.stats_results = q.Queue()
+        self.notifiers = []
+        self.listeners_queue = listeners_queue
+        self.listeners_overflow = listeners_overflow
+        self.results = SignallingQueue(data_ready)
+        self.stats_results = SignallingQueue(data_ready)
         self.data_cache = {}
         self.stat_cache = {}
         self.reader = None
@@ -53,6 +83,21 @@ class TankAggregator(object):
         self.stats_drain = None
         self.termination_timeout = termination_timeout
         self.poller = poller
+        self.workers = workers
+        self.max_tags = max_tags
+        self.top_tags = None
+        self.window_sizes = sorted(set(windows) | {CONSOLE_WINDOW})
+        self.windows = None
+        self.publish = publish
+        self.metrics = PipelineMetrics(metrics_file)
+        self.chopper = None
+        self.lateness = lateness
+        self.late_data = late_data
+        self.pipeline = None
+        self.quantiles = quantiles
+        self.tag_quantiles = tag_quantiles or {}
+        self.corrected_latency = corrected_latency
+        self.verbose_histogram = verbose_histogram
 
     @staticmethod
     def load_config():
@@ -62,18 +107,26 @@ class TankAggregator(object):
         self.reader = self.generator.get_reader()
         self.stats_reader = self.generator.get_stats_reader()
         aggregator_config = self.load_config()
-        verbose_histogram = True
-        if verbose_histogram:
-            logger.info("using verbose histogram")
+        aggregator_config[QUANTILES_SECTION] = {"default": list(self.quantiles), "tagged": self.tag_quantiles}
+        if self.corrected_latency:
+            aggregator_config[CORRECTED_COLUMN] = CORRECTED_AGGREGATES
+        logger.info("using %s histogram", 'verbose' if self.verbose_histogram else 'compact')
+        if 'hist' in aggregator_config.get('interval_real', []):
+            layout = aggregator_config.get(HISTOGRAM_SECTION, DEFAULT_LAYOUT)
+            self.windows = HistogramWindows(
+                BinLayout(layout['verbose' if self.verbose_histogram else 'compact']), self.window_sizes)
         if self.reader and self.stats_reader:
-            pipeline =\
-                Aggregator(TimeChopper([self.poller.poll(r) for r in self.reader]),
-                           aggregator_config,
-                           verbose_histogram) \
-                if isinstance(self.reader, Collection) else \
-                Aggregator(TimeChopper([self.poller.poll(self.reader)]),
-                           aggregator_config,
-                           verbose_histogram)
+            readers = self.reader if isinstance(self.reader, Collection) else [self.reader]
+            chopper = self.chopper = TimeChopper(
+                [self.poller.poll(TimedSource(r, self.metrics)) for r in readers], self.lateness, self.late_data)
+            if self.max_tags > 0:
+                chopper = self.top_tags = TopTags(chopper, self.max_tags)
+            if self.workers > 0:
+                logger.info("Aggregating data in %s processes", self.workers)
+                pipeline = ParallelAggregator(chopper, aggregator_config, self.verbose_histogram, self.workers)
+            else:
+                pipeline = Aggregator(chopper, aggregator_config, self.verbose_histogram)
+            self.pipeline = pipeline
             self.drain = Drain(pipeline, self.results)
             self.drain.start()
             self.stats_drain = Drain(
@@ -93,7 +146,9 @@ class TankAggregator(object):
         logger.debug("Stats timestamps: %s" % [d.get('ts') for d in stats])
         for item in data:
             ts = item['ts']
-            if ts in self.stat_cache:
+            if item.get('correction'):
+                self.__notify_correction(item)
+            elif ts in self.stat_cache:
                 # send items
                 data_item = item
                 stat_item = self.stat_cache.pop(ts)
@@ -135,6 +190,8 @@ class TankAggregator(object):
             if self.drain.is_alive():
                 logger.warning('The gun drain didn\'t finish in time. Some data might be lost.')
             self.drain.close()
+            if isinstance(self.pipeline, ParallelAggregator):
+                self.pipeline.close()
 
             timeout = timeouter.get_remaining_timeout()
             logger.info('Waiting for stats drain to finish for %f seconds', timeout)
@@ -144,15 +201,46 @@ class TankAggregator(object):
             self.stats_drain.close()
         logger.info('Collecting remaining data')
         self._collect_data(end=True)
+        for notifier in self.notifiers:
+            notifier.close(timeouter.get_remaining_timeout())
+        if self.chopper and self.chopper.late_rows:
+            logger.warning('%s rows came after their second was aggregated, %s of them were dropped',
+                           self.chopper.late_rows, self.chopper.dropped_rows)
+        if self.top_tags and self.top_tags.folded_rows:
+            logger.warning('%s rows were aggregated as %s because of max tags limit',
+                           self.top_tags.folded_rows, OTHER_TAG)
+        self.metrics.close()
         return retcode
 
     def add_result_listener(self, listener):
         self.listeners.append(listener)
+        if self.listeners_queue > 0 and not getattr(listener, 'notify_synchronously', False):
+            self.notifiers.append(QueuedNotifier(listener, self.listeners_queue, self.listeners_overflow))
+        else:
+            self.notifiers.append(Notifier(listener))
 
     def __notify_listeners(self, data, stats):
         """ notify all listeners about aggregate data and stats """
-        for listener in self.listeners:
-            listener.on_aggregated_data(data, stats)
+        if self.windows:
+            self.windows.attach(data)
+        listeners_time = {}
+        listener_queues = {}
+        for notifier in self.notifiers:
+            notifier.put(data, stats)
+            listeners_time[notifier.name] = listeners_time.get(notifier.name, 0.) + notifier.notification_time
+            counters = notifier.counters()
+            if counters:
+                listener_queues[notifier.name] = counters
+        sample = self.metrics.sample(
+            data['ts'], self.chopper, self.pipeline,
+            {'results': self.results, 'stats_results': self.stats_results}, listeners_time, listener_queues)
+        if self.publish:
+            self.publish('pipeline', sample)
+
+    def __notify_correction(self, data):
+        """ pass aggregated late rows to listeners """
+        for notifier in self.notifiers:
+            notifier.correct(data)
 
 
 class _Timeouter:
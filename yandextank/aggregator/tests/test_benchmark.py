@@ -0,0 +1,28 @@
+import pytest
+
+from yandextank.aggregator.benchmark import PhoutGenerator, run, compare
+from yandextank.plugins.Phantom.reader import bytes_to_df
+
+
+class TestPhoutGenerator(object):
+    @pytest.mark.parametrize('latency', ['lognormal', 'exponential'])
+    def test_second(self, latency):
+        chunk = bytes_to_df(PhoutGenerator(1000, tags=3, latency=latency, error_rate=0.1).second(1500000000))
+        assert len(chunk) == 1000
+        assert (chunk.index == 1500000000).all()
+        assert set(chunk.tag.unique()) <= {'/api/handle0', '/api/handle1', '/api/handle2'}
+        assert 0 < (chunk.proto_code == 500).sum() < 200
+        assert (chunk.interval_real > 0).all()
+
+    def test_unknown_distribution(self):
+        with pytest.raises(ValueError):
+            PhoutGenerator(latency='uniform')
+
+
+def test_run():
+    results = run(PhoutGenerator(500, tags=5), duration=3, poll_period=0.05)
+    assert results['rows'] == 1500
+    assert results['seconds'] == 3
+    assert set(results['stages']) == {'parse', 'aggregation', 'collect', 'listeners'}
+    assert results['peak_rss_kb'] > 0
+    assert compare({'results': results}, {'results': results})['rows_per_second'] == 0
@@ -1,7 +1,8 @@
 import pandas as pd
 
 from conftest import MAX_TS, random_split
-from yandextank.aggregator.chopper import TimeChopper
+from yandextank.aggregator.chopper import TimeChopper, CORRECT, LATE
+from yandextank.aggregator.tags import TagDictionary
 
 
 class TestChopper(object):
@@ -19,3 +20,66 @@ class TestChopper(object):
         assert len(result) == MAX_TS
         concatinated = pd.concat(r[1] for r in result)
         assert len(data) == len(concatinated), "We did not lose anything"
+
+    def test_multiple_sources(self, data):
+        shuffled = data.sample(frac=1, random_state=0)
+        sources = [iter(random_split(shuffled.iloc[i::3].sort_index())) for i in range(3)]
+        chopper = TimeChopper(sources)
+        result = list(chopper)
+        assert [r[0] for r in result] == sorted(set(data.index))
+        assert sum(r[2] for r in result) == len(data)
+        assert chopper.cache_size == 0
+        assert chopper.oldest_ts is None
+
+    def test_unsorted_chunk(self, data):
+        chopper = TimeChopper([iter([data.iloc[::-1]])])
+        result = list(chopper)
+        assert len(result) == MAX_TS
+        for ts, chunk, rps in result:
+            assert (chunk.index == ts).all()
+            assert rps == len(chunk)
+
+    def test_encoded_tags(self, data):
+        tags = TagDictionary()
+        chunks = [chunk.assign(tag=tags.encode(chunk.tag)) for chunk in random_split(data)]
+        result = list(TimeChopper([iter(chunks)]))
+        for ts, chunk, rps in result:
+            assert chunk.tag.dtype == tags.dtype
+        concatinated = pd.concat(r[1] for r in result)
+        assert (concatinated.tag.astype(object) == data.tag).all()
+
+    def test_unrelated_categories(self, data):
+        chunks = [chunk.assign(tag=chunk.tag.astype('category')) for chunk in random_split(data)]
+        result = list(TimeChopper([iter(chunks)]))
+        assert all(isinstance(chunk.tag.dtype, pd.CategoricalDtype) for ts, chunk, rps in result)
+        concatinated = pd.concat(r[1] for r in result)
+        assert (concatinated.tag.astype(object) == data.tag).all()
+
+    def test_late_rows_dropped(self, data):
+        chunks = [data.loc[:9], data.loc[20:29], data.loc[5:5], data.loc[10:19], data.loc[30:]]
+        chopper = TimeChopper([iter(chunks)])
+        result = list(chopper)
+        assert sorted(r[0] for r in result) == sorted(set(data.index))
+        assert sum(r[2] for r in result) == len(data)
+        assert chopper.late_rows == chopper.dropped_rows == len(data.loc[5:5])
+
+    def test_allowed_lateness(self, data):
+        chunks = [data.loc[:9], data.loc[20:29], data.loc[5:5], data.loc[10:19], data.loc[30:]]
+        chopper = TimeChopper([iter(chunks)], lateness=25)
+        result = list(chopper)
+        assert [r[0] for r in result] == sorted(set(data.index))
+        assert dict((ts, rps) for ts, chunk, rps in result)[5] == 2 * len(data.loc[5:5])
+        assert chopper.late_rows == 0
+
+    def test_late_rows_corrections(self, data):
+        chunks = [data.loc[:9], data.loc[20:29], data.loc[5:5], data.loc[30:]]
+        chopper = TimeChopper([iter(chunks)], late_policy=CORRECT)
+        result = list(chopper)
+        corrections = [(ts, chunk) for ts, chunk, rps in result if chunk.attrs.get(LATE)]
+        assert len(corrections) == 1
+        ts, chunk = corrections[0]
+        assert ts == 5
+        assert chunk.equals(data.loc[5:5])
+        assert chopper.late_rows == len(chunk)
+        assert chopper.dropped_rows == 0
+        assert sum(r[2] for r in result) == len(data.loc[:9]) + len(data.loc[20:]) + len(chunk)
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from yandextank.aggregator.fanout import Notifier, QueuedNotifier, BLOCK, DROP_OLDEST, COALESCE
+from yandextank.aggregator.second import AggregatedSecond, ScalarColumn
+from yandextank.common.interfaces import AggregateResultListener
+
+
+class SlowListener(AggregateResultListener):
+    def __init__(self):
+        self.received = []
+        self.release = threading.Event()
+
+    def on_aggregated_data(self, data, stats):
+        self.release.wait(5)
+        self.received.append(data['ts'])
+
+
+class CorrectedListener(SlowListener):
+    def on_aggregated_correction(self, data):
+        self.received.append(('correction', data['ts']))
+
+
+class FailingListener(AggregateResultListener):
+    def on_aggregated_data(self, data, stats):
+        raise RuntimeError('failed to send {}'.format(data['ts']))
+
+
+def put_seconds(notifier, seconds):
+    for ts in seconds:
+        notifier.put({'ts': ts}, {'ts': ts})
+
+
+class TestNotifiers(object):
+    def test_synchronous(self):
+        listener = SlowListener()
+        listener.release.set()
+        notifier = Notifier(listener)
+        put_seconds(notifier, range(3))
+        assert listener.received == [0, 1, 2]
+        assert notifier.name == 'SlowListener'
+        assert notifier.counters() == {}
+
+    def test_block(self):
+        listener = SlowListener()
+        notifier = QueuedNotifier(listener, 2, BLOCK)
+        producer = threading.Thread(target=put_seconds, args=(notifier, range(5)))
+        producer.start()
+        producer.join(0.5)
+        # one second is being delivered, two are queued, the producer waits
+        assert producer.is_alive()
+        listener.release.set()
+        producer.join(5)
+        notifier.close(5)
+        assert listener.received == list(range(5))
+        assert notifier.counters()['dropped'] == 0
+
+    @pytest.mark.parametrize('overflow, expected, dropped', [
+        (DROP_OLDEST, [0, 3, 4, 5], 2),
+        (COALESCE, [0, 4, 5], 3),
+    ])
+    def test_overflow(self, overflow, expected, dropped):
+        listener = SlowListener()
+        notifier = QueuedNotifier(listener, 3, overflow)
+        notifier.put({'ts': 0}, {'ts': 0})
+        while notifier.counters()['pending']:
+            time.sleep(0.01)
+        # the listener is busy with the first second, others are queued
+        put_seconds(notifier, range(1, 6))
+        listener.release.set()
+        notifier.close(5)
+        assert listener.received == expected
+        assert notifier.dropped == dropped
+        assert notifier.delivered == len(expected)
+
+    def test_late(self):
+        listener = SlowListener()
+        notifier = QueuedNotifier(listener, 10, late_after=0.1)
+        put_seconds(notifier, range(3))
+        threading.Timer(0.3, listener.release.set).start()
+        notifier.close(5)
+        assert listener.received == [0, 1, 2]
+        assert notifier.late == 2
+
+    def test_error(self):
+        notifier = QueuedNotifier(FailingListener(), 10)
+        notifier.put({'ts': 0}, {'ts': 0})
+        notifier.close(5)
+        with pytest.raises(RuntimeError):
+            notifier.put({'ts': 1}, {'ts': 1})
+
+    @pytest.mark.parametrize('queued', [False, True])
+    def test_corrections(self, queued):
+        listener = CorrectedListener()
+        listener.release.set()
+        notifier = QueuedNotifier(listener, 10) if queued else Notifier(listener)
+        put_seconds(notifier, range(2))
+        notifier.correct({'ts': 0, 'correction': True})
+        put_seconds(notifier, range(2, 3))
+        notifier.close(5)
+        assert listener.received == [0, 1, ('correction', 0), 2]
+        # listeners without on_aggregated_correction don't get corrections
+        Notifier(object()).correct({'ts': 0, 'correction': True})
+
+    def test_unknown_overflow(self):
+        with pytest.raises(ValueError):
+            QueuedNotifier(SlowListener(), 10, 'drop_newest')
+
+    def test_copies(self):
+        listener = CorrectedListener()
+        listener.on_aggregated_data = lambda data, stats: listener.received.append(data)
+        second = AggregatedSecond(0, ['a'], {'interval_real': {'len': ScalarColumn([3])}},
+                                  {'interval_real': {'len': 3}})
+        notifier = QueuedNotifier(listener, 10)
+        notifier.put(second, {'ts': 0})
+        notifier.close(5)
+        # the lazy second is not shared with the listener thread
+        received, = listener.received
+        assert type(received) is dict
+        assert received['tagged'] == {'a': {'interval_real': {'len': 3}}}
+        assert received['overall'] is not second['overall']
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from yandextank.aggregator.histogram import BinLayout, DEFAULT_LAYOUT
+
+VERBOSE_BINS = np.concatenate((
+    np.linspace(0, 4990, 500),
+    np.linspace(5000, 9900, 50),
+    np.linspace(10, 499, 490) * 1000,
+    np.linspace(500, 2995, 500) * 1000,
+    np.linspace(3000, 9990, 700) * 1000,
+    np.linspace(10000, 29950, 400) * 1000,
+    np.linspace(30000, 119900, 900) * 1000,
+    np.linspace(120, 300, 181) * 1000000,
+))
+
+COMPACT_BINS = np.array([
+    0, 1, 2, 3, 4, 5, 6, 7, 8, 9,
+    10, 20, 30, 40, 50, 60, 70, 80, 90,
+    100, 150, 200, 250, 300, 350, 400, 450,
+    500, 600, 650, 700, 750, 800, 850, 900, 950,
+    1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500,
+    5000, 5500, 6000, 6500, 7000, 7500, 8000, 8500, 9000, 9500, 10000, 11000,
+    12000, 13000, 14000, 15000, 20000, 25000, 30000, 35000, 40000, 45000, 50000,
+    55000, 60000,
+]) * 1000
+
+
+@pytest.mark.parametrize('mode, bins', [('verbose', VERBOSE_BINS), ('compact', COMPACT_BINS)])
+def test_default_layout(mode, bins):
+    # the layout of config/phout.json gives the edges that used to be hard-coded
+    layout = BinLayout(DEFAULT_LAYOUT[mode])
+    assert np.array_equal(layout.edges, bins)
+    assert layout.size == len(bins) - 1
+
+
+@pytest.mark.parametrize('mode, bins', [('verbose', VERBOSE_BINS), ('compact', COMPACT_BINS)])
+def test_index_matches_np_histogram(mode, bins):
+    layout = BinLayout(DEFAULT_LAYOUT[mode])
+    rng = np.random.default_rng(0)
+    values = np.concatenate((
+        rng.lognormal(10, 3, 100000).astype(np.int64),
+        bins.astype(np.int64), bins.astype(np.int64) - 1, [-1, int(bins[-1]) + 1]))
+    index = layout.index(values)
+    expected, _ = np.histogram(values, bins=bins)
+    assert np.array_equal(np.bincount(index[index >= 0], minlength=layout.size), expected)
+    assert (index[values > bins[-1]] == -1).all()
+
+
+def test_invalid_layout():
+    with pytest.raises(ValueError):
+        BinLayout([{"from": 0, "step": 10, "count": 5}, {"from": 60, "step": 10, "count": 5}])
+    with pytest.raises(ValueError):
+        BinLayout([])
@@ -0,0 +1,58 @@
+import json
+import queue
+
+from yandextank.aggregator import TankAggregator
+from yandextank.aggregator.aggregator import Aggregator
+from yandextank.aggregator.chopper import TimeChopper
+from yandextank.aggregator.metrics import PipelineMetrics, TimedSource
+
+AGGR_CONFIG = TankAggregator.load_config()
+
+
+class WaitingReader(object):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.waited = []
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def wait(self, timeout):
+        self.waited.append(timeout)
+
+
+class TestPipelineMetrics(object):
+    def test_timed_source(self, data):
+        metrics = PipelineMetrics()
+        reader = WaitingReader([data.loc[:10], None, data.loc[11:20]])
+        source = TimedSource(reader, metrics)
+        assert len(list(source)) == 3
+        source.wait(0.5)
+        assert reader.waited == [0.5]
+        sample = metrics.sample(100)
+        assert sample['reader']['rows'] == len(data.loc[:20])
+        assert sample['reader']['parse_time'] >= 0
+        # counters are reset by every sample
+        assert metrics.sample(101)['reader']['rows'] == 0
+
+    def test_sample(self, data, tmp_path):
+        filename = str(tmp_path / 'pipeline_metrics.jsonl')
+        metrics = PipelineMetrics(filename)
+        chopper = TimeChopper([iter([data.loc[:10]])])
+        pipeline = Aggregator(chopper, AGGR_CONFIG, True)
+        results = queue.Queue()
+        seconds = iter(pipeline)
+        for _ in range(3):
+            second = next(seconds)
+            results.put(second)
+            metrics.sample(second['ts'], chopper, pipeline, {'results': results}, {'console': 0.01})
+        metrics.close()
+        with open(filename) as lines:
+            samples = [json.loads(line) for line in lines]
+        assert [s['ts'] for s in samples] == [second['ts'] - 2, second['ts'] - 1, second['ts']]
+        assert [s['queues']['results'] for s in samples] == [1, 2, 3]
+        assert all(s['aggregation_time'] > 0 for s in samples)
+        assert all(s['listeners'] == {'console': 0.01} for s in samples)
+        assert samples[-1]['chopper']['cache_size'] == chopper.cache_size
+        assert samples[-1]['chopper']['oldest_ts'] == chopper.oldest_ts
+        assert metrics.last['ts'] == second['ts']
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+from yandextank.aggregator import TankAggregator
+from yandextank.aggregator.aggregator import Aggregator
+from yandextank.aggregator.chopper import TimeChopper
+from yandextank.aggregator.offline import OfflineAggregator, split_ranges
+from yandextank.common.util import get_test_path
+from yandextank.plugins.Bfg.reader import bfgout_to_df
+from yandextank.plugins.Phantom.reader import bytes_to_df
+
+AGGR_CONFIG = TankAggregator.load_config()
+PHOUT = os.path.join(get_test_path(), 'yandextank/aggregator/tests/phout1')
+# receive_ts, tag, interval_real, connect_time, send_time, latency, receive_time, interval_event,
+# size_out, size_in, net_code, proto_code, send_delay
+BFGOUT = b'1500000000.999\turl1#0\t1500\t0\t0\t0\t0\t1500\t10\t20\t0\t200\t250000\n' \
+    b'1500000001.001\turl2\t2500\t0\t0\t0\t0\t2500\t10\t20\t0\t404\t0\n'
+
+
+@pytest.fixture
+def expected():
+    with open(PHOUT, 'rb') as f:
+        return list(Aggregator(TimeChopper([iter([bytes_to_df(f.read())])]), AGGR_CONFIG, True))
+
+
+class TestOfflineAggregator(object):
+    def test_split_ranges(self):
+        ranges = split_ranges(PHOUT, 7)
+        assert len(ranges) == 7
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == os.path.getsize(PHOUT)
+        with open(PHOUT, 'rb') as f:
+            for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+                assert end == next_start
+                f.seek(end - 1)
+                assert f.read(1) == b'\n'
+
+    @pytest.mark.parametrize('workers', [0, 2])
+    def test_aggregate(self, expected, workers):
+        results = OfflineAggregator(PHOUT, workers=workers, lateness=2).aggregate()
+        assert [r['ts'] for r in results] == [r['ts'] for r in expected]
+        assert results == expected
+
+    def test_late_rows(self, expected, tmp_path):
+        filename = str(tmp_path / 'phout')
+        with open(PHOUT, 'rb') as f:
+            lines = f.readlines()
+        # the first response comes at the very end of the file
+        with open(filename, 'wb') as f:
+            f.writelines(lines[1:] + lines[:1])
+        aggregator = OfflineAggregator(filename, lateness=2)
+        results = aggregator.aggregate()
+        assert aggregator.late_rows == 1
+        assert sum(r['overall']['interval_real']['len'] for r in results) == len(lines) - 1
+
+    def test_write_json(self, expected, tmp_path):
+        output = str(tmp_path / 'test_data.log')
+        assert OfflineAggregator(PHOUT).write_json(output) == len(expected)
+        with open(output) as f:
+            items = [json.loads(line) for line in f]
+        assert [item['data']['ts'] for item in items] == [r['ts'] for r in expected]
+        assert items[-1]['stats']['ts'] == expected[-1]['ts']
+        assert items[-1]['data']['cumulative']['len'] == sum(r['overall']['interval_real']['len'] for r in expected)
+
+    def test_bfgout(self, tmp_path):
+        chunk = bfgout_to_df(BFGOUT)
+        # rows are in the seconds they were received in, even if they were sent in the previous one
+        assert chunk.index.tolist() == [1500000000, 1500000001]
+        assert chunk.receive_ts.tolist() == [1500000000.999, 1500000001.001]
+        assert chunk.send_ts.tolist() == pytest.approx([1500000000.9975, 1500000000.9985])
+        assert chunk.tag.tolist() == ['url1', 'url2']
+        assert chunk.send_delay.tolist() == [250000, 0]
+
+        filename = str(tmp_path / 'bfgout.log')
+        with open(filename, 'wb') as f:
+            f.write(BFGOUT)
+        results = OfflineAggregator(filename, fmt='bfg').aggregate()
+        assert [r['ts'] for r in results] == [1500000000, 1500000001]
+        assert [r['overall']['proto_code']['count'] for r in results] == [{'200': 1}, {'404': 1}]
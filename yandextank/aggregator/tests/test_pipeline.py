@@ -10,8 +10,9 @@ from yandextank.common.util import get_test_path
 from conftest import MAX_TS, random_split
 
 from yandextank.aggregator import TankAggregator
-from yandextank.aggregator.aggregator import Aggregator, DataPoller
-from yandextank.aggregator.chopper import TimeChopper
+from yandextank.aggregator.aggregator import Aggregator, DataPoller, ParallelAggregator
+from yandextank.aggregator.chopper import TimeChopper, CORRECT
+from yandextank.aggregator.tags import TopTags
 from yandextank.plugins.Phantom.reader import string_to_df
 from yandextank.contrib.netort.netort.data_processing import Drain
 
@@ -53,6 +54,52 @@ class TestPipeline(object):
         drain.run()
         assert results_queue.qsize() == MAX_TS
 
+    def test_parallel_aggregator(self, data):
+        # the last chunk is late
+        chunks = list(random_split(data.loc[:300])) + [data.loc[5:5]]
+        expected = list(Aggregator(TimeChopper([iter(chunks)], late_policy=CORRECT), AGGR_CONFIG, False))
+        pipeline = ParallelAggregator(TimeChopper([iter(chunks)], late_policy=CORRECT), AGGR_CONFIG, False, workers=2)
+        results = list(pipeline)
+        assert [r['ts'] for r in results] == [r['ts'] for r in expected]
+        assert results == expected
+        assert [r['ts'] for r in results if r.get('correction')] == [5]
+
+    def test_parallel_aggregator_source_error(self, data):
+        def source():
+            yield from TimeChopper([iter(random_split(data.loc[:10]))])
+            raise ValueError('broken reader')
+
+        pipeline = ParallelAggregator(source(), AGGR_CONFIG, False, workers=1)
+        results = []
+        with pytest.raises(ValueError, match='broken reader'):
+            for result in pipeline:
+                results.append(result['ts'])
+        # seconds before the error are aggregated
+        assert results == list(range(11))
+
+    def test_parallel_aggregator_close(self, data):
+        def endless():
+            while True:
+                yield from TimeChopper([iter(random_split(data.loc[:10]))])
+
+        pipeline = ParallelAggregator(endless(), AGGR_CONFIG, False, workers=1, max_pending=1)
+        results = iter(pipeline)
+        next(results)
+        pipeline.close()
+        pipeline.feeder.join(5)
+        assert not pipeline.feeder.is_alive()
+
+    def test_max_tags(self, data):
+        chunks = list(random_split(data.loc[:100]))
+        expected = list(Aggregator(TimeChopper([iter(chunks)]), AGGR_CONFIG, False))
+        results = list(Aggregator(TopTags(TimeChopper([iter(chunks)]), 2), AGGR_CONFIG, False))
+        assert [r['ts'] for r in results] == [r['ts'] for r in expected]
+        for result, expected_result in zip(results, expected):
+            assert len(result['tagged']) <= 3
+            assert result['overall'] == expected_result['overall']
+            assert sum(tag['interval_real']['len'] for tag in result['tagged'].values()) == \
+                sum(tag['interval_real']['len'] for tag in expected_result['tagged'].values())
+
     @pytest.mark.parametrize('phout, expected_results', [
         ('yandextank/aggregator/tests/phout2927', 'yandextank/aggregator/tests/phout2927res.jsonl')
     ])
@@ -0,0 +1,72 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from yandextank.aggregator import TankAggregator
+from yandextank.aggregator.aggregator import Aggregator, ColumnarWorker, Worker
+from yandextank.aggregator.chopper import TimeChopper
+from yandextank.aggregator.second import AggregatedSecond
+from yandextank.common.util import get_test_path
+from yandextank.plugins.JsonReport.plugin import NumpyEncoder
+from yandextank.plugins.Phantom.reader import string_to_df
+
+AGGR_CONFIG = TankAggregator.load_config()
+
+
+@pytest.fixture
+def data():
+    with open(os.path.join(get_test_path(), 'yandextank/aggregator/tests/phout1')) as f:
+        return string_to_df(f.read())
+
+
+def aggregated(data, worker_class=ColumnarWorker):
+    return list(Aggregator(TimeChopper([iter([data])]), AGGR_CONFIG, True, worker_class))
+
+
+class TestAggregatedSecond(object):
+    def test_same_as_dicts(self, data):
+        worker = Worker(AGGR_CONFIG, True)
+        for second in aggregated(data):
+            assert isinstance(second, AggregatedSecond)
+            tagged, overall = worker.aggregate_tagged(data.loc[[second['ts']]], 'tag')
+            expected = {'ts': second['ts'], 'tagged': tagged, 'overall': overall, 'counted_rps': second['counted_rps']}
+            assert json.loads(json.dumps(second, cls=NumpyEncoder)) == json.loads(json.dumps(expected, cls=NumpyEncoder))
+            assert json.dumps(second, default=dict) == json.dumps(second, cls=NumpyEncoder)
+
+    def test_tags_are_built_on_access(self, data):
+        second = aggregated(data)[0]
+        tagged = second['tagged']
+        assert not tagged._cache
+        tag = second.tags[0]
+        assert tagged.get(tag)['interval_real']['len'] == second.column('interval_real', 'len')[0]
+        assert list(tagged._cache) == [tag]
+        assert tagged[tag] is tagged.get(tag)
+        assert len(tagged) == len(second.tags) and list(tagged) == list(second.tags)
+
+    def test_columns(self, data):
+        second = aggregated(data)[0]
+        lengths = second.column('interval_real', 'len')
+        assert isinstance(lengths, np.ndarray)
+        assert lengths.sum() == second['overall']['interval_real']['len']
+        totals = second.column('interval_real', 'total')
+        assert totals.tolist() == [second['tagged'][tag]['interval_real']['total'] for tag in second.tags]
+
+    def test_mutable_extras(self, data):
+        second = aggregated(data)[0]
+        second['cumulative'] = {'len': 1}
+        second['correction'] = True
+        assert list(second) == ['ts', 'tagged', 'overall', 'counted_rps', 'cumulative', 'correction']
+        del second['correction']
+        assert 'correction' not in second and second.get('cumulative') == {'len': 1}
+
+    def test_pickle(self, data):
+        second = aggregated(data)[0]
+        second['cumulative'] = {'len': 1}
+        assert pickle.loads(pickle.dumps(second)) == second
+
+    def test_worker_columns(self, data):
+        # Worker builds columns from dicts, seconds are the same
+        assert aggregated(data, Worker) == aggregated(data)
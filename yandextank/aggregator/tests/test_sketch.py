@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from yandextank.aggregator.sketch import LatencySketch, merge_sketches
+
+PERCENTILES = [0, 10, 50, 75, 90, 95, 99, 99.9, 100]
+
+
+@pytest.fixture
+def latencies():
+    rng = np.random.default_rng(42)
+    return rng.lognormal(10, 1.5, 100000).astype(np.int64)
+
+
+@pytest.mark.parametrize('alpha', [0.01, 0.05])
+def test_relative_accuracy(latencies, alpha):
+    sketch = LatencySketch.from_values(latencies, alpha)
+    expected = np.percentile(latencies, PERCENTILES, method='lower')
+    estimated = np.array(sketch.quantiles(PERCENTILES))
+    assert np.all(np.abs(estimated - expected) <= alpha * expected)
+
+
+def test_merge_equals_whole(latencies):
+    parts = np.array_split(latencies, 7)
+    merged = merge_sketches(LatencySketch.from_values(part).to_dict() for part in parts)
+    whole = LatencySketch.from_values(latencies)
+    assert merged.to_dict() == whole.to_dict()
+    assert len(merged) == len(latencies)
+
+
+def test_subtract(latencies):
+    first, second = latencies[:1000], latencies[1000:]
+    sketch = LatencySketch.from_values(first).merge(LatencySketch.from_values(second))
+    sketch.subtract(LatencySketch.from_values(first))
+    assert sketch.to_dict() == LatencySketch.from_values(second).to_dict()
+
+
+def test_zeros():
+    sketch = LatencySketch.from_values([0, 0, 0, 1000])
+    assert sketch.zero == 3
+    assert sketch.quantiles([50, 100]) == [0, pytest.approx(1000, rel=0.01)]
+    assert LatencySketch().quantile(50) is None
+
+
+def test_incompatible_merge():
+    with pytest.raises(ValueError):
+        LatencySketch(0.01).merge(LatencySketch(0.02))
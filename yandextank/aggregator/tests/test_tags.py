@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from yandextank.aggregator.tags import TagDictionary, SpaceSaving, TopTags, OTHER_TAG
+
+
+class TestTagDictionary(object):
+    def test_encode(self):
+        tags = TagDictionary()
+        first = tags.encode(pd.Series(['b', 'a', np.nan, 'b']))
+        second = tags.encode(pd.Series(['c', 'a'], dtype='category'))
+        assert list(first.codes) == [0, 1, -1, 0]
+        assert list(second.codes) == [2, 1]
+        assert list(second.categories) == ['b', 'a', 'c']
+        assert list(first.categories) == list(second.categories)[:len(first.categories)]
+        assert len(tags) == 3
+        assert 'c' in tags
+
+    def test_dtype_is_reused(self):
+        tags = TagDictionary()
+        first = tags.encode(pd.Series(['a', 'b']))
+        second = tags.encode(pd.Series(['b', 'b']))
+        assert first.categories is second.categories
+
+    def test_encode_chunk(self):
+        chunk = pd.DataFrame({'tag': ['x', '', 'x'], 'interval_real': [1, 2, 3]})
+        TagDictionary().encode_chunk(chunk)
+        assert isinstance(chunk.tag.dtype, pd.CategoricalDtype)
+        assert list(chunk.tag) == ['x', '', 'x']
+
+
+class TestSpaceSaving(object):
+    def test_heavy_hitters(self):
+        hitters = SpaceSaving(4)
+        for second in range(10):
+            tags = ['a'] * 50 + ['b'] * 20 + ['c{}'.format(second)] * 5 + ['d{}'.format(second)]
+            hitters.update(pd.Series(tags).value_counts())
+        assert len(hitters.counts) == 4
+        assert list(hitters.top(2)) == ['a', 'b']
+        assert hitters.counts['a'] == 500
+        assert hitters.floor <= 6 * 10
+
+
+class TestTopTags(object):
+    @staticmethod
+    def chunk(tags):
+        return pd.DataFrame({'tag': tags, 'interval_real': np.arange(len(tags))})
+
+    def test_no_folding_under_limit(self):
+        chunk = self.chunk(['a', 'b', np.nan])
+        top_tags = TopTags(iter([(1, chunk, 3)]), max_tags=2)
+        assert list(top_tags)[0][1] is chunk
+        assert top_tags.folded_rows == 0
+
+    def test_fold(self):
+        chunks = [(ts, self.chunk(['a'] * 10 + ['b'] * 5 + ['x{}'.format(ts)] * 2 + [np.nan]), 18)
+                  for ts in range(5)]
+        top_tags = TopTags(iter(chunks), max_tags=2)
+        result = list(top_tags)
+        for ts, chunk, rps in result:
+            assert list(chunk.tag.value_counts()[['a', 'b', OTHER_TAG]]) == [10, 5, 2]
+            assert chunk.tag.isna().sum() == 1
+            assert len(chunk) == 18
+        assert top_tags.folded_rows == 2 * len(result)
+
+    def test_fold_encoded(self):
+        tags = TagDictionary()
+        chunks = [(ts, self.chunk(['x{}'.format(ts)] + ['a'] * 3).assign(tag=lambda df: tags.encode(df.tag)), 4)
+                  for ts in range(5)]
+        result = list(TopTags(iter(chunks), max_tags=1))
+        assert set(result[-1][1].tag) == {'a', OTHER_TAG}
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from yandextank.aggregator import TankAggregator
+from yandextank.aggregator.aggregator import Aggregator
+from yandextank.aggregator.chopper import TimeChopper
+from yandextank.aggregator.histogram import BinLayout, DEFAULT_LAYOUT
+from yandextank.aggregator.windows import HistogramWindows, CONSOLE_WINDOW
+
+AGGR_CONFIG = TankAggregator.load_config()
+
+
+def hist_to_quant(histogram, quant):
+    """ how Console used to calculate quantiles from accumulated histograms """
+    cumulative = histogram.cumsum()
+    total = cumulative.max()
+    positions = cumulative.searchsorted([float(i) / 100 * total for i in quant])
+    return [cumulative.index[i] for i in positions]
+
+
+class TestHistogramWindows(object):
+    def test_windows(self, data):
+        seconds = list(Aggregator(TimeChopper([iter([data.loc[:100]])]), AGGR_CONFIG, True))
+        windows = HistogramWindows(BinLayout(DEFAULT_LAYOUT['verbose']), windows=(10, 60))
+        dists = []
+        for second in seconds:
+            windows.attach(second)
+            hist = second['overall']['interval_real']['hist']
+            dists.append((second['ts'], pd.Series(hist['data'], index=hist['bins'])))
+            overall = pd.concat([dist for ts, dist in dists]).groupby(level=0).sum()
+            assert second['cumulative']['q']['value'] == hist_to_quant(overall, windows.percentiles)
+            assert second['cumulative']['len'] == overall.sum()
+            for size in (10, 60):
+                window = pd.concat([dist for ts, dist in dists if second['ts'] - ts < size]).groupby(level=0).sum()
+                assert second['windows'][size]['q']['value'] == hist_to_quant(window, windows.percentiles)
+                assert second['windows'][size]['len'] == window.sum()
+
+    def test_empty(self):
+        windows = HistogramWindows(BinLayout(DEFAULT_LAYOUT['verbose']))
+        data = windows.attach({'ts': 1, 'overall': {'interval_real': {'hist': {'data': [], 'bins': []}}}})
+        assert data['cumulative']['len'] == 0
+        assert data['windows'][60]['q']['value'] == [None] * len(windows.percentiles)
+        assert np.count_nonzero(windows.cumulative) == 0
+
+    def test_console_window_always_kept(self):
+        assert TankAggregator(None, None, windows=[10]).window_sizes == [10, CONSOLE_WINDOW]
+        assert TankAggregator(None, None, windows=[]).window_sizes == [CONSOLE_WINDOW]
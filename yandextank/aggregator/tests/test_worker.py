@@ -0,0 +1,99 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from yandextank.aggregator import TankAggregator, TagDictionary
+from yandextank.aggregator.aggregator import Worker, ColumnarWorker, CORRECTED_COLUMN
+from yandextank.common.util import get_test_path
+from yandextank.plugins.Phantom.reader import string_to_df
+
+AGGR_CONFIG = TankAggregator.load_config()
+
+
+def as_json(item):
+    if isinstance(item, tuple):
+        return [as_json(i) for i in item]
+    if isinstance(item, dict):
+        item = {str(key): value for key, value in item.items()}
+    return json.loads(json.dumps(item, default=lambda o: o.item()))
+
+
+@pytest.mark.parametrize('verbose_histogram', [True, False])
+def test_columnar_worker_matches_worker(data, verbose_histogram):
+    worker = Worker(AGGR_CONFIG, verbose_histogram)
+    columnar = ColumnarWorker(AGGR_CONFIG, verbose_histogram)
+    for ts, chunk in data.loc[:100].groupby(level=0):
+        assert as_json(columnar.aggregate_tagged(chunk, 'tag')) == as_json(worker.aggregate_tagged(chunk, 'tag'))
+
+
+@pytest.mark.parametrize('phout', ['yandextank/aggregator/tests/phout1'])
+def test_columnar_worker_phout(phout):
+    with open(os.path.join(get_test_path(), phout)) as f:
+        df = string_to_df(f.read())
+    df.loc[df.index[::7], 'tag'] = np.nan
+    worker = Worker(AGGR_CONFIG, True)
+    columnar = ColumnarWorker(AGGR_CONFIG, True)
+    for ts, chunk in df.groupby(level=0):
+        tagged, overall = columnar.aggregate_tagged(chunk, 'tag')
+        expected_tagged, expected_overall = worker.aggregate_tagged(chunk, 'tag')
+        assert as_json(tagged) == as_json(expected_tagged)
+        assert as_json(overall) == as_json(expected_overall)
+        assert overall['interval_real']['len'] == len(chunk)
+
+
+def test_columnar_worker_encoded_tags():
+    with open(os.path.join(get_test_path(), 'yandextank/aggregator/tests/phout1')) as f:
+        df = string_to_df(f.read())
+    df.loc[df.index[::7], 'tag'] = np.nan
+    encoded = df.assign(tag=TagDictionary().encode(df.tag))
+    columnar = ColumnarWorker(AGGR_CONFIG, True)
+    worker = Worker(AGGR_CONFIG, True)
+    for ts, chunk in df.groupby(level=0):
+        expected = as_json(columnar.aggregate_tagged(chunk, 'tag'))
+        assert as_json(columnar.aggregate_tagged(encoded.loc[[ts]], 'tag')) == expected
+        assert as_json(worker.aggregate_tagged(encoded.loc[[ts]], 'tag')) == expected
+
+
+def test_count_sparse_codes(data):
+    chunk = data.loc[:10].assign(net_code=lambda df: df.net_code * 10 ** 9)
+    config = {"net_code": ["count"], "proto_code": ["count"]}
+    expected = Worker(config, False).aggregate_tagged(chunk, 'tag')
+    assert as_json(ColumnarWorker(config, False).aggregate_tagged(chunk, 'tag')) == as_json(expected)
+
+
+@pytest.mark.parametrize('min_partition_rows', [0, 10 ** 9])
+def test_configurable_quantiles(data, min_partition_rows):
+    chunk = data.loc[:10]
+    tag = chunk.tag.iloc[0]
+    config = {
+        "interval_real": ["q"],
+        "quantiles": {"default": [99, 50, 99.9], "tagged": {tag: [99.99, 10]}},
+    }
+    columnar = ColumnarWorker(config, False)
+    columnar.MIN_PARTITION_ROWS = min_partition_rows
+    for worker in (Worker(config, False), columnar):
+        tagged, overall = worker.aggregate_tagged(chunk, 'tag')
+        assert overall['interval_real']['q']['q'] == [50, 99, 99.9]
+        assert overall['interval_real']['q']['value'] == np.percentile(chunk.interval_real, [50, 99, 99.9]).tolist()
+        for name, result in tagged.items():
+            percentiles = [10, 50, 99, 99.9, 99.99] if name == tag else [50, 99, 99.9]
+            values = chunk.interval_real[chunk.tag == name]
+            assert result['interval_real']['q']['q'] == percentiles
+            assert result['interval_real']['q']['value'] == pytest.approx(np.percentile(values, percentiles).tolist())
+
+
+@pytest.mark.parametrize('worker_class', [Worker, ColumnarWorker])
+def test_send_delay(data, worker_class):
+    config = {"interval_real": ["total", "q"], "send_delay": ["max", "len"], CORRECTED_COLUMN: ["total", "q"]}
+    chunk = data.loc[:10]
+    tagged, overall = worker_class(config, False).aggregate_tagged(chunk.assign(send_delay=1000), 'tag')
+    assert overall['send_delay'] == {"max": 1000, "len": len(chunk)}
+    assert overall[CORRECTED_COLUMN]['total'] == overall['interval_real']['total'] + 1000 * len(chunk)
+    corrected = overall[CORRECTED_COLUMN]['q']['value']
+    assert corrected == pytest.approx([value + 1000 for value in overall['interval_real']['q']['value']])
+    # readers that don't know the plan have no send_delay
+    tagged, overall = worker_class(config, False).aggregate_tagged(chunk, 'tag')
+    assert list(overall) == ['interval_real']
+    assert all(list(result) == ['interval_real'] for result in tagged.values())
@@ -0,0 +1,68 @@
+"""
+Cumulative and sliding window response time distributions. Aggregated
+seconds are added to dense histograms and subtracted when they leave a
+window, so quantiles for the whole test or the last minute are ready for
+every second without re-reading the history.
+"""
+from collections import deque
+
+import numpy as np
+
+DEFAULT_WINDOWS = (10, 60)
+# Console shows last minute quantiles, so the tank always keeps this window
+CONSOLE_WINDOW = 60
+DEFAULT_PERCENTILES = (10, 20, 30, 40, 50, 60, 70, 75, 80, 85, 90, 95, 99, 99.5, 100)
+
+
+class HistogramWindows(object):
+    """
+    :param layout: histogram layout the aggregated seconds are binned with
+    :type layout: yandextank.aggregator.histogram.BinLayout
+    :param windows: window sizes in seconds
+    :param percentiles: percentiles reported for every window
+    """
+
+    def __init__(self, layout, windows=DEFAULT_WINDOWS, percentiles=DEFAULT_PERCENTILES):
+        self.layout = layout
+        self.percentiles = list(percentiles)
+        self.cumulative = np.zeros(layout.size, dtype=np.int64)
+        self.windows = {size: np.zeros(layout.size, dtype=np.int64) for size in sorted(set(windows))}
+        self._seconds = {size: deque() for size in self.windows}
+
+    def add(self, ts, hist):
+        """
+        :param hist: aggregated histogram of a second, {"data": [...], "bins": [...]}
+        """
+        index = np.searchsorted(self.layout.edges, hist['bins']) - 1
+        data = np.asarray(hist['data'], dtype=np.int64)
+        self.cumulative[index] += data
+        for size, window in self.windows.items():
+            seconds = self._seconds[size]
+            window[index] += data
+            seconds.append((ts, index, data))
+            while ts - seconds[0][0] >= size:
+                _, expired_index, expired_data = seconds.popleft()
+                window[expired_index] -= expired_data
+
+    def quantiles(self, histogram):
+        """ quantiles of a dense histogram as upper edges of bins, the same way as in Console """
+        cumulative = np.cumsum(histogram)
+        total = cumulative[-1].item()
+        if not total:
+            return {"q": self.percentiles, "value": [None for _ in self.percentiles]}, 0
+        positions = np.searchsorted(cumulative, np.array(self.percentiles) / 100 * total)
+        return {"q": self.percentiles, "value": self.layout.upper_edges(positions).tolist()}, total
+
+    def summary(self, histogram):
+        quantiles, total = self.quantiles(histogram)
+        return {"len": total, "q": quantiles}
+
+    def attach(self, data):
+        """
+        Add aggregated second to the windows and put their summaries into it:
+        data["cumulative"] for the whole test and data["windows"][<size>] for windows
+        """
+        self.add(data['ts'], data['overall']['interval_real']['hist'])
+        data['cumulative'] = self.summary(self.cumulative)
+        data['windows'] = {size: self.summary(window) for size, window in self.windows.items()}
+        return data
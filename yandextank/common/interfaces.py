@@ -126,7 +126,14 @@ class MonitoringDataListener(object):
 
 class AggregateResultListener(object):
     """ Listener interface
-    parent class for Aggregate results listeners"""
+    parent class for Aggregate results listeners
+
+    Listeners are notified synchronously from the core loop. Slow ones
+    (e.g. uploaders) unset notify_synchronously to be notified from threads
+    of their own when aggregator_listeners_queue is set, so that they don't
+    hold up the core loop; they get copies of aggregated seconds."""
+
+    notify_synchronously = True
 
     def on_aggregated_data(self, data, stats):
         """
@@ -135,16 +142,33 @@ class AggregateResultListener(object):
         data contains aggregated metrics and stats contain non-aggregated
         metrics from gun (like instances count, for example)
 
+        data is a mapping (yandextank.aggregator.second.AggregatedSecond)
+        with dict-like values; tags are converted to dicts only when they are
+        looked up. Serialize it with json.dumps(data, default=dict)
+
         data and stats are cached and synchronized by timestamp. Stat items
         are holded until corresponding data item is received and vice versa.
         """
         raise NotImplementedError("Abstract method should be overridden")
 
+    def on_aggregated_correction(self, data):
+        """
+        notification about rows that came after their second was passed to
+        on_aggregated_data (only with aggregator_late_data: correct)
+
+        data has the same format as in on_aggregated_data and "correction"
+        set to True, it is aggregated from the late rows only and should be
+        added to what was received for that second earlier
+        """
+        pass
+
 
 class AbstractInfoWidget(object):
     """ InfoWidgets interface
     parent class for all InfoWidgets"""
 
+    notify_synchronously = True
+
     def __init__(self):
         pass
 
@@ -1,9 +1,10 @@
 import socket
+import time
 from threading import Thread, Event
 
 import pytest
 from queue import Queue
-from yandextank.common.util import FileScanner, FileMultiReader
+from yandextank.common.util import FileScanner, FileMultiReader, FileTailer, SignallingQueue
 from yandextank.common.util import AddressWizard, SecuredShell
 
 from yandextank.contrib.netort.netort.data_processing import Drain, Chopper
@@ -42,6 +43,18 @@ class TestDrain(object):
         drain.join()
         assert destination.qsize() == 1000000
 
+    def test_signal_destination(self):
+        """
+        Test consumer is woken up by the drain
+        """
+        ready = Event()
+        destination = SignallingQueue(ready)
+        drain = Drain(range(5), destination)
+        drain.start()
+        assert ready.wait(5)
+        drain.join()
+        assert destination.qsize() == 5
+
 
 class TestChopper(object):
     def test_output(self):
@@ -196,6 +209,41 @@ class TestFileMultiReader(object):
         assert len(errors) == 0
 
 
+class TestFileTailer(object):
+
+    def test_read_growing_file(self, tmp_path):
+        filename = str(tmp_path / 'phout')
+        stop = Event()
+        with open(filename, 'wb') as f:
+            tailer = FileTailer(filename, stop, cache_size=10)
+            assert tailer.read_lines() == b''
+            f.write(b'line1\nline2\nli')
+            f.flush()
+            assert tailer.read_lines() == b'line1\n'
+            assert tailer.read_lines() == b'line2\n'
+            assert tailer.read_lines() == b''
+            f.write(b'ne3 is long\nline4')
+            f.flush()
+            assert tailer.read_lines() == b'line3 is long\n'
+            stop.set()
+            assert tailer.read_lines() is None
+        tailer.close()
+
+    def test_wait(self, tmp_path):
+        filename = str(tmp_path / 'phout')
+        stop = Event()
+        with open(filename, 'wb') as f:
+            tailer = FileTailer(filename, stop)
+            timer = Thread(target=lambda: (time.sleep(0.1), f.write(b'line\n'), f.flush()))
+            start = time.time()
+            timer.start()
+            tailer.wait(5)
+            timer.join()
+            assert time.time() - start < 5
+            assert tailer.read_lines() == b'line\n'
+        tailer.close()
+
+
 class TestSecuredShell(object):
 
     def test_ssh_path(self):
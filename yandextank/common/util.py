@@ -1,7 +1,11 @@
 import collections.abc
+import ctypes
+import ctypes.util
 import functools
 import inspect
+import mmap
 import os
+import queue
 import socket
 import shutil
 
@@ -705,13 +709,13 @@ class FileLockedError(RuntimeError):
 
 
 class FileMultiReader(object):
-    def __init__(self, filename, provider_stop_event, cache_size=1024 * 1024 * 50):
+    def __init__(self, filename, provider_stop_event, cache_size=1024 * 1024 * 50, binary=False):
         self.buffer = ""
         self.filename = filename
         self.cache_size = cache_size
         self._cursor_map = {}
         self._is_locked = False
-        self._opened_file = open(self.filename)
+        self._opened_file = open(self.filename, 'rb' if binary else 'r')
         self.stop = provider_stop_event
 
     def close(self, force=False):
@@ -774,6 +778,110 @@ class FileLike(object):
         return result
 
 
+class FileWatcher(object):
+    IN_MODIFY = 0x00000002
+
+    def __init__(self, filename):
+        """
+        Wakes up on file modification through inotify.
+        Falls back to plain sleep where inotify is not available.
+        """
+        self.filename = filename
+        self.fd = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+            if libc.inotify_add_watch(fd, os.fsencode(filename), self.IN_MODIFY) < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+            self.fd = fd
+        except (OSError, AttributeError, TypeError):
+            logger.debug('inotify is not available, file %s will be polled', filename, exc_info=True)
+
+    def wait(self, timeout):
+        """
+        Block until the file is modified or timeout expires
+        :param timeout: seconds
+        """
+        if self.fd is None:
+            time.sleep(timeout)
+            return
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            try:
+                os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class FileTailer(object):
+    def __init__(self, filename, provider_stop_event, cache_size=1024 * 1024 * 50):
+        """
+        Follows a growing file through mmap, without read() copies and
+        without buffering incomplete lines: the file is remapped as it grows
+        and complete lines are returned as memoryview slices of the map.
+
+        :param provider_stop_event: set when the file is not going to grow anymore
+        :param cache_size: maximum size of a returned slice, unless a single line is longer
+        """
+        self.filename = filename
+        self.stop = provider_stop_event
+        self.cache_size = cache_size
+        self._file = open(self.filename, 'rb')
+        self._watcher = FileWatcher(self.filename)
+        self._map = None
+        self._map_offset = 0
+        self._map_end = 0
+        self._cursor = 0
+
+    def _remap(self, size):
+        self._map_offset = self._cursor - self._cursor % mmap.ALLOCATIONGRANULARITY
+        self._map = mmap.mmap(self._file.fileno(), size - self._map_offset,
+                              access=mmap.ACCESS_READ, offset=self._map_offset)
+        self._map_end = size
+
+    def read_lines(self):
+        """
+        Complete lines after the cursor
+        :rtype: memoryview, empty if there are no complete lines yet, None if the file is over
+        """
+        finished = self.stop.is_set()
+        size = os.fstat(self._file.fileno()).st_size
+        if size > self._map_end:
+            self._remap(size)
+        if self._cursor < self._map_end:
+            start = self._cursor - self._map_offset
+            end = min(self._map_end - self._map_offset, start + self.cache_size)
+            last_newline = self._map.rfind(b'\n', start, end)
+            if last_newline < 0:
+                last_newline = self._map.find(b'\n', end)
+            if last_newline >= 0:
+                self._cursor = self._map_offset + last_newline + 1
+                return memoryview(self._map)[start:last_newline + 1]
+        return None if finished else memoryview(b'')
+
+    def wait(self, timeout):
+        """ Block until there is new data in the file or timeout expires """
+        if self.stop.is_set() or os.fstat(self._file.fileno()).st_size > self._map_end:
+            return
+        if self._map is not None and self._map.find(b'\n', self._cursor - self._map_offset) >= 0:
+            return
+        self._watcher.wait(timeout)
+
+    def close(self):
+        self._watcher.close()
+        # the map is released with the last view of it
+        self._map = None
+        self._file.close()
+
+
 def get_callstack():
     """
         Get call stack, clean wrapper functions from it and present
@@ -921,3 +1029,22 @@ def get_test_path():
         return common.source_path('load/projects/yandex-tank')
     except ImportError:
         return os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+class SignallingQueue(queue.Queue):
+    """
+    Queue that sets an event whenever an item is put, so that a consumer
+    can wait for data of several queues at once instead of polling them
+    """
+
+    def __init__(self, event=None, maxsize=0):
+        """
+        :type event: threading.Event
+        """
+        super(SignallingQueue, self).__init__(maxsize)
+        self.event = event
+
+    def put(self, item, block=True, timeout=None):
+        super(SignallingQueue, self).put(item, block, timeout)
+        if self.event is not None:
+            self.event.set()
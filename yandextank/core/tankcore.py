@@ -2,6 +2,7 @@
 import datetime
 
 import fnmatch
+import functools
 import glob
 import importlib as il
 import json
@@ -10,6 +11,7 @@ import os
 import shutil
 import socket
 import tempfile
+import threading
 import time
 import traceback
 import copy
@@ -130,6 +132,8 @@ class TankCore(object):
         self._extra_plugins = []
 
         self.interrupted = interrupted_event
+        # set by aggregator and monitoring when there's data to process
+        self.data_ready = threading.Event()
         self.resource_manager = resource_manager or default_resource_manager
 
         self.error_log = None
@@ -147,7 +151,21 @@ class TankCore(object):
                                        datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f"))
         self.lock_dir = self.get_option(self.SECTION, 'lock_dir')
         self.aggregator_max_termination_timeout = self.get_option(self.SECTION, 'aggregator_max_termination_timeout', 60)
+        self.aggregator_workers = self.get_option(self.SECTION, 'aggregator_workers', 0)
+        self.aggregator_max_tags = self.get_option(self.SECTION, 'aggregator_max_tags', 0)
+        self.aggregator_windows = self.get_option(self.SECTION, 'aggregator_windows', [10, 60])
+        self.aggregator_quantiles = self.get_option(
+            self.SECTION, 'aggregator_quantiles', [50, 75, 80, 85, 90, 95, 98, 99, 100])
+        self.aggregator_tag_quantiles = self.get_option(self.SECTION, 'aggregator_tag_quantiles', {})
+        self.aggregator_corrected_latency = self.get_option(self.SECTION, 'aggregator_corrected_latency', False)
+        self.aggregator_verbose_histogram = self.get_option(self.SECTION, 'aggregator_verbose_histogram', True)
+        self.aggregator_listeners_queue = self.get_option(self.SECTION, 'aggregator_listeners_queue', 0)
+        self.aggregator_listeners_overflow = self.get_option(self.SECTION, 'aggregator_listeners_overflow', 'block')
+        self.aggregator_allowed_lateness = self.get_option(self.SECTION, 'aggregator_allowed_lateness', 0)
+        self.aggregator_late_data = self.get_option(self.SECTION, 'aggregator_late_data', 'drop')
         self.skip_generator_check = self.get_option(self.SECTION, 'skip_generator_check', False)
+        self.event_driven = self.get_option(self.SECTION, 'event_driven', True)
+        self.plugins_poll_period = self.get_option(self.SECTION, 'plugins_poll_period', 0.5)
         with open(os.path.join(self.artifacts_dir, CONFIGINITIAL), 'w') as f:
             yaml.dump(self.configinitial, f)
         self.add_artifact_file(error_output)
@@ -205,7 +223,7 @@ class TankCore(object):
     def data_poller(self):
         if self._data_poller is None:
             self._data_poller = DataPoller(
-                poll_period=0.5,
+                poll_period=self.get_option(self.SECTION, "aggregator_max_latency"),
                 max_wait=self.get_option(self.SECTION, "aggregator_max_wait"),
             )
         return self._data_poller
@@ -261,7 +279,22 @@ class TankCore(object):
                 logger.warning("Load generator not found")
                 gen = GeneratorPlugin(self, {}, 'generator dummy')
             # aggregator
-            aggregator = TankAggregator(gen, self.data_poller, termination_timeout=self.aggregator_max_termination_timeout)
+            aggregator = TankAggregator(gen, self.data_poller,
+                                        termination_timeout=self.aggregator_max_termination_timeout,
+                                        workers=self.aggregator_workers,
+                                        max_tags=self.aggregator_max_tags,
+                                        windows=self.aggregator_windows,
+                                        quantiles=self.aggregator_quantiles,
+                                        tag_quantiles=self.aggregator_tag_quantiles,
+                                        corrected_latency=self.aggregator_corrected_latency,
+                                        verbose_histogram=self.aggregator_verbose_histogram,
+                                        listeners_queue=self.aggregator_listeners_queue,
+                                        listeners_overflow=self.aggregator_listeners_overflow,
+                                        data_ready=self.data_ready,
+                                        lateness=self.aggregator_allowed_lateness,
+                                        late_data=self.aggregator_late_data,
+                                        publish=functools.partial(self.publish, 'aggregator'),
+                                        metrics_file=os.path.join(self.artifacts_dir, 'pipeline_metrics.jsonl'))
             self._job = Job(monitoring_plugins=monitorings,
                             generator_plugin=gen,
                             aggregator=aggregator,
@@ -321,35 +354,69 @@ class TankCore(object):
             if not self.plugins:
                 raise RuntimeError("It's strange: we have no plugins loaded...")
 
+        if self.event_driven:
+            return self.__wait_for_events()
         while not self.interrupted.is_set():
             begin_time = time.time()
             aggr_retcode = self.job.aggregator.is_test_finished()
             if aggr_retcode >= 0:
                 return aggr_retcode
-            for plugin_name, plugin in self.plugins.items():
-                logger.debug("Polling %s", plugin)
-                try:
-                    retcode = plugin.is_test_finished()
-                    if retcode >= 0:
-                        for e in plugin.errors:
-                            self.errors.append(f'{plugin_name}: {e}')
-                        return retcode
-                except Exception:
-                    logger.warning('Plugin {} failed:'.format(plugin_name), exc_info=True)
-                    if isinstance(plugin, GeneratorPlugin):
-                        return RetCode.ERROR
-                    else:
-                        logger.warning('Disabling plugin {}'.format(plugin_name))
-                        plugin.is_test_finished = lambda: RetCode.CONTINUE
+            retcode = self.__poll_plugins(self.plugins)
+            if retcode >= 0:
+                return retcode
             end_time = time.time()
             diff = end_time - begin_time
             logger.debug("Polling took %s", diff)
             logger.debug("Tank status: %s", json.dumps(self.info.get_info_dict()))
-            # screen refresh every 0.5 s
-            if diff < 0.5:
-                time.sleep(0.5 - diff)
+            # screen refresh every plugins_poll_period
+            if diff < self.plugins_poll_period:
+                time.sleep(self.plugins_poll_period - diff)
+        return 1
+
+    def __wait_for_events(self):
+        """
+        Collect aggregated data and monitoring as soon as they are ready,
+        call is_test_finished() on the rest of plugins every plugins_poll_period
+        """
+        monitorings = {name: plugin for name, plugin in self.plugins.items() if isinstance(plugin, MonitoringPlugin)}
+        next_poll = time.time()
+        while not self.interrupted.is_set():
+            self.data_ready.wait(max(0, next_poll - time.time()))
+            self.data_ready.clear()
+            aggr_retcode = self.job.aggregator.is_test_finished()
+            if aggr_retcode >= 0:
+                return aggr_retcode
+            if time.time() < next_poll:
+                retcode = self.__poll_plugins(monitorings)
+            else:
+                begin_time = time.time()
+                retcode = self.__poll_plugins(self.plugins)
+                logger.debug("Polling took %s", time.time() - begin_time)
+                logger.debug("Tank status: %s", json.dumps(self.info.get_info_dict()))
+                next_poll = max(next_poll + self.plugins_poll_period, time.time())
+            if retcode >= 0:
+                return retcode
         return 1
 
+    def __poll_plugins(self, plugins):
+        """ call is_test_finished() on plugins, returns the first non-negative retcode or -1 """
+        for plugin_name, plugin in plugins.items():
+            logger.debug("Polling %s", plugin)
+            try:
+                retcode = plugin.is_test_finished()
+                if retcode >= 0:
+                    for e in plugin.errors:
+                        self.errors.append(f'{plugin_name}: {e}')
+                    return retcode
+            except Exception:
+                logger.warning('Plugin {} failed:'.format(plugin_name), exc_info=True)
+                if isinstance(plugin, GeneratorPlugin):
+                    return RetCode.ERROR
+                else:
+                    logger.warning('Disabling plugin {}'.format(plugin_name))
+                    plugin.is_test_finished = lambda: RetCode.CONTINUE
+        return -1
+
     def plugins_end_test(self, retcode):
         """        Call end_test() on all plugins        """
         logger.info("Finishing test...")
@@ -320,8 +320,9 @@ class QuantileCriterion(AbstractCriterion):
     def notify(self, data, stat):
         quantiles = self.parse_data(data)
         logger.debug('Autostop quantiles for ts %s: %s', data['ts'], quantiles)
-        if self.quantile not in quantiles.keys():
-            logger.warning("No quantile %s in %s", self.quantile, quantiles)
+        if quantiles and self.quantile not in quantiles.keys():
+            logger.warning("No quantile %s in %s, add it to core.aggregator_quantiles or core.aggregator_tag_quantiles",
+                           self.quantile, quantiles)
         if self.quantile in quantiles.keys() and quantiles[self.quantile] / 1000.0 > self.rt_limit:
             if not self.seconds_count:
                 self.cause_second = (data, stat)
@@ -337,18 +338,17 @@ class QuantileCriterion(AbstractCriterion):
         return False
 
     def parse_data(self, data):
-        # Parse data for specific tag
+        # Parse data for specific tag, tags may have percentiles of their own
         if self.tag:
-            if data["tagged"].get(self.tag):
-                quantile_values = data["tagged"][self.tag]["interval_real"]["q"]["value"]
-            # quantile_values empty if current tag differs from selected one
-            else:
-                quantile_values = []
+            tag_data = data["tagged"].get(self.tag)
+            # no quantiles if current second has no responses of the selected tag
+            if not tag_data:
+                return {}
+            quantiles = tag_data["interval_real"]["q"]
         # Parse data for overall
         else:
-            quantile_values = data["overall"]["interval_real"]["q"]["value"]
-        quantiles = dict(zip(data["overall"]["interval_real"]["q"]["q"], quantile_values))
-        return quantiles
+            quantiles = data["overall"]["interval_real"]["q"]
+        return dict(zip(quantiles["q"], quantiles["value"]))
 
     def get_rc(self):
         return self.RC_TIME
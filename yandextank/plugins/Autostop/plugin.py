@@ -15,6 +15,7 @@ logger = logging.getLogger(__name__)
 class Plugin(AbstractPlugin, AggregateResultListener, MonitoringDataListener):
     """ Plugin that accepts criterion classes and triggers autostop """
     SECTION = 'autostop'
+    notify_synchronously = True
 
     def __init__(self, core, cfg, name):
         AbstractPlugin.__init__(self, core, cfg, name)
@@ -0,0 +1,32 @@
+import pytest
+
+from yandextank.plugins.Autostop.criterions import QuantileCriterion
+
+
+class AutostopMock(object):
+    def add_counting(self, criterion):
+        pass
+
+
+def get_data(ts):
+    # tags have percentiles of their own, positions differ from overall ones
+    return {
+        "ts": ts,
+        "overall": {"interval_real": {"q": {"q": [50, 99], "value": [10000, 50000]}}},
+        "tagged": {
+            "/pay": {"interval_real": {"q": {"q": [50, 99, 99.9], "value": [20000, 90000, 400000]}}},
+        },
+    }
+
+
+@pytest.mark.parametrize('param_str, stops', [
+    ('99.9, 300ms, 2s, /pay', True),
+    ('99, 100ms, 2s, /pay', False),
+    ('50, 15ms, 2s, /pay', True),
+    ('99, 40ms, 2s', True),
+    ('99.9, 40ms, 2s', False),
+    ('50, 15ms, 2s, /search', False),
+])
+def test_quantile_lookup_by_value(param_str, stops):
+    criterion = QuantileCriterion(AutostopMock(), param_str)
+    assert [criterion.notify(get_data(ts), None) for ts in range(2)][-1] == stops
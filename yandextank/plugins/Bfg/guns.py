@@ -2,6 +2,7 @@ import importlib.util
 import logging
 import time
 from contextlib import contextmanager
+from contextvars import ContextVar
 from random import randint
 
 import requests
@@ -15,6 +16,9 @@ requests_logger.setLevel(logging.WARNING)
 
 requests.packages.urllib3.disable_warnings()
 
+# time the request being shot was planned for, set by BFG workers
+planned_time = ContextVar('planned_time', default=None)
+
 
 class GunConfigError(Exception):
     pass
@@ -28,6 +32,7 @@ class AbstractGun(AbstractPlugin):
     @contextmanager
     def measure(self, marker):
         start_time = time.time()
+        planned = planned_time.get()
         data_item = {
             "send_ts": start_time,
             "tag": marker,
@@ -41,6 +46,8 @@ class AbstractGun(AbstractPlugin):
             "size_in": 0,
             "net_code": 0,
             "proto_code": 200,
+            # how late the request is sent, µs
+            "send_delay": int(max(start_time - planned, 0) * 1e6) if planned else 0,
         }
         try:
             yield data_item
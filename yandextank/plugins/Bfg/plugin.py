@@ -1,25 +1,31 @@
 import logging
 import time
+from functools import partial
 from threading import Event, Thread
 
 from .guns import LogGun, SqlGun, CustomGun, HttpGun, ScenarioGun, UltimateGun
 from .reader import BfgReader, BfgStatsReader
 from .widgets import BfgInfoWidget
 from ..Phantom import PhantomReader, string_to_df
+from ..Phantom.reader import phout_columns
 from .worker import BFGMultiprocessing, BFGGreen
 from ..Console import Plugin as ConsolePlugin
 from ...common.interfaces import GeneratorPlugin
 from ...common.util import FileMultiReader
+from ...aggregator import TagDictionary
 from ...stepper import StepperWrapper
 
 
 class Plugin(GeneratorPlugin):
     """ Big Fucking Gun plugin """
     SECTION = 'bfg'
+    # phout columns followed by how late the request was sent, µs
+    REPORT_COLUMNS = ['receive_ts'] + phout_columns[1:] + ['send_delay']
 
     def __init__(self, core, cfg, name):
         super(Plugin, self).__init__(core, cfg, name)
         self.close_event = Event()
+        self.tags = TagDictionary()
         self._bfg = None
         self.log = logging.getLogger(__name__)
         self.gun_type = None
@@ -27,6 +33,7 @@ class Plugin(GeneratorPlugin):
         self.log.info("Initialized BFG")
         self.report_filename = "bfgout.log"
         self.results_listener = None
+        self.cached_stpd = False
 
         self.gun_classes = {
             'log': LogGun,
@@ -50,6 +57,11 @@ class Plugin(GeneratorPlugin):
         self.log.info("Configuring BFG...")
         self.stepper_wrapper.read_config()
         self.stepper_wrapper.prepare_stepper()
+        self.cached_stpd = self.get_option("cached_stpd", False)
+        if self.cached_stpd and self.stepper_wrapper.stream:
+            # the stream lasts as long as the schedule, it can not be read in advance
+            self.log.warning("stpd is streamed, cached_stpd is ignored")
+            self.cached_stpd = False
         with open(self.report_filename, 'w'):
             pass
         self.core.add_artifact_file(self.report_filename)
@@ -57,19 +69,23 @@ class Plugin(GeneratorPlugin):
     def _write_results_into_file(self):
         """listens for messages on the q, writes to file. """
         reader = BfgReader(self.bfg.results, self.close_event)
-        columns = ['receive_ts', 'tag', 'interval_real', 'connect_time', 'send_time', 'latency', 'receive_time',
-                   'interval_event', 'size_out', 'size_in', 'net_code', 'proto_code']
         for entry in reader:
             if entry is not None:
-                entry.receive_ts = entry.receive_ts.round(3)
-                with open(self.report_filename, 'a') as report_file:
-                    report_file.write(entry.to_csv(index=False, header=False, sep='\t', columns=columns))
+                self._write_entry(entry)
             time.sleep(0.1)
 
+    def _write_entry(self, entry):
+        entry.receive_ts = entry.receive_ts.round(3)
+        if 'send_delay' not in entry:
+            entry['send_delay'] = 0
+        with open(self.report_filename, 'a') as report_file:
+            report_file.write(entry.to_csv(index=False, header=False, sep='\t', columns=self.REPORT_COLUMNS))
+
     def get_reader(self, parser=string_to_df):
         if self.reader is None:
             self.reader = FileMultiReader(self.report_filename, self.close_event)
-        return PhantomReader(self.reader.get_file(), parser=parser)
+        columns = phout_columns + ['send_delay']
+        return PhantomReader(self.reader.get_file(), parser=partial(parser, columns=columns), tags=self.tags)
 
     def get_stats_reader(self):
         if self.stats_reader is None:
@@ -84,7 +100,7 @@ class Plugin(GeneratorPlugin):
                 gun=self.gun,
                 instances=self.stepper_wrapper.instances,
                 stpd_filename=self.stepper_wrapper.stpd,
-                cached_stpd=self.get_option("cached_stpd"),
+                cached_stpd=self.cached_stpd,
                 green_threads_per_instance=int(self.get_option('green_threads_per_instance', 1000)),
             )
         return self._bfg
@@ -146,4 +162,5 @@ class Plugin(GeneratorPlugin):
             self.bfg.stop()
         self.close_event.set()
         self.stats_reader.close()
+        self.stepper_wrapper.close()
         return retcode
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import time
 import itertools as itt
@@ -5,6 +6,9 @@ from queue import Empty
 from threading import Lock
 import threading as th
 import logging
+
+from yandextank.plugins.Phantom.reader import bytes_to_df, phout_columns
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,11 +17,25 @@ def records_to_df(records):
     records['receive_ts'] = records['send_ts'] + records['interval_real'] / 1e6
     records['receive_sec'] = records.receive_ts.astype(int)
     # TODO: consider configuration for the following:
-    records['tag'] = records.tag.str.rsplit('#', 1, expand=True)[0]
+    records['tag'] = records.tag.str.rsplit('#', n=1, expand=True)[0]
     records.set_index(['receive_sec'], inplace=True)
     return records
 
 
+def bfgout_to_df(data):
+    """
+    Parse bfgout.log: phout columns with receive_ts in place of send_ts, followed by send_delay.
+    Rows are indexed by the second they were received in, as phout rows are.
+    """
+    chunk = bytes_to_df(data, columns=phout_columns + ['send_delay'])
+    if chunk is None:
+        return
+    chunk['receive_ts'] = chunk.send_ts
+    chunk['send_ts'] = chunk.receive_ts - chunk.interval_real / 1e6
+    chunk.index = pd.Index(chunk.receive_ts.to_numpy().astype(np.int64), name='receive_sec')
+    return chunk
+
+
 def _expand_steps(steps):
     return list(itt.chain(
         * [[rps] * int(duration) for rps, duration in steps]))
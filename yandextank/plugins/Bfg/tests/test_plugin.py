@@ -0,0 +1,37 @@
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+from yandextank.plugins.Bfg.plugin import Plugin
+from yandextank.plugins.Bfg.reader import records_to_df
+
+
+def measured(send_ts, tag, send_delay):
+    return {"send_ts": send_ts, "tag": tag, "interval_real": 1500, "connect_time": 0, "send_time": 0,
+            "latency": 0, "receive_time": 0, "interval_event": 0, "size_out": 10, "size_in": 20,
+            "net_code": 0, "proto_code": 200, "send_delay": send_delay}
+
+
+def test_send_delay_reaches_reader(tmp_path):
+    plugin = Plugin(MagicMock(), {}, 'bfg')
+    plugin.report_filename = str(tmp_path / 'bfgout.log')
+    open(plugin.report_filename, 'w').close()
+    plugin._write_entry(records_to_df([measured(1500000000.1, 'a', 0), measured(1500000000.2, 'b', 250000)]))
+    plugin.close_event.set()
+
+    chunks = [chunk for chunk in plugin.get_reader() if chunk is not None]
+    result = pd.concat(chunks)
+    assert result['send_delay'].tolist() == [0, 250000]
+    assert result['interval_real'].tolist() == [1500, 1500]
+    assert len(result.columns) == len(set(result.columns))
+
+
+def test_cached_stpd_ignored_when_streamed(tmp_path):
+    plugin = Plugin(MagicMock(), {'cached_stpd': True}, 'bfg')
+    plugin.report_filename = str(tmp_path / 'bfgout.log')
+    plugin.stepper_wrapper = MagicMock()
+    plugin.configure()
+    assert plugin.cached_stpd is False
+    plugin.stepper_wrapper.stream = None
+    plugin.configure()
+    assert plugin.cached_stpd is True
@@ -4,7 +4,9 @@ import threading as th
 import multiprocessing as mp
 from queue import Empty, Full
 
+from .guns import planned_time as planned_time_var
 from ...stepper import StpdReader
+from ...stepper.format import BinaryStpdReader, is_binary_stpd
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +37,9 @@ Gun: {gun.__class__.__name__}
         self.task_queue = mp.Queue(1024)
         self.cached_stpd = cached_stpd
         self.stpd_filename = stpd_filename
+        # tasks of binary stpd are missile numbers, workers read missiles themselves
+        self.binary_stpd = is_binary_stpd(stpd_filename)
+        self.stpd = None
         self.pool = [
             mp.Process(target=self._worker) for _ in range(self.instances)
         ]
@@ -82,7 +87,12 @@ Gun: {gun.__class__.__name__}
         """
         A feeder that runs in distinct thread in main process.
         """
-        self.plan = StpdReader(self.stpd_filename)
+        if self.binary_stpd:
+            reader = BinaryStpdReader(self.stpd_filename)
+            self.plan = range(len(reader))
+            reader.close()
+        else:
+            self.plan = StpdReader(self.stpd_filename)
         if self.cached_stpd:
             self.plan = list(self.plan)
         for task in self.plan:
@@ -133,6 +143,16 @@ Gun: {gun.__class__.__name__}
                 x.join()
             self.workers_finished = True
 
+    def _task(self, task):
+        """
+        (timestamp, missile, marker) of a task
+        """
+        if not self.binary_stpd:
+            return task
+        if self.stpd is None:
+            self.stpd = BinaryStpdReader(self.stpd_filename)
+        return self.stpd[task]
+
 
 class BFGMultiprocessing(BFGBase):
     """
@@ -152,19 +172,20 @@ class BFGMultiprocessing(BFGBase):
         while not self.quit.is_set():
             try:
                 task = self.task_queue.get(timeout=1)
-                if not task:
+                if task is None:
                     logger.debug("Got killer task.")
                     break
-                timestamp, missile, marker = task
+                timestamp, missile, marker = self._task(task)
                 planned_time = self.start_time + (timestamp / 1000.0)
                 delay = planned_time - time.time()
                 if delay > 0:
                     time.sleep(delay)
 
+                planned_time_var.set(planned_time)
                 try:
                     with self.instance_counter.get_lock():
                         self.instance_counter.value += 1
-                    self.gun.shoot(missile.decode('utf8'), marker)
+                    self.gun.shoot(str(missile, 'utf8'), marker)
                 finally:
                     with self.instance_counter.get_lock():
                         self.instance_counter.value -= 1
@@ -222,7 +243,7 @@ class BFGGreen(BFGBase):
 
                 self._free_threads_count -= 1
 
-                if not task:
+                if task is None:
                     logger.debug("Got killer task.")
                     self.quit.set()
                     break
@@ -249,18 +270,20 @@ class BFGGreen(BFGBase):
             try:
                 task = self.green_queue.get(timeout=1)
 
-                timestamp, missile, marker = task
+                timestamp, missile, marker = self._task(task)
                 planned_time = self.start_time + (timestamp / 1000.0)
                 delay = planned_time - time.time()
 
                 if delay > 0:
                     time.sleep(delay)
 
+                # every greenlet has a context of its own
+                planned_time_var.set(planned_time)
                 try:
                     with self.instance_counter.get_lock():
                         self.instance_counter.value += 1
 
-                    self.gun.shoot(missile.decode('utf8'), marker)
+                    self.gun.shoot(str(missile, 'utf8'), marker)
                 finally:
                     with self.instance_counter.get_lock():
                         self.instance_counter.value -= 1
@@ -10,6 +10,7 @@ import bisect
 from collections import defaultdict
 import pandas as pd
 
+from ...aggregator.windows import CONSOLE_WINDOW
 from ...common import util
 
 
@@ -615,9 +616,10 @@ class PercentilesBlock(AbstractBlock):
         AbstractBlock.__init__(self, screen)
         self.title = 'Percentiles (all/last 1m/last), ms:'
         self.overall = None
+        self.last_1m = None
+        self.last = None
         self.width = 10
         self.last_ts = None
-        self.last_min = {}
         self.quantiles = [10, 20, 30, 40, 50, 60, 70, 75, 80, 85, 90, 95, 99, 99.5, 100]
         template = {
             'quantile': {'tpl': '{:>.1f}%'},
@@ -629,35 +631,33 @@ class PercentilesBlock(AbstractBlock):
         self.formatter = TableFormatter(template, delimiters)
 
     def add_second(self, data):
-        incoming_hist = data['overall']['interval_real']['hist']
-        ts = data['ts']
+        # cumulative and windowed quantiles are maintained by the aggregator
+        if 'cumulative' not in data:
+            return
         self.precise_quantiles = {
             q: float(v) / 1000
             for q, v in zip(
                 data["overall"]["interval_real"]["q"]["q"],
                 data["overall"]["interval_real"]["q"]["value"])
         }
-        dist = pd.Series(incoming_hist['data'], index=incoming_hist['bins'])
-        if self.overall is None:
-            self.overall = dist
-        else:
-            self.overall = self.overall.add(dist, fill_value=0)
-        for second in tuple(self.last_min.keys()):
-            if ts - second > 60:
-                self.last_min.pop(second)
-        self.last_min[ts] = dist
+        self.overall = self.__times(data['cumulative'])
+        self.last_1m = self.__times(data['windows'][CONSOLE_WINDOW])
+        incoming_hist = data['overall']['interval_real']['hist']
+        self.last = self.__hist_times(pd.Series(incoming_hist['data'], index=incoming_hist['bins']))
+
+    def __times(self, summary):
+        """ quantile times in ms for self.quantiles from aggregator's window summary """
+        values = dict(zip(summary['q']['q'], summary['q']['value']))
+        return [values[q] / 1000. if values.get(q) is not None else 0. for q in self.quantiles]
+
+    def __hist_times(self, histogram):
+        cumulative = histogram.cumsum()
+        total = cumulative.max()
+        positions = cumulative.searchsorted([float(i) / 100 * total for i in self.quantiles])
+        return [cumulative.index[i] / 1000. for i in positions]
 
     def __calc_percentiles(self):
-        def hist_to_quant(histogram, quant):
-            cumulative = histogram.cumsum()
-            total = cumulative.max()
-            positions = cumulative.searchsorted([float(i) / 100 * total for i in quant])
-            quant_times = [cumulative.index[i] / 1000. for i in positions]
-            return quant_times
-
-        all_times = hist_to_quant(self.overall, self.quantiles)
-        last_data = self.last_min[max(self.last_min.keys())]
-        last_times = hist_to_quant(last_data, self.quantiles)
+        last_times = list(self.last)
         # Check if we have precise data for last second quantiles instead of binned histogram
         for position, q in enumerate(self.quantiles):
             if q in self.precise_quantiles:
@@ -667,15 +667,8 @@ class PercentilesBlock(AbstractBlock):
         for position in reversed(range(1, len(last_times))):
             if last_times[position - 1] > last_times[position]:
                 last_times[position - 1] = last_times[position]
-        last_1m = pd.Series(dtype='int64')
-        for ts, data in self.last_min.items():
-            if last_1m.empty:
-                last_1m = data
-            else:
-                last_1m = last_1m.add(data, fill_value=0)
-        last_1m_times = hist_to_quant(last_1m, self.quantiles)
         quant_times = reversed(
-            list(zip(self.quantiles, all_times, last_1m_times, last_times))
+            list(zip(self.quantiles, self.overall, self.last_1m, last_times))
         )
         data = []
         for q, all_time, last_1m, last_time in quant_times:
@@ -129,6 +129,8 @@ class Plugin(AbstractPlugin, AggregateResultListener,
     RC_STOP_FROM_WEB = 8
     VERSION = '3.0'
     SECTION = 'uploader'
+    # sends data over network, queued when aggregator_listeners_queue is set
+    notify_synchronously = False
 
     def __init__(self, core, cfg, name):
         AbstractPlugin.__init__(self, core, cfg, name)
@@ -31,6 +31,8 @@ def chop(data_list, chunk_size):
 class Plugin(AbstractPlugin, AggregateResultListener,
              MonitoringDataListener):
     SECTION = 'influx'
+    # sends data over network, queued when aggregator_listeners_queue is set
+    notify_synchronously = False
 
     def __init__(self, core, cfg, name):
         AbstractPlugin.__init__(self, core, cfg, name)
@@ -16,6 +16,7 @@ from .reader import JMeterReader
 from ..Console import Plugin as ConsolePlugin
 from ..Console import screen as ConsoleScreen
 from ...common.interfaces import AggregateResultListener, AbstractInfoWidget, GeneratorPlugin
+from ...aggregator import TagDictionary
 
 logger = logging.getLogger(__name__)
 
@@ -89,7 +90,7 @@ class Plugin(GeneratorPlugin):
 
     def get_reader(self):
         if self.reader is None:
-            self.reader = JMeterReader(self.jtl_file, self.core.data_poller)
+            self.reader = JMeterReader(self.jtl_file, self.core.data_poller, TagDictionary())
         return self.reader
 
     def get_stats_reader(self):
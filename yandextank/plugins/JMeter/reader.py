@@ -157,8 +157,12 @@ class JMeterStatAggregator(object):
 
 
 class JMeterReader(object):
-    def __init__(self, filename, poller: DataPoller):
+    def __init__(self, filename, poller: DataPoller, tags=None):
+        """
+        :type tags: yandextank.aggregator.TagDictionary
+        """
         self.buffer = ""
+        self.tags = tags
         self.stat_buffer = ""
         self.jtl_file = filename
         self.jmeter_finished = False
@@ -189,6 +193,8 @@ class JMeterReader(object):
                 ready_chunk = self.buffer + parts[0] + '\n'
                 self.buffer = parts[1]
                 df = string_to_df(ready_chunk)
+                if self.tags is not None:
+                    self.tags.encode_chunk(df)
                 self.stat_queue.put(df)
                 return df
             else:
@@ -5,6 +5,7 @@ import json
 import logging
 import numpy as np
 import os
+from collections.abc import Mapping
 
 import io
 
@@ -20,6 +21,9 @@ class NumpyEncoder(json.JSONEncoder):
             return obj.item()
         elif isinstance(obj, np.ndarray):
             return obj.tolist()
+        elif isinstance(obj, Mapping):
+            # aggregated seconds and their lazy views
+            return dict(obj)
         else:
             return super(NumpyEncoder, self).default(obj)
 
@@ -5,7 +5,6 @@ import json
 import logging
 import os
 import sys
-import pandas as pd
 from datetime import timedelta, datetime
 
 import io
@@ -16,11 +15,19 @@ from ...common.interfaces import AbstractPlugin, AggregateResultListener
 logger = logging.getLogger(__name__)  # pylint: disable=C0103
 
 
+def quantiles_by_name(quantiles):
+    """ {"q50": 1024, "q99.9": 8192} from aggregator's {"q": [...], "value": [...]} """
+    return {
+        'q{:g}'.format(q): int(value) for q, value in zip(quantiles['q'], quantiles['value']) if value is not None
+    }
+
+
 def calc_overall_times(overall, quantiles):
-    cumulative = overall.cumsum()
-    total = cumulative.max()
-    positions = cumulative.searchsorted([float(i) / 100 * total for i in quantiles])
-    all_times = [cumulative.index[i] / 1000. for i in positions]
+    """
+    :param overall: cumulative summary from aggregated data, {"len": ..., "q": {"q": [...], "value": [...]}}
+    """
+    values = dict(zip(overall['q']['q'], overall['q']['value']))
+    all_times = [values[q] / 1000. if values.get(q) is not None else None for q in quantiles]
     overall_times = zip(quantiles, all_times)
     return overall_times
 
@@ -137,27 +144,13 @@ class Plugin(AbstractPlugin, AggregateResultListener):
                 'ts': stats['ts'],
                 'instances': stats['metrics']['instances'],
                 'reqps': stats['metrics']['reqps'],
-                'quantiles': {
-                    "q50": int(data['overall']['interval_real']['q']['value'][0]),
-                    "q75": int(data['overall']['interval_real']['q']['value'][1]),
-                    "q80": int(data['overall']['interval_real']['q']['value'][2]),
-                    "q85": int(data['overall']['interval_real']['q']['value'][3]),
-                    "q90": int(data['overall']['interval_real']['q']['value'][4]),
-                    "q95": int(data['overall']['interval_real']['q']['value'][5]),
-                    "q98": int(data['overall']['interval_real']['q']['value'][6]),
-                    "q99": int(data['overall']['interval_real']['q']['value'][7]),
-                    "q100": int(data['overall']['interval_real']['q']['value'][8]),
-                },
+                'quantiles': quantiles_by_name(data['overall']['interval_real']['q']),
                 'proto_code': last_proto_code,
                 'net_code': data['overall']['net_code']['count']
             }))
 
-        incoming_hist = data['overall']['interval_real']['hist']
-        dist = pd.Series(incoming_hist['data'], index=incoming_hist['bins'])
-        if self.overall is None:
-            self.overall = dist
-        else:
-            self.overall = self.overall.add(dist, fill_value=0)
+        # quantiles for the whole test are maintained by the aggregator
+        self.overall = data.get('cumulative', self.overall)
 
         if self.first_ts is None:
             self.first_ts = stats['ts']
@@ -17,6 +17,7 @@ from ..Console import screen as ConsoleScreen
 from ..Phantom import PhantomReader, string_to_df
 from ...common.interfaces import AbstractInfoWidget, GeneratorPlugin
 from ...common.util import tail_lines, FileMultiReader
+from ...aggregator import TagDictionary
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +33,7 @@ class Plugin(GeneratorPlugin):
     def __init__(self, core, cfg, name):
         super(Plugin, self).__init__(core, cfg, name)
         self.output_finished = Event()
+        self.tags = TagDictionary()
         self.enum_ammo = False
         self.pandora_cmd = None
         self.pandora_config_file = None
@@ -194,7 +196,7 @@ class Plugin(GeneratorPlugin):
     def get_reader(self, parser=string_to_df):
         if self.reader is None:
             self.reader = [FileMultiReader(f, self.output_finished) for f in self.report_files]
-        return [PhantomReader(reader.get_file(), parser=parser) for reader in self.reader]
+        return [PhantomReader(reader.get_file(), parser=parser, tags=self.tags) for reader in self.reader]
 
     def get_stats_reader(self):
         if self.stats_reader is None:
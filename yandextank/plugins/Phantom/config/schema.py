@@ -212,6 +212,12 @@ OPTIONS = {
         'description': 'deprecated',
         "default": ""
     },
+    'phout_tail': {
+        'type': 'boolean',
+        'default': False,
+        'description': 'Follow phout through mmap and read new lines as soon as the file is modified '
+                       '(inotify, Linux only) instead of reading it in big chunks every poll period'
+    },
     'port': {
         'description': 'Explicit target port, overwrites port defined with address',
         'type': 'string',
@@ -247,6 +253,13 @@ OPTIONS = {
         },
         'required': True
     },
+    'send_delay': {
+        'type': 'boolean',
+        'default': False,
+        'description': 'Estimate how late requests were sent relative to the load plan (send_delay column) '
+                       'from phout send times, numbering requests by send time from the first one sent. '
+                       'Phantom does not log planned times, so unlike bfg send_delay this is an estimate'
+    },
     'source_log_prefix': {
         'description': 'Prefix added to class name that reads source data',
         'type': 'string',
@@ -257,6 +270,31 @@ OPTIONS = {
         'type': 'boolean',
         'default': False
     },
+    'stepping_workers': {
+        'description': 'Number of processes to make stpd-file in. 0 or 1 to make it in the tank process. '
+                       'Ammo file is compiled to cache_dir once, the processes seek to their parts in it',
+        'type': 'integer',
+        'min': 0,
+        'default': 0
+    },
+    'stream_stpd': {
+        'description': 'Make stpd while the test goes and stream it to phantom through a FIFO instead of making '
+                       'stpd-file before the test. For rps schedules only',
+        'type': 'boolean',
+        'default': False
+    },
+    'stream_max_lead': {
+        'description': 'Seconds of the schedule streamed stpd is allowed to be ahead of it',
+        'type': 'integer',
+        'min': 1,
+        'default': 10
+    },
+    'compiled_ammo': {
+        'description': 'Keep parsed ammo in cache_dir, so that ammo loops after the first one and later tests '
+                       'read missiles without parsing the ammo file',
+        'type': 'boolean',
+        'default': False
+    },
     "threads": {
         'description': 'Phantom thread count. When not specified, defaults to <processor cores count> / 2 + 1',
         "type": "integer",
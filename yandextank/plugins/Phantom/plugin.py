@@ -6,12 +6,14 @@ import subprocess
 import time
 from threading import Event
 
-from .reader import PhantomReader, PhantomStatsReader, string_to_df
+from .reader import PhantomReader, PhantomStatsReader, PhantomTailReader, string_to_df, bytes_to_df
 from .utils import PhantomConfig
 from .widget import PhantomInfoWidget, PhantomProgressBarWidget
 from ..Console import Plugin as ConsolePlugin
 from ...common.interfaces import GeneratorPlugin
-from ...common.util import FileMultiReader
+from ...common.util import FileMultiReader, FileTailer
+from ...aggregator import TagDictionary
+from ...stepper.schedule import StepSchedule
 from .log_analyzer import LogAnalyzer
 
 from yandextank.contrib.netort.netort.process import execute
@@ -28,6 +30,7 @@ class Plugin(GeneratorPlugin):
     def __init__(self, core, cfg, name):
         super(Plugin, self).__init__(core, cfg, name)
         self.phout_finished = Event()
+        self.tags = TagDictionary()
         self.predefined_phout = None
         self.did_phout_import_try = False
         self.eta_file = None
@@ -83,9 +86,19 @@ class Plugin(GeneratorPlugin):
         return self._stat_log
 
     def get_reader(self, parser=string_to_df):
+        if self.get_option('phout_tail', False):
+            return PhantomTailReader(FileTailer(self.phantom.phout_file, self.phout_finished),
+                                     parser=bytes_to_df if parser is string_to_df else parser, tags=self.tags,
+                                     schedule=self._send_schedule())
         if self.reader is None:
-            self.reader = FileMultiReader(self.phantom.phout_file, self.phout_finished)
-        return PhantomReader(self.reader.get_file(), parser=parser)
+            self.reader = FileMultiReader(self.phantom.phout_file, self.phout_finished, binary=parser is bytes_to_df)
+        return PhantomReader(self.reader.get_file(), parser=parser, tags=self.tags, schedule=self._send_schedule())
+
+    def _send_schedule(self):
+        """ load plan to estimate how late requests were sent, None if not enabled or for imported phout """
+        if self.phout_import_mode or not self.get_option('send_delay', False):
+            return None
+        return StepSchedule(self.phantom.get_info().steps)
 
     def get_stats_reader(self):
         if self.stats_reader is None:
@@ -181,6 +194,9 @@ class Plugin(GeneratorPlugin):
         self.phout_finished.set()
         if self.process_stderr:
             self.process_stderr.close()
+        if self.phantom:
+            for stream in self.phantom.streams:
+                stream.stepper_wrapper.close()
         return retcode
 
     def post_process(self, retcode):
@@ -1,10 +1,15 @@
 from threading import Event
 import os
 
+import numpy as np
 import pandas as pd
+import pytest
+from yandextank.aggregator import TagDictionary
 from yandextank.common.util import get_test_path
-from yandextank.common.util import FileMultiReader
-from yandextank.plugins.Phantom.reader import PhantomReader, PhantomStatsReader, string_to_df_microsec
+from yandextank.common.util import FileMultiReader, FileTailer
+from yandextank.plugins.Phantom.reader import PhantomReader, PhantomStatsReader, string_to_df_microsec, \
+    string_to_df, bytes_to_df, PhantomTailReader
+from yandextank.stepper.schedule import StepSchedule
 from functools import reduce
 
 
@@ -33,6 +38,29 @@ class TestPhantomReader(object):
         assert len(result) == 200
         assert (result['interval_real'].mean() == 11000714.0)
 
+    def test_reader_tags(self):
+        tags = TagDictionary()
+        reader = PhantomReader(self.multireader.get_file(), cache_size=1024, tags=tags)
+        chunks = [chunk for chunk in reader if chunk is not None]
+        assert all(isinstance(chunk.tag.dtype, pd.CategoricalDtype) for chunk in chunks)
+        assert list(chunks[-1].tag.cat.categories) == list(tags.dtype.categories)
+        result = pd.concat(chunks)
+        assert len(result) == 200
+        assert (result['interval_real'].mean() == 11000714.0)
+
+    def test_reader_send_delay(self):
+        # the plan is 2 rps, so phantom falls behind it
+        schedule = StepSchedule([(2, 300)])
+        reader = PhantomReader(self.multireader.get_file(), cache_size=1024, schedule=schedule)
+        result = pd.concat([chunk for chunk in reader if chunk is not None])
+        assert len(result) == 200
+        assert result.send_delay.iloc[0] == 0
+        send_ts = result.send_ts.sort_values().to_numpy()
+        # the plan starts with the first request sent
+        start = send_ts[0]
+        expected = (send_ts - (start + np.arange(200) / 2.)).clip(0) * 1e6
+        assert result.send_delay.sort_values().to_numpy() == pytest.approx(np.sort(expected), abs=1)
+
     def test_reader_us(self):
         with open(os.path.join(get_test_path(), 'yandextank/plugins/Phantom/tests/phout.dat')) as f:
             chunk = f.read()
@@ -42,6 +70,63 @@ class TestPhantomReader(object):
         assert result.equals(expected)
 
 
+class TestBytesToDf(object):
+    @pytest.mark.parametrize('phout', [
+        'yandextank/plugins/Phantom/tests/phout.dat',
+        'yandextank/aggregator/tests/phout1',
+        'yandextank/aggregator/tests/phout2927',
+    ])
+    def test_same_as_string_to_df(self, phout):
+        with open(os.path.join(get_test_path(), phout), 'rb') as f:
+            data = f.read()
+        result = bytes_to_df(data)
+        expected = string_to_df(data.decode('utf-8'))
+        assert isinstance(result.tag.dtype, pd.CategoricalDtype)
+        result['tag'] = result.tag.astype(object)
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_tag_suffix(self):
+        data = b'1502376593.698\turi#1\t797\t208\t12\t521\t56\t670\t31\t315\t0\t404\n' \
+               b'1502376593.699\turi#2\t797\t208\t12\t521\t56\t670\t31\t315\t0\t404\n' \
+               b'1502376593.700\t#3\t797\t208\t12\t521\t56\t670\t31\t315\t0\t200\n'
+        result = bytes_to_df(data)
+        assert list(result.tag) == ['uri', 'uri', '']
+        assert list(result.tag.cat.categories) == ['', 'uri']
+
+    def test_memoryview(self):
+        with open(os.path.join(get_test_path(), 'yandextank/plugins/Phantom/tests/phout.dat'), 'rb') as f:
+            data = f.read()
+        start = data.index(b'\n') + 1
+        pd.testing.assert_frame_equal(bytes_to_df(memoryview(data)[start:]), bytes_to_df(data[start:]))
+
+    def test_incorrect_data(self, caplog):
+        data = b'1502376593.698\turi\t797\n' + b'1502376593.699\turi\t797\t208\t12\t521\t56\t670\t31\t315\t0\t404\t1\n' * 100
+        assert bytes_to_df(memoryview(data)) is None
+        assert repr(data[:1000]) in caplog.text
+        assert repr(data[:1001]) not in caplog.text
+        assert '<memory at' not in caplog.text
+
+    def test_binary_reader(self):
+        stop = Event()
+        stop.set()
+        multireader = FileMultiReader(os.path.join(get_test_path(), 'yandextank/plugins/Phantom/tests/phout.dat'),
+                                      stop, binary=True)
+        reader = PhantomReader(multireader.get_file(), cache_size=1024, parser=bytes_to_df)
+        result = pd.concat([chunk for chunk in reader if chunk is not None])
+        multireader.close()
+        assert len(result) == 200
+        assert result['interval_real'].mean() == 11000714.0
+
+    def test_tail_reader(self):
+        stop = Event()
+        stop.set()
+        tailer = FileTailer(os.path.join(get_test_path(), 'yandextank/plugins/Phantom/tests/phout.dat'), stop,
+                            cache_size=1024)
+        result = pd.concat([chunk for chunk in PhantomTailReader(tailer) if chunk is not None])
+        assert len(result) == 200
+        assert result['interval_real'].mean() == 11000714.0
+
+
 class MockInfo(object):
     def __init__(self, steps):
         self.steps = steps
@@ -14,7 +14,7 @@ from ...common.interfaces import AbstractPlugin, GeneratorPlugin, AggregateResul
 from ...common.util import FileMultiReader, FileScanner, tail_lines
 from ..Console import Plugin as ConsolePlugin
 from ..Phantom import PhantomReader
-from yandextank.aggregator import TimeChopper
+from yandextank.aggregator import TimeChopper, TagDictionary
 from yandextank.aggregator.aggregator import DataPoller
 
 
@@ -35,6 +35,7 @@ class Plugin(GeneratorPlugin):
     def __init__(self, core, cfg, name):
         AbstractPlugin.__init__(self, core, cfg, name)
         self.output_finished = Event()
+        self.tags = TagDictionary()
         self.stats_reader = None
         self.reader = None
         self._stderr_path = None
@@ -67,7 +68,7 @@ class Plugin(GeneratorPlugin):
             open(self.__output_path, "w").close()
             self.file_reader = FileMultiReader(self.__output_path, self.output_finished)
             self.add_cleanup(lambda: self.file_reader.close)
-            self.reader = PhantomReader(self.file_reader.get_file())
+            self.reader = PhantomReader(self.file_reader.get_file(), tags=self.tags)
             if not self.__stats_path:
                 self.reader = _ShootExecReader(self.reader, self.core.data_poller)
         return self.reader
@@ -1,4 +1,3 @@
-import queue
 import hashlib
 import logging
 import os
@@ -7,7 +6,7 @@ import tempfile
 import threading
 import time
 from shutil import copyfile, rmtree
-from ...common.util import SecuredShell
+from ...common.util import SecuredShell, SignallingQueue
 
 from ..Telegraf.config import AgentConfig, create_agent_py
 from ..Telegraf.reader import MonitoringReader
@@ -39,7 +38,7 @@ class LocalhostClient(object):
         self.config = AgentConfig(config, old_style_configs)
 
         # connection
-        self.incoming_queue = queue.Queue()
+        self.incoming_queue = SignallingQueue()
         self.buffer = ""
 
         self.workdir = None
@@ -179,7 +178,7 @@ class SSHClient(object):
         self.ssh = SecuredShell(
             self.host, self.port, self.username, command_timeout=timeout, ssh_key_path=self.ssh_key_path
         )
-        self.incoming_queue = queue.Queue()
+        self.incoming_queue = SignallingQueue()
         self.buffer = ""
         self.stop_sent = None
         self.successfull_stop = None
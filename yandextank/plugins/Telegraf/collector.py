@@ -43,6 +43,8 @@ class MonitoringCollector(object):
         self.ssh_key_path = None
         self.ssh_timeout = 30
         self.clients = {'localhost': LocalhostClient, 'ssh': SSHClient}
+        # threading.Event set when agents send data
+        self.data_ready = None
 
     def add_listener(self, obj):
         self.listeners.append(obj)
@@ -64,6 +66,7 @@ class MonitoringCollector(object):
             else:
                 client = self.clients['ssh'](
                     config, self.old_style_configs, timeout=self.ssh_timeout, kill_old=self.kill_old)
+            client.incoming_queue.event = self.data_ready
             logger.debug('Installing monitoring agent. Host: %s', client.host)
             agent_config, startup_config, customs_script = client.install()
             if agent_config:
@@ -39,6 +39,7 @@ class Plugin(MonitoringPlugin):
         self.monitoring = MonitoringCollector(
             disguise_hostnames=self.get_option('disguise_hostnames'),
             kill_old=self.get_option('kill_old'))
+        self.monitoring.data_ready = self.core.data_ready
         self.die_on_fail = True
         self.data_file = None
         self.mon_saver = None
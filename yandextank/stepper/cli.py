@@ -0,0 +1,25 @@
+import argparse
+import logging
+import sys
+
+from .format import binary_to_text, is_binary_stpd, text_to_binary
+
+
+def convert():
+    parser = argparse.ArgumentParser(
+        description='Convert stpd-file from text format to binary one and back, the direction is chosen by the source')
+    parser.add_argument('source', help='text or binary stpd-file')
+    parser.add_argument('destination', help='file to write the other format to')
+    args = parser.parse_args()
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    if is_binary_stpd(args.source):
+        count = binary_to_text(args.source, args.destination)
+        logging.info('%s missiles written to %s in text format', count, args.destination)
+    else:
+        count = text_to_binary(args.source, args.destination)
+        logging.info('%s missiles written to %s in binary format', count, args.destination)
+
+
+if __name__ == '__main__':
+    convert()
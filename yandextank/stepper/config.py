@@ -28,6 +28,7 @@ class ComponentFactory():
             chosen_cases=None,
             use_cache=True,
             resource_manager: Optional[ResourceManager] = None,
+            ammo_cache_dir=None,
     ):
         self.log = logging.getLogger(__name__)
         self.ammo_file = ammo_file
@@ -55,6 +56,7 @@ class ComponentFactory():
         self.chosen_cases = chosen_cases or []
         self.use_cache = use_cache
         self.resource_manager = resource_manager or manager
+        self.ammo_cache_dir = ammo_cache_dir
 
     @property
     def ammo_type(self):
@@ -121,8 +123,11 @@ class ComponentFactory():
             raise NotImplementedError(
                 'No such ammo type implemented: "%s"' % self.ammo_type)
 
-        return missile.FILE_READERS[self.ammo_type](
+        reader = missile.FILE_READERS[self.ammo_type](
             self.ammo_file, headers=self.headers, http_ver=self.http_ver, use_cache=self.use_cache, resource_manager=self.resource_manager)
+        if self.ammo_cache_dir and reader.loops_to_compile:
+            return missile.CompiledAmmo(reader, self.ammo_cache_dir)
+        return reader
 
     def get_ammo_generator(self):
         ammo_gen = self._get_ammo_generator()
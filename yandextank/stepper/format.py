@@ -1,10 +1,48 @@
 '''
 Ammo formatters
+
+Text stpd is a sequence of missiles, each preceded by a line with its
+length, timestamp and marker::
+
+    len ts marker
+    missile
+
+Binary stpd is made for random access through mmap::
+
+    header | payload | index | markers | seconds
+
+payload is missiles one after another, index is a fixed-width record per
+missile (see INDEX_DTYPE), markers are stored once and referred to by
+number, seconds[s] is the number of the first missile at or after second s,
+to find a time offset without a search through the whole index. Timestamps
+of instances schedules go back at times, seconds are only kept for files
+ordered by time.
 '''
 import logging
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
 
 from .module_exceptions import StpdFileError
 
+BINARY_MAGIC = b'STPDBIN1'
+# magic, flags, number of missiles, payload size, number of markers,
+# offsets of index, markers and seconds
+BINARY_HEADER = struct.Struct('<8sQQQQQQQ')
+ORDERED = 1
+INDEX_DTYPE = np.dtype([('timestamp', '<i8'), ('offset', '<u8'), ('length', '<u4'), ('marker', '<u4')])
+# regions after payload start at multiples of that
+ALIGNMENT = 8
+
+
+def format_missile(timestamp, marker, missile):
+    return b"%s %s %s\n%s\n" % (str(len(missile)).encode('utf8'),
+                                str(timestamp).encode('utf8'),
+                                marker, missile)
+
 
 class Stpd(object):
     '''
@@ -16,9 +54,235 @@ class Stpd(object):
 
     def __iter__(self):
         for timestamp, marker, missile in self.af:
-            yield b"%s %s %s\n%s\n" % (str(len(missile)).encode('utf8'),
-                                       str(timestamp).encode('utf8'),
-                                       marker, missile)
+            yield format_missile(timestamp, marker, missile)
+
+
+class BinaryStpd(object):
+    '''
+    Binary STPD ammo formatter, gives (timestamp, marker, missile) for BinaryStpdWriter
+    '''
+
+    def __init__(self, ammo_factory):
+        self.af = ammo_factory
+
+    def __iter__(self):
+        for timestamp, marker, missile in self.af:
+            yield timestamp, marker.encode('utf8') if isinstance(marker, str) else marker, missile
+
+
+FORMATTERS = {
+    'text': Stpd,
+    'binary': BinaryStpd,
+}
+
+
+def is_binary_stpd(filename):
+    if not os.path.isfile(filename):
+        # stpd streamed through a FIFO is text, reading it here would take a part of the stream
+        return False
+    with open(filename, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def _padding(size):
+    return b'\0' * (-size % ALIGNMENT)
+
+
+class BinaryStpdWriter(object):
+    '''
+    Writes binary stpd, the header is written on close.
+    Index is kept in a temporary file until then.
+
+    :param f: seekable file opened for writing in binary mode
+    '''
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, f):
+        self.f = f
+        if hasattr(f, 'name'):
+            self.name = f.name
+        self.start = f.tell()
+        self.count = 0
+        self.payload_size = 0
+        self.last_timestamp = None
+        self.ordered = True
+        self.markers = {}
+        # seconds[s] is the number of the first missile at or after second s
+        self.seconds = []
+        self.index = tempfile.TemporaryFile()
+        self.rows = []
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, 0, 0, 0, 0, 0, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.index.close()
+
+    def tell(self):
+        ''' size of the file so far, with the index '''
+        return self.f.tell() - self.start + self.count * INDEX_DTYPE.itemsize
+
+    def _marker_id(self, marker):
+        marker_id = self.markers.get(marker)
+        if marker_id is None:
+            marker_id = self.markers[marker] = len(self.markers)
+        return marker_id
+
+    def _check_order(self, timestamp):
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            self.ordered = False
+
+    def write(self, item):
+        ''' :param item: (timestamp, marker, missile) '''
+        timestamp, marker, missile = item
+        self._check_order(timestamp)
+        if self.ordered:
+            second = timestamp // 1000
+            while len(self.seconds) <= second:
+                self.seconds.append(self.count)
+        self.rows.append((timestamp, self.payload_size, len(missile), self._marker_id(marker)))
+        self.f.write(missile)
+        self.payload_size += len(missile)
+        self.last_timestamp = timestamp
+        self.count += 1
+        if len(self.rows) >= self.BLOCK_SIZE:
+            self._flush_rows()
+
+    def _flush_rows(self):
+        if self.rows:
+            self.index.write(np.array(self.rows, dtype=INDEX_DTYPE).tobytes())
+            self.rows = []
+
+    def extend(self, reader, chunk_size=1 << 24):
+        ''' append all missiles of a BinaryStpdReader, without going through them one by one '''
+        if not len(reader):
+            return
+        index = reader.index.copy()
+        timestamps = index['timestamp']
+        self._check_order(timestamps[0])
+        self.ordered = self.ordered and reader.ordered
+        self._flush_rows()
+        index['offset'] += self.payload_size
+        index['marker'] = np.array([self._marker_id(marker) for marker in reader.markers], dtype='<u4')[
+            index['marker']]
+        last_second = timestamps[-1] // 1000
+        if self.ordered and len(self.seconds) <= last_second:
+            seconds = np.arange(len(self.seconds), last_second + 1) * 1000
+            self.seconds += (self.count + np.searchsorted(timestamps, seconds)).tolist()
+        self.index.write(index.tobytes())
+        payload = reader.payload
+        for start in range(0, len(payload), chunk_size):
+            self.f.write(payload[start:start + chunk_size])
+        self.payload_size += len(payload)
+        self.last_timestamp = int(timestamps[-1])
+        self.count += len(index)
+
+    def close(self):
+        self._flush_rows()
+        f = self.f
+        f.write(_padding(self.payload_size))
+        index_offset = f.tell() - self.start
+        self.index.seek(0)
+        while True:
+            data = self.index.read(1 << 24)
+            if not data:
+                break
+            f.write(data)
+        self.index.close()
+        markers = sorted(self.markers, key=self.markers.get)
+        markers_offset = f.tell() - self.start
+        marker_data = np.array([len(marker) for marker in markers], dtype='<u4').tobytes() + b''.join(markers)
+        f.write(marker_data + _padding(len(marker_data)))
+        seconds_offset = f.tell() - self.start
+        seconds = self.seconds if self.ordered else []
+        f.write(np.array(seconds + [self.count], dtype='<i8').tobytes())
+        end = f.tell()
+        f.seek(self.start)
+        f.write(BINARY_HEADER.pack(
+            BINARY_MAGIC, ORDERED if self.ordered else 0, self.count, self.payload_size, len(markers),
+            index_offset, markers_offset, seconds_offset))
+        f.seek(end)
+
+
+class BinaryStpdReader(object):
+    '''
+    Missiles of binary stpd file, read through mmap.
+    Missiles are memoryview slices of the file, they are not copied;
+    str(missile, 'utf8') and bytes(missile) work with them as with bytes.
+
+    >>> reader = BinaryStpdReader('ammo.bstpd')
+    >>> timestamp, missile, marker = reader[reader.seek(60000)]  # the first missile of the second minute
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.log = logging.getLogger(__name__)
+        with open(filename, 'rb') as f:
+            try:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise StpdFileError("Binary stpd file %s is empty" % filename)
+        if len(self.mm) < BINARY_HEADER.size:
+            raise StpdFileError("Binary stpd file %s is too short" % filename)
+        magic, flags, count, payload_size, markers_count, index_offset, markers_offset, seconds_offset = \
+            BINARY_HEADER.unpack_from(self.mm)
+        if magic != BINARY_MAGIC:
+            raise StpdFileError("%s is not a binary stpd file" % filename)
+        if not index_offset:
+            raise StpdFileError("Binary stpd file %s was not closed properly" % filename)
+        self.ordered = bool(flags & ORDERED)
+        self.view = memoryview(self.mm)
+        self.payload = self.view[BINARY_HEADER.size:BINARY_HEADER.size + payload_size]
+        self.index = np.frombuffer(self.view, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        lengths = np.frombuffer(self.view, dtype='<u4', count=markers_count, offset=markers_offset)
+        bounds = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]) + markers_offset + lengths.nbytes
+        self.markers = [bytes(self.view[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+        self.marker_names = [marker.decode('utf8') for marker in self.markers]
+        seconds_count = (len(self.mm) - seconds_offset) // np.dtype('<i8').itemsize
+        self.seconds = np.frombuffer(self.view, dtype='<i8', count=seconds_count, offset=seconds_offset)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        ''' (timestamp, missile, marker) of missile number i, the same as StpdReader gives '''
+        timestamp, offset, length, marker = self.index[i].tolist()
+        return timestamp, self.payload[offset:offset + length], self.marker_names[marker]
+
+    def seek(self, timestamp):
+        ''' number of the first missile at or after timestamp (ms) '''
+        if not self.ordered:
+            raise StpdFileError("Missiles of %s are not ordered by time" % self.filename)
+        second = max(timestamp // 1000, 0)
+        if second >= len(self.seconds) - 1:
+            return len(self)
+        start, end = self.seconds[second:second + 2].tolist()
+        return start + int(np.searchsorted(self.index['timestamp'][start:end], timestamp))
+
+    def missiles(self, start=0, block_size=1 << 16):
+        ''' (timestamp, missile, marker) from missile number start '''
+        for block_start in range(start, len(self), block_size):
+            block = self.index[block_start:block_start + block_size]
+            for timestamp, offset, length, marker in zip(
+                    block['timestamp'].tolist(), block['offset'].tolist(),
+                    block['length'].tolist(), block['marker'].tolist()):
+                yield timestamp, self.payload[offset:offset + length], self.marker_names[marker]
+
+    def __iter__(self):
+        return self.missiles()
+
+    def close(self):
+        self.index = self.seconds = self.payload = None
+        try:
+            self.view.release()
+            self.mm.close()
+        except BufferError:
+            # missiles are still referred to, the file is unmapped when they are gone
+            self.log.debug("Binary stpd %s is still in use", self.filename)
 
 
 class StpdReader(object):
@@ -59,3 +323,30 @@ class StpdReader(object):
                         % (ammo_file.tell(), chunk_header, e))
                 chunk_header = read_chunk_header(ammo_file)
         self.log.info("Reached the end of stpd file")
+
+
+def text_to_binary(source, destination):
+    '''
+    Convert text stpd to binary
+
+    :returns: number of missiles
+    '''
+    with open(destination, 'wb') as f, BinaryStpdWriter(f) as writer:
+        for timestamp, missile, marker in StpdReader(source):
+            writer.write((timestamp, marker.encode('utf8'), missile))
+    return writer.count
+
+
+def binary_to_text(source, destination):
+    '''
+    Convert binary stpd to text
+
+    :returns: number of missiles
+    '''
+    reader = BinaryStpdReader(source)
+    with open(destination, 'wb') as f:
+        for timestamp, missile, marker in reader:
+            f.write(format_missile(timestamp, marker.encode('utf8'), missile))
+    count = len(reader)
+    reader.close()
+    return count
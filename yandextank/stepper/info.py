@@ -39,6 +39,8 @@ class StepperStatus(object):
         self.lp_progress = 0
         self.af_progress = 0
         self._timer = time.time()
+        # do not show progress, e.g. in stepping worker processes
+        self.quiet = False
 
     def publish(self, key, value):
         if key not in self.info:
@@ -97,6 +99,8 @@ class StepperStatus(object):
         return StepperInfo(**self.info)
 
     def update_view(self):
+        if self.quiet:
+            return
         ammo_generated = self._ammo_count - self._old_ammo_count
         self._old_ammo_count = self._ammo_count
         cur_time = time.time()
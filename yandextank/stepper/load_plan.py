@@ -1,12 +1,54 @@
 '''
 Load Plan generators
+
+Plans produce timestamps of shots (milliseconds) one by one when iterated
+and in NumPy blocks with blocks(), which is what the stepper uses.
 '''
 import re
-from itertools import chain, groupby
+from itertools import chain, groupby, islice
 from builtins import range
+
+import numpy as np
+
 from . import info
 from .util import parse_duration, solve_quadratic, proper_round
 
+# timestamps per block
+BLOCK_SIZE = 1 << 16
+
+
+def timestamp_blocks(load_plan, block_size=BLOCK_SIZE):
+    '''
+    Timestamps of a load plan in int64 arrays of at most block_size items.
+    Plans without blocks() (e.g. instance plans, which are endless) are read
+    block_size items at a time.
+    '''
+    if hasattr(load_plan, 'blocks'):
+        return load_plan.blocks(block_size)
+    return _iterator_blocks(iter(load_plan), block_size)
+
+
+def _iterator_blocks(iterator, block_size):
+    while True:
+        block = np.fromiter(islice(iterator, block_size), dtype=np.int64)
+        if not len(block):
+            return
+        yield block
+
+
+def skip_timestamps(blocks, count):
+    ''' blocks without the first `count` timestamps '''
+    for block in blocks:
+        if count >= len(block):
+            count -= len(block)
+            continue
+        yield block[count:]
+        count = 0
+
+
+def _flatten(blocks):
+    return chain.from_iterable(block.tolist() for block in blocks)
+
 
 class Const(object):
     '''
@@ -18,12 +60,16 @@ class Const(object):
         self.duration = duration
 
     def __iter__(self):
+        return _flatten(self.blocks())
+
+    def blocks(self, block_size=BLOCK_SIZE):
         if self.rps == 0:
-            return iter([])
+            return
         interval = 1000.0 / self.rps
-        return (
-            int(i * interval)
-            for i in range(0, int(self.rps * self.duration / 1000)))
+        count = int(self.rps * self.duration / 1000)
+        for start in range(0, count, block_size):
+            numbers = np.arange(start, min(start + block_size, count), dtype=np.float64)
+            yield (numbers * interval).astype(np.int64)
 
     def rps_at(self, t):
         '''Return rps for second t'''
@@ -73,12 +119,31 @@ class Line(object):
             root2 = float(n) / self.minrps
         return int(root2 * 1000)
 
+    def ts_array(self, numbers):
+        """
+        Vectorized ts(): the same roots of slope / 2 * t^2 + minrps * t - n = 0
+
+        :param numbers: float array of charge numbers
+        :return: int64 array of timestamps, milliseconds
+        """
+        a, b = self.slope / 2.0, self.minrps
+        if a == 0:
+            roots = numbers / b
+        else:
+            roots = (-b + np.sqrt((b * b) - 4 * a * -numbers)) / (2 * a)
+        return (roots * 1000).astype(np.int64)
+
     def __iter__(self):
         """
 
         :return: timestamps for each charge
         """
-        return (self.ts(n) for n in range(0, self.__len__()))
+        return _flatten(self.blocks())
+
+    def blocks(self, block_size=BLOCK_SIZE):
+        count = self.__len__()
+        for start in range(0, count, block_size):
+            yield self.ts_array(np.arange(start, min(start + block_size, count), dtype=np.float64))
 
     def rps_at(self, t):
         '''Return rps for second t'''
@@ -126,10 +191,13 @@ class Composite(object):
         self.steps = steps
 
     def __iter__(self):
+        return _flatten(self.blocks())
+
+    def blocks(self, block_size=BLOCK_SIZE):
         base = 0
         for step in self.steps:
-            for ts in step:
-                yield ts + base
+            for block in timestamp_blocks(step, block_size):
+                yield block + base
             base += step.get_duration()
 
     def get_duration(self):
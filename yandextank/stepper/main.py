@@ -4,16 +4,29 @@ Module contains top-level generators.
 import hashlib
 import json
 import logging
+import multiprocessing
 import os
+import select
 import shutil
+import threading
+import time
 from builtins import zip
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
 from pathlib import Path
 
+import numpy as np
+
 from . import format as fmt
 from . import info
+from . import load_plan as lp
 from .config import ComponentFactory
+from .info import LoopCountLimit
+from .missile import CompiledAmmo
 from .module_exceptions import DiskLimitError, StepperConfigurationError
 
+log = logging.getLogger(__name__)
+
 
 class AmmoFactory(object):
     '''
@@ -39,27 +52,141 @@ class AmmoFactory(object):
         configured ComponentFactory, passed as a parameter to the
         __init__ method of this class.
         '''
-        ammo_stream = (
+        return self.iter_from(0)
+
+    def iter_from(self, start, position=None):
+        '''
+        The same tuples __iter__ gives after the first `start` ones, with
+        info.status as if the first `start` missiles were written.
+
+        :param position: (loop, compiled missile number) of missile `start`
+            from positions(), the missiles before it are read and skipped without it
+        '''
+        if start and position is not None:
+            loop, number = position
+            self.ammo_generator.seek(loop, number)
+            info.status.loop_count, info.status.ammo_count = loop, start
+        ammo_stream = self._ammo_stream()
+        # timestamps are generated in NumPy blocks, not one by one
+        blocks = lp.timestamp_blocks(self.load_plan)
+        if start:
+            if position is None and not self._skip(ammo_stream, start):
+                return iter(())
+            blocks = lp.skip_timestamps(blocks, start)
+        timestamps = chain.from_iterable(block.tolist() for block in blocks)
+        return ((timestamp, marker or self.marker(missile), missile)
+                for timestamp, (missile, marker
+                                ) in zip(timestamps, ammo_stream))
+
+    def _ammo_stream(self):
+        return (
             ammo
             for ammo in ((missile, marker or self.marker(missile))
                          for missile, marker in self.ammo_generator)
             if self.filter(ammo))
 
-        return ((timestamp, marker or self.marker(missile), missile)
-                for timestamp, (missile, marker
-                                ) in zip(self.load_plan, ammo_stream))
+    def positions(self, starts):
+        '''
+        Where missiles number `starts` of the stream are in compiled ammo, so
+        stepping processes seek to them instead of reading the ammo from the
+        beginning. Ammo is compiled here if it is not compiled yet.
+
+        :returns: (loop, compiled missile number) for every start,
+            None for the ones after the end of the stream
+        '''
+        reader = self.ammo_generator.open()
+        if reader is None:
+            return [None] * len(starts)
+        try:
+            first, repeated = self.ammo_generator.loops(reader)
+            chosen = np.ones(len(reader), dtype=bool)
+            if self.factory.chosen_cases:
+                markers = [marker or None for marker in reader.markers]
+                for number, (offset, length, marker) in enumerate(zip(
+                        reader.index['offset'].tolist(), reader.index['length'].tolist(),
+                        reader.index['marker'].tolist())):
+                    missile = bytes(reader.payload[offset:offset + length])
+                    chosen[number] = self.filter((missile, markers[marker] or self.marker(missile)))
+        finally:
+            reader.close()
+        first = np.flatnonzero(chosen[first.start:first.stop]) + first.start
+        repeated = np.flatnonzero(chosen[repeated.start:repeated.stop]) + repeated.start
+        loop_limit, ammo_limit = info.status.loop_limit, info.status.ammo_limit
+        positions = []
+        for start in starts:
+            if start < len(first):
+                loop, number = 0, first[start]
+            elif len(repeated):
+                loop, number = divmod(start - len(first), len(repeated))
+                loop, number = loop + 1, repeated[number]
+            else:
+                loop, number = None, None
+            if loop is None or loop_limit and loop >= loop_limit or ammo_limit and start >= ammo_limit:
+                positions.append(None)
+            else:
+                positions.append((loop, int(number)))
+        return positions
+
+    @staticmethod
+    def _skip(ammo_stream, count):
+        '''
+        Take `count` missiles from ammo_stream, counting them in info.status.
+        Every loop after the first one is the same (uri readers collect
+        headers during the first one), so once the first loop is over the
+        whole loops are skipped without reading them.
+
+        :returns: False if the stream ends before `count` missiles
+        '''
+        skipped = 0
+        first_loop = True
+        try:
+            while skipped < count:
+                info.status.ammo_count = skipped
+                loop_count = info.status.loop_count
+                next(ammo_stream)
+                skipped += 1
+                if first_loop and info.status.loop_count > loop_count:
+                    first_loop = False
+                    loop_size = skipped - 1
+                    if loop_size:
+                        loops = (count - skipped) // loop_size
+                        info.status.loop_count += loops
+                        skipped += loops * loop_size
+            info.status.ammo_count = count
+        except (StopIteration, LoopCountLimit):
+            return False
+        return True
 
 
 class Stepper(object):
-    def __init__(self, core, **kwargs):
+    def __init__(self, core, stpd_format='text', **kwargs):
         info.status = info.StepperStatus()
         info.status.core = core
         self.af = AmmoFactory(ComponentFactory(**kwargs))
-        self.ammo = fmt.Stpd(self.af)
+        self.stpd_format = stpd_format
+        self.formatter = fmt.FORMATTERS[stpd_format]
+        self.ammo = self.formatter(self.af)
         self.first_loop_done = False
 
-    def write(self, f):
-        for missile in self.ammo:
+    def write(self, f, start=0, stop=None, position=None):
+        '''
+        Write missiles number start..stop - 1, all of them by default.
+
+        :param position: where missile `start` is in compiled ammo, see AmmoFactory.positions()
+        :returns: False if the stream goes on after stop
+        '''
+        if self.stpd_format == 'binary':
+            with fmt.BinaryStpdWriter(f) as writer:
+                return self._write(writer, start, stop, position)
+        return self._write(f, start, stop, position)
+
+    def _write(self, f, start, stop, position):
+        ammo = self.ammo
+        if start:
+            ammo = self.formatter(self.af.iter_from(start, position))
+            # only the part from the beginning knows the size of the whole file
+            self.first_loop_done = True
+        for missile in ammo:
             f.write(missile)
             try:
                 info.status.inc_ammo_count()
@@ -83,12 +210,18 @@ class Stepper(object):
                         info.status.ammo_limit = info.status.loop_limit * info.status.ammo_count
                         assert info.status.max_ammo is not None
                     self._check_whole_file_can_be_written(f)
+            if stop is not None and info.status.ammo_count >= stop:
+                return False
+        return True
 
     @staticmethod
     def _check_whole_file_can_be_written(file_descriptor):
         if not hasattr(file_descriptor, 'name'):
             # Скорее всего - это IO stream для тестов.
             return
+        if not Path(file_descriptor.name).is_file():
+            # stpd is streamed to a FIFO, nothing is stored
+            return
         written_bytes = file_descriptor.tell()
         expected_file_size = (1. / info.status.calculate_lp_progress()) * written_bytes
         need_to_write_more_bytes = expected_file_size - written_bytes
@@ -100,6 +233,192 @@ class Stepper(object):
                                  f'Ammo file expected file size is {expected_file_size} bytes.')
 
 
+def write_part(filename, start, stop, stepper_kwargs, file_cache=8192, position=None):
+    '''
+    Write missiles number start..stop - 1 of the stream to a part of stpd
+    file, in a worker process
+
+    :param position: where missile `start` is in compiled ammo, see AmmoFactory.positions()
+    :returns: (True if the stream ends in this part, StepperInfo)
+    '''
+    stepper = Stepper(None, **stepper_kwargs)
+    info.status.quiet = True
+    with open(filename, 'wb', file_cache) as f:
+        ended = stepper.write(f, start, stop, position)
+    return ended, info.status.get_info()
+
+
+# counters shared by the stpd stream process
+WRITTEN, LAST_TIMESTAMP, OPENED_AT, FINISHED = range(4)
+# update counters every that many missiles
+REPORT_EVERY = 1024
+
+
+def wait_reader(f, seconds):
+    '''
+    Sleep, but wake up as soon as the reader of pipe f closes it
+
+    :raises BrokenPipeError: if the reader has closed the pipe
+    '''
+    poller = select.poll()
+    poller.register(f, select.POLLERR)
+    if poller.poll(seconds * 1000):
+        raise BrokenPipeError('Reader has closed the stream')
+
+
+def pace(missiles, counters, max_lead, f=None):
+    '''
+    Pass (timestamp, marker, missile) tuples through, keeping them no more
+    than max_lead seconds ahead of the schedule that started when the
+    reader opened the stream. Missiles written to f so far are flushed
+    before waiting.
+    '''
+    opened_at = counters[OPENED_AT]
+    # time is looked up only when a missile is beyond the allowed part of the schedule
+    allowed = 0
+    written = 0
+    for missile in missiles:
+        timestamp = missile[0]
+        if timestamp > allowed:
+            allowed = (time.time() - opened_at + max_lead) * 1000
+            if timestamp > allowed:
+                counters[WRITTEN], counters[LAST_TIMESTAMP] = written, timestamp
+                if f is None:
+                    time.sleep((timestamp - allowed) / 1000.)
+                else:
+                    f.flush()
+                    wait_reader(f, (timestamp - allowed) / 1000.)
+                allowed = timestamp
+        written += 1
+        if not written % REPORT_EVERY:
+            counters[WRITTEN], counters[LAST_TIMESTAMP] = written, timestamp
+        yield missile
+    counters[WRITTEN] = written
+
+
+def renew_fifo(fifo):
+    ''' Replace fifo with a new one, those who have opened the old one keep it '''
+    new_fifo = '{}.new'.format(fifo)
+    os.mkfifo(new_fifo)
+    os.replace(new_fifo, fifo)
+
+
+def stream_stpd(fifo, stepper_kwargs, counters, max_lead, file_cache=8192):
+    '''
+    Write stpd to fifo, in the stpd stream process. Every reader that opens the
+    fifo gets the stream from the beginning, e.g. phantom reads a bit of it
+    when checking its config and the test run reads it once again.
+    '''
+    while True:
+        stepper = Stepper(None, **stepper_kwargs)
+        info.status.quiet = True
+        counters[OPENED_AT] = 0
+        # blocks until a reader opens the fifo
+        f = open(fifo, 'wb', file_cache)
+        # before a missile is written: the next reader opens a fifo of its own,
+        # it waits for the stream to start over instead of joining this one
+        renew_fifo(fifo)
+        counters[WRITTEN], counters[LAST_TIMESTAMP], counters[OPENED_AT] = 0, 0, time.time()
+        stepper.ammo = stepper.formatter(pace(stepper.af, counters, max_lead, f))
+        try:
+            with f:
+                stepper.write(f)
+        except BrokenPipeError:
+            continue
+        counters[FINISHED] = 1
+        return
+
+
+class StpdStream(object):
+    '''
+    A process streaming stpd to a FIFO and a thread reporting its
+    throughput and lead time: how far ahead of the schedule the stream is.
+    A negative lead time means the stepper does not keep up and missiles
+    are sent late.
+
+    :param fifo: path to make the FIFO at, an existing file is replaced
+    :param stepper_kwargs: Stepper parameters
+    :param max_lead: seconds of the schedule the stream is allowed to be ahead of it
+    :param core: TankCore to publish stepper stats to
+    '''
+
+    def __init__(self, fifo, stepper_kwargs, max_lead=10, core=None, file_cache=8192, report_period=1.):
+        self.fifo = fifo
+        self.stepper_kwargs = stepper_kwargs
+        self.max_lead = max_lead
+        self.core = core
+        self.file_cache = file_cache
+        self.report_period = report_period
+        context = multiprocessing.get_context('spawn')
+        self.counters = context.RawArray('d', 4)
+        self.process = context.Process(
+            target=stream_stpd, args=(fifo, stepper_kwargs, self.counters, max_lead, file_cache),
+            name='stpd stream', daemon=True)
+        self.reporter = threading.Thread(target=self._report, name='stpd stream reporter', daemon=True)
+        self.stopped = threading.Event()
+        self._last_written = 0
+        self._last_time = None
+
+    def start(self):
+        if os.path.lexists(self.fifo):
+            os.remove(self.fifo)
+        os.mkfifo(self.fifo)
+        self.process.start()
+        self.reporter.start()
+
+    def finished(self):
+        return bool(self.counters[FINISHED])
+
+    def lead_time(self):
+        ''' seconds the stream is ahead of the schedule, None until it is opened '''
+        opened_at = self.counters[OPENED_AT]
+        if not opened_at:
+            return None
+        return self.counters[LAST_TIMESTAMP] / 1000. - (time.time() - opened_at)
+
+    def stats(self):
+        '''
+        :returns: {"missiles": written, "speed": missiles per second since the
+            previous call, "lead_time": seconds or None}
+        '''
+        now = time.time()
+        written = int(self.counters[WRITTEN])
+        # counters start over when the stream is opened again
+        delta = max(written - self._last_written, 0) if self._last_time else 0
+        speed = delta / (now - self._last_time) if self._last_time and now > self._last_time else 0.
+        self._last_written, self._last_time = written, now
+        return {"missiles": written, "speed": speed, "lead_time": self.lead_time()}
+
+    def _report(self):
+        behind = False
+        while not self.stopped.wait(self.report_period):
+            stats = self.stats()
+            if self.finished():
+                log.info("Streamed %s missiles", stats['missiles'])
+                return
+            if stats['lead_time'] is None:
+                continue
+            log.debug("Stpd stream: %s", stats)
+            if self.core:
+                self.core.publish("stepper", "speed", "%s Krps" % int(stats['speed'] / 1000.0))
+                self.core.publish("stepper", "lead_time", round(stats['lead_time'], 3))
+            if stats['lead_time'] < 0 and not behind:
+                log.warning("Stepper does not keep up with the schedule, missiles are %.3fs late",
+                            -stats['lead_time'])
+            behind = stats['lead_time'] < 0
+
+    def stop(self):
+        self.stopped.set()
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.process.pid is not None:
+            self.process.join()
+        if self.reporter.is_alive():
+            self.reporter.join()
+        if os.path.lexists(self.fifo):
+            os.remove(self.fifo)
+
+
 class LoadProfile(object):
 
     def __init__(self, load_type, schedule):
@@ -137,6 +456,9 @@ class StepperWrapper(object):
     OPTION_AMMOFILE = "ammofile"
     OPTION_LOADSCHEME = 'loadscheme'
     OPTION_INSTANCES_LIMIT = 'instances'
+    STPD_EXTENSIONS = {'text': '.stpd', 'binary': '.bstpd'}
+    # do not start a process for less missiles than that
+    MIN_PART_SIZE = 100000
 
     def __init__(self, core, cfg):
         self.log = logging.getLogger(__name__)
@@ -166,6 +488,12 @@ class StepperWrapper(object):
         self.loop_count = 0
         self.loadscheme = ""
         self.file_cache = 8192
+        self.stepping_workers = 0
+        self.stpd_format = 'text'
+        self.stream_stpd = False
+        self.stream_max_lead = 10
+        self.stream = None
+        self.compiled_ammo = False
 
     def get_option(self, option, param2=None):
         ''' get_option wrapper'''
@@ -186,7 +514,8 @@ class StepperWrapper(object):
         ]
         opts += [
             "use_caching", "cache_dir", "force_stepping", "file_cache",
-            "chosen_cases"
+            "chosen_cases", "stepping_workers", "stpd_format",
+            "stream_stpd", "stream_max_lead", "compiled_ammo"
         ]
         return opts
 
@@ -217,6 +546,12 @@ class StepperWrapper(object):
         cache_dir = self.get_option("cache_dir") or self.core.artifacts_base_dir
         self.cache_dir = os.path.expanduser(cache_dir)
         self.force_stepping = self.get_option("force_stepping")
+        self.stepping_workers = self.get_option("stepping_workers")
+        # binary stpd is only read by bfg
+        self.stpd_format = self.cfg.get("stpd_format", "text")
+        self.stream_stpd = self.get_option("stream_stpd")
+        self.stream_max_lead = self.get_option("stream_max_lead")
+        self.compiled_ammo = self.get_option("compiled_ammo")
         if self.get_option(self.OPTION_LOAD)[self.OPTION_LOAD_TYPE] == 'stpd_file':
             self.stpd = self.get_option(self.OPTION_LOAD)[self.OPTION_SCHEDULE]
 
@@ -242,7 +577,11 @@ class StepperWrapper(object):
             self.core.publish('stepper', 'instances', stepper_info.instances)
             return stepper_info
 
-        if not self.stpd:
+        if self.stream_stpd and not self.stpd and not self.load_profile.is_rps():
+            self.log.warning("Only stpd of rps schedules can be streamed, making stpd-file")
+        if self.stream_stpd and not self.stpd and self.load_profile.is_rps():
+            stepper_info = publish_info(self.__start_stream())
+        elif not self.stpd:
             self.stpd = self.__get_stpd_filename()
             if self.use_caching and not self.force_stepping and os.path.exists(
                     self.stpd) and os.path.exists(self.__si_filename()):
@@ -259,8 +598,7 @@ class StepperWrapper(object):
                 if (
                         self.force_stepping and os.path.exists(self.__si_filename())):
                     os.remove(self.__si_filename())
-                self.__make_stpd_file()
-                stepper_info = info.status.get_info()
+                stepper_info = self.__make_stpd_file()
                 self.__write_cached_options(stepper_info)
         else:
             self.log.info("Using specified stpd-file: %s", self.stpd)
@@ -306,9 +644,9 @@ class StepperWrapper(object):
                 os.makedirs(self.cache_dir)
             stpd = self.cache_dir + '/' + \
                 os.path.basename(self.ammo_file) + \
-                "_" + hasher.hexdigest() + ".stpd"
+                "_" + hasher.hexdigest() + self.STPD_EXTENSIONS[self.stpd_format]
         else:
-            stpd = os.path.realpath("ammo.stpd")
+            stpd = os.path.realpath("ammo" + self.STPD_EXTENSIONS[self.stpd_format])
         self.log.debug("Generated cache file name: %s", stpd)
         return stpd
 
@@ -329,11 +667,8 @@ class StepperWrapper(object):
         with open(self.__si_filename(), 'w') as si_file:
             json.dump(si._asdict(), si_file, indent=4)
 
-    def __make_stpd_file(self):
-        ''' stpd generation using Stepper class '''
-        self.log.info("Making stpd-file: %s", self.stpd)
-        stepper = Stepper(
-            self.core,
+    def __stepper_kwargs(self):
+        return dict(
             rps_schedule=self.load_profile.schedule if self.load_profile.is_rps() else None,
             http_ver=self.http_ver,
             ammo_file=self.ammo_file,
@@ -348,6 +683,138 @@ class StepperWrapper(object):
             ammo_type=self.ammo_type,
             chosen_cases=self.chosen_cases,
             use_cache=self.use_caching,
-            resource_manager=self.core.resource_manager,)
+            stpd_format=self.stpd_format,
+            ammo_cache_dir=self.cache_dir if self.compiled_ammo else None,)
+
+    def __make_stpd_file(self):
+        ''' stpd generation using Stepper class '''
+        self.log.info("Making stpd-file: %s", self.stpd)
+        stepper_kwargs = self.__stepper_kwargs()
+        parts = self.__stpd_parts()
+        if len(parts) > 1 and self.ammo_file:
+            # workers seek to their parts in ammo compiled here
+            stepper_kwargs['ammo_cache_dir'] = self.cache_dir
+        stepper = Stepper(self.core, resource_manager=self.core.resource_manager, **stepper_kwargs)
+        if len(parts) > 1 and self.ammo_file:
+            parts = self.__seek_parts(stepper.af, parts)
+        if len(parts) > 1:
+            return self.__make_stpd_file_parallel(stepper_kwargs, parts)
         with open(self.stpd, 'wb', self.file_cache) as os:
             stepper.write(os)
+        return info.status.get_info()
+
+    def __start_stream(self):
+        '''
+        Start streaming stpd to a FIFO in artifacts dir instead of making
+        stpd-file. Ammo count is the planned one, as the stream is not made yet.
+        '''
+        self.stpd = self.core.mkstemp('.stpd', 'ammo_stream_')
+        self.log.info("Streaming stpd through %s", self.stpd)
+        if self.stpd_format != 'text':
+            self.log.warning("Binary stpd is read through mmap and can not be streamed, streaming text one")
+        load_plan = lp.create(self.load_profile.schedule)
+        ammo_count = len(load_plan)
+        if self.ammo_limit > 0:
+            ammo_count = min(ammo_count, self.ammo_limit)
+        self.stream = StpdStream(
+            self.stpd, dict(self.__stepper_kwargs(), stpd_format='text'),
+            self.stream_max_lead, self.core, self.file_cache)
+        self.stream.start()
+        return info.StepperInfo(
+            loop_count=0,
+            steps=load_plan.get_rps_list(),
+            loadscheme=self.load_profile.schedule,
+            duration=load_plan.get_duration() / 1000,
+            ammo_count=ammo_count,
+            instances=self.instances)
+
+    def close(self):
+        ''' Stop streaming stpd, if it is streamed '''
+        if self.stream:
+            self.stream.stop()
+
+    def __stpd_parts(self):
+        '''
+        Ranges of missile numbers to step in parallel, one range for the
+        whole stream if it is to be stepped in this process
+
+        :returns: [(start, stop, position of start in compiled ammo or None)]
+        '''
+        whole = [(0, None, None)]
+        # instance plans are endless and numbered markers depend on all the missiles before
+        if self.stepping_workers < 2 or not self.load_profile.is_rps() or self.enum_ammo:
+            return whole
+        # workers open ammo with the default resource manager, remote ammo is stepped here
+        if self.ammo_file and not os.path.isfile(self.ammo_file):
+            return whole
+        missiles = len(lp.create(self.load_profile.schedule))
+        if self.ammo_limit > 0:
+            missiles = min(missiles, self.ammo_limit)
+        parts = min(self.stepping_workers, multiprocessing.cpu_count(), missiles // self.MIN_PART_SIZE)
+        if parts < 2:
+            return whole
+        starts = [missiles * i // parts for i in range(parts)]
+        # the last part goes on until the stream ends
+        return list(zip(starts, starts[1:] + [None], repeat(None)))
+
+    @staticmethod
+    def __seek_parts(ammo_factory, parts):
+        '''
+        Parts with positions of their starts in compiled ammo, without the
+        parts after the end of the stream. Ammo that can not be compiled is
+        stepped in this process, the whole stream in one part.
+        '''
+        if not isinstance(ammo_factory.ammo_generator, CompiledAmmo):
+            return [(0, None, None)]
+        positions = ammo_factory.positions([start for start, _, _ in parts])
+        if None in positions:
+            positions = positions[:positions.index(None)]
+        parts = [(start, stop, position) for (start, stop, _), position in zip(parts, positions)]
+        if not parts:
+            return [(0, None, None)]
+        # the last part goes on until the stream ends
+        start, _, position = parts[-1]
+        parts[-1] = (start, None, position)
+        return parts
+
+    def __make_stpd_file_parallel(self, stepper_kwargs, parts):
+        '''
+        Step parts of the stream in worker processes and concatenate them.
+        A worker seeks to its part in compiled ammo, or skips the missiles
+        before it, so the parts are the same as the ones a single Stepper writes.
+        '''
+        self.log.info("Stepping in %s processes", len(parts))
+        start_time = time.time()
+        filenames = ['{}.part{}'.format(self.stpd, i) for i in range(len(parts))]
+        try:
+            with ProcessPoolExecutor(len(parts), mp_context=multiprocessing.get_context('spawn')) as pool:
+                starts, stops, positions = zip(*parts)
+                results = list(pool.map(
+                    write_part, filenames, starts, stops, repeat(stepper_kwargs), repeat(self.file_cache),
+                    positions))
+            # parts after the one the stream ends in are empty
+            last = [ended for ended, _ in results].index(True)
+            stepper_info = results[last][1]
+            with open(self.stpd, 'wb', self.file_cache) as stpd_file:
+                self.__concatenate(stpd_file, filenames[:last + 1])
+        finally:
+            for filename in filenames:
+                if os.path.exists(filename):
+                    os.remove(filename)
+        self.log.info("Stepped %s missiles in %.2fs", stepper_info.ammo_count, time.time() - start_time)
+        self.core.publish("stepper", "progress", 100)
+        self.core.publish("stepper", "loop_count", stepper_info.loop_count)
+        return stepper_info
+
+    def __concatenate(self, stpd_file, filenames):
+        if self.stpd_format == 'binary':
+            # index of a part refers to its own payload and markers
+            with fmt.BinaryStpdWriter(stpd_file) as writer:
+                for filename in filenames:
+                    reader = fmt.BinaryStpdReader(filename)
+                    writer.extend(reader)
+                    reader.close()
+        else:
+            for filename in filenames:
+                with open(filename, 'rb') as part:
+                    shutil.copyfileobj(part, stpd_file, 1 << 20)
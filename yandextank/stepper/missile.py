@@ -3,12 +3,17 @@ Missile object and generators
 
 You should update Stepper.status.ammo_count and Stepper.status.loop_count in your custom generators!
 '''
+import hashlib
 import logging
+import os
 from itertools import cycle
 
+import numpy as np
+
 from yandextank.contrib.netort.netort.resource import manager as resource
 
 from . import info
+from .format import BinaryStpdReader, BinaryStpdWriter
 from .info import LoopCountLimit
 from .module_exceptions import AmmoFileError
 
@@ -81,11 +86,19 @@ class UriStyleGenerator(object):
 
 
 class Reader(object):
+    # loops to keep in compiled ammo: every loop after these is the same as the last one of them,
+    # 0 if missiles can not be compiled
+    loops_to_compile = 1
+
     def __init__(self, filename, use_cache=True, resource_manager=None, **kwargs):
         self.filename = filename
         self.use_cache = use_cache
         self.resource_manager = resource_manager or resource
 
+    def cache_key(self):
+        ''' reader options missiles depend on, besides the ammo file '''
+        return type(self).__name__
+
 
 class AmmoFileReader(Reader):
     """Read missiles from ammo file"""
@@ -151,6 +164,9 @@ class AmmoFileReader(Reader):
 
 class SlowLogReader(Reader):
     """Read missiles from SQL slow log. Not usable with Phantom"""
+    # missiles are str and the last request of a loop goes on in the next one
+    loops_to_compile = 0
+
     def __iter__(self):
         opener = self.resource_manager.get_opener(self.filename)
         with opener(self.use_cache) as ammo_file:
@@ -235,6 +251,9 @@ class AccessLogReader(Reader):
                 "There are some skipped lines. See full log for details.")
         self.log.debug(message)
 
+    def cache_key(self):
+        return '{}|{}'.format(type(self).__name__, sorted(self.headers))
+
     def __iter__(self):
         opener = self.resource_manager.get_opener(self.filename)
         with opener(self.use_cache) as ammo_file:
@@ -272,6 +291,9 @@ def _parse_header(header):
 
 
 class UriReader(Reader):
+    # headers met in the first loop apply to the missiles before them in the next ones
+    loops_to_compile = 2
+
     def __init__(self, filename, headers=None, http_ver='1.1', use_cache=True, resource_manager=None, **kwargs):
         super(UriReader, self).__init__(filename, use_cache, resource_manager)
         self.headers = {pair[0].strip(): pair[1].strip() for pair in [h.split(':', 1) for h in headers]} \
@@ -280,6 +302,9 @@ class UriReader(Reader):
         self.log = logging.getLogger(__name__)
         self.log.info("Loading ammo from '%s' using URI format." % filename)
 
+    def cache_key(self):
+        return '{}|{}|{}'.format(type(self).__name__, self.http_ver, sorted(self.headers.items()))
+
     def __iter__(self):
         opener = self.resource_manager.get_opener(self.filename)
         with opener(self.use_cache) as ammo_file:
@@ -320,6 +345,7 @@ class UriReader(Reader):
 
 class UriPostReader(Reader):
     """Read POST missiles from ammo file"""
+    loops_to_compile = 2
 
     def __init__(self, filename, headers=None, http_ver='1.1', use_cache=True, **kwargs):
         super(UriPostReader, self).__init__(filename, use_cache)
@@ -329,6 +355,9 @@ class UriPostReader(Reader):
         self.log = logging.getLogger(__name__)
         self.log.info("Loading ammo from '%s' using URI+POST format", filename)
 
+    def cache_key(self):
+        return '{}|{}|{}'.format(type(self).__name__, self.http_ver, sorted(self.headers.items()))
+
     def __iter__(self):
         def read_chunk_header(ammo_file):
             chunk_header = b''
@@ -389,6 +418,126 @@ class UriPostReader(Reader):
                 info.status.af_position = ammo_file.tell()
 
 
+class CompiledAmmo(object):
+    '''
+    Missiles of an ammo file reader, parsed once and kept in cache_dir as
+    binary stpd, with the number of the loop in place of timestamps. Later
+    loops and later tests read them through mmap, without parsing.
+
+    The cache is keyed by the hash of the ammo file opener and the reader
+    options. Missiles are the same the reader gives, loop counting and
+    limits work the same way.
+    '''
+    VERSION = 1
+
+    def __init__(self, reader, cache_dir):
+        self.reader = reader
+        self.cache_dir = cache_dir
+        self.log = logging.getLogger(__name__)
+        # (loop, compiled missile number) the next iteration starts at
+        self.start = (0, 0)
+
+    @property
+    def filename(self):
+        opener = self.reader.resource_manager.get_opener(self.reader.filename)
+        key = 'compiled ammo version {}|{}|{}'.format(self.VERSION, self.reader.cache_key(), opener.hash)
+        return os.path.join(self.cache_dir, '{}_{}.ammo'.format(
+            os.path.basename(self.reader.filename), hashlib.md5(key.encode('utf8')).hexdigest()))
+
+    def compile(self, filename):
+        '''
+        Parse reader.loops_to_compile loops of the reader to filename
+
+        :returns: number of missiles
+        '''
+        self.log.info("Compiling ammo to %s", filename)
+        status = info.status
+        # loops are counted and limited by the reader, in a status of its own
+        info.status = info.StepperStatus()
+        info.status.quiet = True
+        # the limit only stops readers that go round without missiles
+        info.status.loop_limit = self.reader.loops_to_compile + 1
+        tmp_filename = '{}.{}'.format(filename, os.getpid())
+        try:
+            with open(tmp_filename, 'wb') as f, BinaryStpdWriter(f) as writer:
+                for missile, marker in self.reader:
+                    if info.status.loop_count == self.reader.loops_to_compile:
+                        break
+                    writer.write((info.status.loop_count, marker or b'', missile))
+                    info.status.inc_ammo_count()
+                count = writer.count
+            # stepping processes may compile the same ammo at the same time
+            os.replace(tmp_filename, filename)
+        finally:
+            info.status = status
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+        return count
+
+    def open(self):
+        '''
+        Compiled missiles, compiled now if they are not in cache_dir yet
+
+        :returns: BinaryStpdReader, None if the reader gives no missiles
+        '''
+        filename = self.filename
+        if not os.path.exists(filename):
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            if not self.compile(filename):
+                os.remove(filename)
+                return None
+        self.log.info("Using compiled ammo %s", filename)
+        return BinaryStpdReader(filename)
+
+    def seek(self, loop, number):
+        ''' Start the next iteration at compiled missile `number` as a missile of loop `loop` '''
+        self.start = (loop, number)
+
+    def __iter__(self):
+        reader = self.open()
+        if reader is None:
+            # nothing to keep, let the reader deal with an empty file
+            yield from self.reader
+            return
+        try:
+            yield from self._missiles(reader, *self.start)
+        finally:
+            reader.close()
+
+    @staticmethod
+    def loops(reader):
+        '''
+        Compiled missile numbers of the first loop and of every loop after it:
+        the last loop kept goes on and on
+
+        :returns: (range, range)
+        '''
+        loops = reader.index['timestamp']
+        last_loop = int(np.searchsorted(loops, loops[-1]))
+        return range(0, last_loop or len(reader)), range(last_loop, len(reader))
+
+    @classmethod
+    def _missiles(cls, reader, loop=0, number=0, block_size=1 << 16):
+        info.status.af_size = len(reader.payload)
+        markers = [marker or None for marker in reader.markers]
+        first, repeated = cls.loops(reader)
+        start, end = number, (repeated if loop else first).stop
+        while True:
+            for block_start in range(start, end, block_size):
+                block = reader.index[block_start:min(block_start + block_size, end)]
+                for offset, length, marker in zip(
+                        block['offset'].tolist(), block['length'].tolist(), block['marker'].tolist()):
+                    yield bytes(reader.payload[offset:offset + length]), markers[marker]
+                info.status.af_position = offset + length
+            info.status.af_position = 0
+            try:
+                info.status.inc_loop_count()
+            except LoopCountLimit:
+                break
+            start, end = repeated.start, repeated.stop
+
+
 FILE_READERS = {
     'phantom': AmmoFileReader,
     'slowlog': SlowLogReader,
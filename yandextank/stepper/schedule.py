@@ -0,0 +1,75 @@
+'''
+Planned send times of requests, for generators that do not report them
+'''
+import numpy as np
+
+
+class StepSchedule(object):
+    '''
+    Send delays of requests estimated from the per-second load plan. This is
+    an estimate for generators that do not log planned times, e.g. phantom,
+    unlike the exact delay bfg reports for every request.
+
+    The plan starts with the first request the generator sent, so the time
+    the generator takes to start up is not counted as delay. The k-th request
+    sent was planned for the time the plan reaches k requests, requests are
+    assumed to be spread evenly within a second of the plan.
+
+    Requests are numbered by their send times, not in the order rows are
+    read: sends read so far are counted in bins of `bin_size` seconds. The
+    estimate is off by up to `bin_size` and by the number of requests sent
+    before a request that are still in flight when it is read, divided by rps.
+
+    :param steps: [(rps, duration in seconds), ...], e.g. StepperInfo.steps
+    :param bin_size: seconds, resolution of send times
+    '''
+
+    def __init__(self, steps, bin_size=0.01):
+        rps = np.concatenate([np.full(int(duration), rps, dtype=np.float64) for rps, duration in steps] or [[]])
+        self.rps = rps
+        self.planned_counts = np.cumsum(rps)
+        self.bin_size = bin_size
+        # the earliest send time read, the plan starts at it
+        self.start_time = None
+        # send time of the first bin, earlier sends are counted in it
+        self.origin = None
+        self.sent = np.zeros(0, dtype=np.int64)
+
+    def planned_offsets(self, numbers):
+        ''' planned time of requests number `numbers` (0-based) in seconds since the start '''
+        numbers = np.asarray(numbers, dtype=np.float64)
+        second = np.searchsorted(self.planned_counts, numbers, side='right')
+        beyond = second >= len(self.rps)
+        second = np.minimum(second, len(self.rps) - 1)
+        before = np.where(second > 0, self.planned_counts[second - 1], 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offsets = second + (numbers - before) / self.rps[second]
+        # requests beyond the plan were due at its end
+        return np.where(beyond, len(self.rps), offsets)
+
+    def numbers(self, send_ts):
+        ''' count sends of the next requests and number them in the order they were sent '''
+        if self.origin is None:
+            self.origin = send_ts.min()
+        position = np.maximum((send_ts - self.origin) / self.bin_size, 0)
+        bins = position.astype(np.int64)
+        counts = np.bincount(bins)
+        if len(counts) > len(self.sent):
+            self.sent = np.append(self.sent, np.zeros(len(counts) - len(self.sent), dtype=np.int64))
+        self.sent[:len(counts)] += counts
+        before = np.cumsum(self.sent[:len(counts)]) - self.sent[:len(counts)]
+        # requests of a bin are assumed to be spread evenly within it
+        return before[bins] + (self.sent[bins] - 1) * (position - bins)
+
+    def send_delays(self, send_ts):
+        '''
+        :param send_ts: send times of the next requests, in any order
+        :returns: delays in microseconds, int64 array in the order of send_ts
+        '''
+        if not len(send_ts) or not len(self.rps):
+            return np.zeros(len(send_ts), dtype=np.int64)
+        send_ts = np.asarray(send_ts, dtype=np.float64)
+        first = send_ts.min()
+        self.start_time = first if self.start_time is None else min(self.start_time, first)
+        planned = self.start_time + self.planned_offsets(self.numbers(send_ts))
+        return np.rint(np.maximum(send_ts - planned, 0) * 1e6).astype(np.int64)
@@ -0,0 +1,87 @@
+import io
+import os
+
+import pytest
+
+from yandextank.common.util import get_test_path
+from yandextank.stepper import StpdReader, info
+from yandextank.stepper.format import BinaryStpdReader, BinaryStpdWriter, binary_to_text, is_binary_stpd, \
+    text_to_binary
+from yandextank.stepper.main import Stepper, write_part
+from yandextank.stepper.module_exceptions import StpdFileError
+
+STPD_FILES = ['expected.stpd', 'uripost-expected.stpd', 'caseline-expected.stpd', 'instances1.stpd']
+
+
+def stpd_path(name):
+    return os.path.join(get_test_path(), 'yandextank/stepper/tests', name)
+
+
+@pytest.mark.parametrize('stpd', STPD_FILES)
+def test_convert(stpd, tmp_path):
+    binary, text = str(tmp_path / 'ammo.bstpd'), str(tmp_path / 'ammo.stpd')
+    missiles = list(StpdReader(stpd_path(stpd)))
+    assert text_to_binary(stpd_path(stpd), binary) == len(missiles)
+    assert is_binary_stpd(binary) and not is_binary_stpd(stpd_path(stpd))
+
+    reader = BinaryStpdReader(binary)
+    assert len(reader) == len(missiles)
+    assert [(ts, bytes(missile), marker) for ts, missile, marker in reader] == missiles
+    assert [reader[i][0] for i in range(len(reader))] == [ts for ts, _, _ in missiles]
+    assert binary_to_text(binary, text) == len(missiles)
+    assert list(StpdReader(text)) == missiles
+
+
+@pytest.mark.parametrize('stpd', ['expected.stpd', 'uripost-expected.stpd', 'caseline-expected.stpd'])
+def test_seek(stpd, tmp_path):
+    binary = str(tmp_path / 'ammo.bstpd')
+    text_to_binary(stpd_path(stpd), binary)
+    reader = BinaryStpdReader(binary)
+    timestamps = [ts for ts, _, _ in StpdReader(stpd_path(stpd))]
+    for timestamp in list(range(-10, timestamps[-1] + 2000, 7)) + timestamps:
+        assert reader.seek(timestamp) == len([ts for ts in timestamps if ts < timestamp])
+    start = reader.seek(timestamps[len(timestamps) // 2])
+    assert [ts for ts, _, _ in reader.missiles(start)] == timestamps[start:]
+
+
+def test_unordered(tmp_path):
+    # instances schedules start over
+    binary = str(tmp_path / 'ammo.bstpd')
+    text_to_binary(stpd_path('instances1.stpd'), binary)
+    reader = BinaryStpdReader(binary)
+    assert not reader.ordered
+    with pytest.raises(StpdFileError):
+        reader.seek(0)
+
+
+def test_not_binary():
+    with pytest.raises(StpdFileError):
+        BinaryStpdReader(stpd_path('expected.stpd'))
+
+
+def test_binary_stepper(tmp_path):
+    kwargs = dict(rps_schedule=['line(1, 20, 9s)'], http_ver='1.1', instances=10, use_cache=False,
+                  uris=['/', '/foo'], autocases=1)
+    text = io.BytesIO()
+    Stepper(None, **kwargs).write(text)
+    stepper_info = info.status.get_info()
+    binary = str(tmp_path / 'ammo.bstpd')
+    with open(binary, 'wb') as f:
+        Stepper(None, stpd_format='binary', **kwargs).write(f)
+    assert info.status.get_info() == stepper_info
+    with open(str(tmp_path / 'ammo.stpd'), 'wb') as f:
+        f.write(text.getvalue())
+    assert [(ts, bytes(missile), marker) for ts, missile, marker in BinaryStpdReader(binary)] == \
+        list(StpdReader(str(tmp_path / 'ammo.stpd')))
+
+    # parts of binary stpd are merged through their indexes
+    parts = []
+    for start, stop in [(0, 30), (30, 31), (31, None)]:
+        parts.append(str(tmp_path / 'part{}'.format(start)))
+        write_part(parts[-1], start, stop, dict(kwargs, stpd_format='binary'))
+    merged = str(tmp_path / 'merged.bstpd')
+    with open(merged, 'wb') as f, BinaryStpdWriter(f) as writer:
+        for part in parts:
+            writer.extend(BinaryStpdReader(part))
+    with open(binary, 'rb') as whole, open(merged, 'rb') as f:
+        assert f.read() == whole.read()
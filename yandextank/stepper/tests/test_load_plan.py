@@ -2,15 +2,17 @@ import io
 import os
 import threading
 
+import numpy as np
 import pytest
 
-from yandextank.stepper.main import LoadProfile
+from yandextank.stepper import info
+from yandextank.stepper.main import LoadProfile, write_part
 from yandextank.common.util import get_test_path
 from yandextank.common.util import read_resource
 from yandextank.common.interfaces import TankInfo
 from yandextank.core import TankCore
 from yandextank.stepper import Stepper
-from yandextank.stepper.load_plan import create, Const, Line, Composite, Stairway, StepFactory
+from yandextank.stepper.load_plan import create, timestamp_blocks, Const, Line, Composite, Stairway, StepFactory
 from yandextank.stepper.util import take
 
 
@@ -152,6 +154,36 @@ class TestCreate(object):
         # pytest.set_trace()
         assert take(check_point, (create(rps_schedule))) == expected
 
+    @pytest.mark.parametrize('rps_schedule', [
+        ['line(1, 5, 2s)'],
+        ['line(5, 1, 2s)'],
+        ['line(7, 7, 3s)'],
+        ['line(0.3, 20000, 10s)'],
+        ['const(1.5, 10s)', 'const(0, 1s)', 'const(33333, 3s)'],
+        ['step(1.2, 5.7, 1.1, 5s)', 'line(1000, 10, 5s)'],
+    ])
+    @pytest.mark.parametrize('block_size', [1, 7, 1000, 1 << 16])
+    def test_blocks(self, rps_schedule, block_size):
+        def shots(step):
+            if isinstance(step, Line):
+                return [step.ts(n) for n in range(len(step))]
+            if isinstance(step, Const):
+                if step.rps == 0:
+                    return []
+                interval = 1000.0 / step.rps
+                return [int(i * interval) for i in range(int(step.rps * step.duration / 1000))]
+            base, result = 0, []
+            for substep in step.steps:
+                result += [ts + base for ts in shots(substep)]
+                base += substep.get_duration()
+            return result
+
+        load_plan = create(rps_schedule)
+        blocks = list(timestamp_blocks(load_plan, block_size))
+        assert all(0 < len(block) <= block_size for block in blocks)
+        assert np.concatenate(blocks).tolist() == shots(load_plan)
+        assert list(load_plan) == shots(load_plan)
+
 
 # ([0-9.]+d)?([0-9.]+h)?([0-9.]+m)?([0-9.]+s)?
 @pytest.mark.parametrize('step_config, expected_duration', [
@@ -227,6 +259,90 @@ def test_loop_limit(stepper_kwargs, expected_stpd):
         assert result.strip() == expected.strip(), 'Line {} mismatch'.format(i)
 
 
+@pytest.mark.parametrize('stepper_kwargs', [
+    {'ammo_file': os.path.join(get_test_path(), 'yandextank/stepper/tests/test-ammo.txt')},
+    {'ammo_type': 'uripost',
+     'ammo_file': os.path.join(get_test_path(), 'yandextank/stepper/tests/test-uripost.txt')},
+    {'ammo_type': 'uri',
+     'ammo_file': os.path.join(get_test_path(), 'yandextank/stepper/tests/test-unicode.txt')},
+    {'ammo_type': 'caseline', 'chosen_cases': [b'test1'],
+     'ammo_file': os.path.join(get_test_path(), 'yandextank/stepper/tests/test-caseline.txt')},
+    {'uris': ['/', '/foo'], 'loop_limit': 7},
+    {'uris': ['/', '/foo'], 'ammo_limit': 50},
+])
+@pytest.mark.parametrize('starts', [[0, 1], [0, 13, 40], [0, 14, 15, 80, 200]])
+@pytest.mark.parametrize('compiled', [False, True])
+def test_write_parts(stepper_kwargs, starts, compiled, tmp_path):
+    kwargs = dict(rps_schedule=['line(1, 20, 9s)'], http_ver='1.1', instances=10, use_cache=False)
+    kwargs.update(stepper_kwargs)
+    whole = io.BytesIO()
+    Stepper(None, **kwargs).write(whole)
+    stepper_info = info.status.get_info()
+
+    positions = [None] * len(starts)
+    if compiled:
+        if 'uris' in kwargs:
+            pytest.skip('uris are not compiled')
+        # workers seek to the positions found in ammo compiled once
+        kwargs['ammo_cache_dir'] = str(tmp_path / 'cache')
+        positions = Stepper(None, **kwargs).af.positions(starts)
+        assert positions[0] == (0, 0)
+    parts = b''
+    for start, stop, position in zip(starts, starts[1:] + [None], positions):
+        if compiled and position is None:
+            # the stream has ended before, the part is not stepped
+            break
+        filename = str(tmp_path / 'part{}'.format(start))
+        ended, part_info = write_part(filename, start, stop, kwargs, position=position)
+        with open(filename, 'rb') as f:
+            parts += f.read()
+        if ended:
+            break
+    assert parts == whole.getvalue()
+    assert part_info == stepper_info
+
+
+@pytest.mark.parametrize('stepper_kwargs', [
+    {'ammo_file': os.path.join(get_test_path(), 'yandextank/stepper/tests/test-ammo.txt')},
+    {'ammo_type': 'uripost',
+     'ammo_file': os.path.join(get_test_path(), 'yandextank/stepper/tests/test-uripost.txt')},
+    {'ammo_type': 'uri', 'headers': ['Host: example.com'],
+     'ammo_file': os.path.join(get_test_path(), 'yandextank/stepper/tests/test-unicode.txt')},
+    {'ammo_type': 'caseline', 'chosen_cases': [b'test1'], 'loop_limit': 5,
+     'ammo_file': os.path.join(get_test_path(), 'yandextank/stepper/tests/test-caseline.txt')},
+])
+def test_compiled_ammo(stepper_kwargs, tmp_path):
+    kwargs = dict(rps_schedule=['line(1, 20, 9s)'], http_ver='1.1', instances=10, use_cache=False)
+    kwargs.update(stepper_kwargs)
+    whole = io.BytesIO()
+    Stepper(None, **kwargs).write(whole)
+    stepper_info = info.status.get_info()
+
+    # the first run compiles ammo, the next one reads the compiled one
+    for _ in range(2):
+        compiled = io.BytesIO()
+        Stepper(None, ammo_cache_dir=str(tmp_path), **kwargs).write(compiled)
+        assert compiled.getvalue() == whole.getvalue()
+        assert info.status.get_info() == stepper_info
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_compiled_uri_ammo_headers(tmp_path):
+    # a header applies to the missiles before it from the second loop on
+    ammo_file = tmp_path / 'ammo.txt'
+    ammo_file.write_bytes(b'/first\n[Host: example.com]\n/second case\n')
+    kwargs = dict(rps_schedule=['const(1, 5s)'], http_ver='1.1', instances=10, use_cache=False,
+                  ammo_type='uri', ammo_file=str(ammo_file))
+    whole = io.BytesIO()
+    Stepper(None, **kwargs).write(whole)
+    cache_dir = tmp_path / 'cache'
+    for _ in range(2):
+        compiled = io.BytesIO()
+        Stepper(None, ammo_cache_dir=str(cache_dir), **kwargs).write(compiled)
+        assert compiled.getvalue() == whole.getvalue()
+    assert whole.getvalue().count(b'Host: example.com') == 4
+
+
 @pytest.mark.parametrize('load_type, schedule, expected', [
     ('rps', 'const(10,10s)', ['const(10,10s)']),
     ('rps', 'line(1,12,30s)const(12,15m)line(12,10,15m)', ['line(1,12,30s)', 'const(12,15m)', 'line(12,10,15m)'])
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from yandextank.stepper.schedule import StepSchedule
+
+
+class TestStepSchedule(object):
+    def test_planned_offsets(self):
+        schedule = StepSchedule([(2, 2), (0, 1), (4, 1)])
+        assert schedule.planned_offsets(range(9)).tolist() == [0, 0.5, 1, 1.5, 3, 3.25, 3.5, 3.75, 4]
+
+    def test_on_schedule(self):
+        schedule = StepSchedule([(10, 3)])
+        send_ts = 100 + np.arange(30) / 10. + 0.0001
+        # rows come in the order of responses, not requests
+        delays = np.concatenate([schedule.send_delays(send_ts[:10][::-1]), schedule.send_delays(send_ts[10:])])
+        assert delays.max() <= 100
+
+    def test_behind_schedule(self):
+        schedule = StepSchedule([(10, 1)])
+        # the generator manages only 5 rps
+        send_ts = 100 + np.arange(10) / 5.
+        expected = (send_ts - (100 + np.arange(10) / 10.)) * 1e6
+        assert schedule.send_delays(send_ts) == pytest.approx(expected, abs=1)
+        # requests beyond the plan are late relative to its end
+        assert schedule.send_delays([102.5]) == pytest.approx([1.5e6], abs=1)
+
+    def test_late_start(self):
+        schedule = StepSchedule([(10, 3)])
+        # the generator took 5s to start, then kept up with the plan
+        send_ts = 105 + np.arange(30) / 10.
+        # rows come in the order of responses: every other request takes 0.15s
+        received = send_ts + np.where(np.arange(30) % 2, 0.15, 0.001)
+        order = np.argsort(received)
+        # rows are read every second
+        seconds = np.floor(received[order])
+        delays = np.concatenate([schedule.send_delays(send_ts[order][seconds == second])
+                                 for second in np.unique(seconds)])
+        assert delays.max() <= 100
+
+    def test_unknown_plan(self):
+        assert StepSchedule([]).send_delays([1., 2.]).tolist() == [0, 0]
+        assert StepSchedule([(10, 1)]).send_delays([]).tolist() == []
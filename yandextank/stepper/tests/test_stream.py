@@ -0,0 +1,43 @@
+import io
+import time
+
+from yandextank.stepper import StpdReader
+from yandextank.stepper.main import FINISHED, OPENED_AT, Stepper, StpdStream, pace
+
+STEPPER_KWARGS = dict(rps_schedule=['line(1, 50, 4s)'], http_ver='1.1', instances=10, use_cache=False,
+                      uris=['/', '/foo'], autocases=1)
+
+
+def test_stream(tmp_path):
+    stpd = io.BytesIO()
+    Stepper(None, **STEPPER_KWARGS).write(stpd)
+    fifo = str(tmp_path / 'ammo.stpd')
+    stream = StpdStream(fifo, STEPPER_KWARGS, max_lead=1, report_period=0.1)
+    stream.start()
+    try:
+        # a reader that does not read the whole stream does not take missiles from the next one
+        with open(fifo, 'rb') as f:
+            f.read(10)
+        started = time.time()
+        missiles = list(StpdReader(fifo))
+        assert time.time() - started > 2
+        with open(str(tmp_path / 'expected.stpd'), 'wb') as f:
+            f.write(stpd.getvalue())
+        assert missiles == list(StpdReader(str(tmp_path / 'expected.stpd')))
+        stream.process.join(5)
+        assert stream.finished()
+        assert stream.stats()['missiles'] == len(missiles)
+    finally:
+        stream.stop()
+    assert not (tmp_path / 'ammo.stpd').exists()
+
+
+def test_pace():
+    counters = [0, 0, 0, 0]
+    counters[OPENED_AT] = time.time()
+    missiles = [(0, '', b''), (400, '', b''), (1500, '', b''), (1600, '', b'')]
+    started = time.time()
+    assert list(pace(iter(missiles), counters, max_lead=1)) == missiles
+    # the missile of 1.5s is not made before 0.5s
+    assert 0.5 <= time.time() - started < 1
+    assert counters[FINISHED] == 0
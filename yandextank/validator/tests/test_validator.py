@@ -101,6 +101,20 @@ PHANTOM_SCHEMA_V_G = {
          'ignore_lock': False,
          'debug': False,
          'aggregator_max_termination_timeout': 60,
+         'aggregator_workers': 0,
+         'aggregator_max_tags': 0,
+         'aggregator_windows': [10, 60],
+         'aggregator_quantiles': [50, 75, 80, 85, 90, 95, 98, 99, 100],
+         'aggregator_tag_quantiles': {},
+         'aggregator_corrected_latency': False,
+         'aggregator_verbose_histogram': True,
+         'aggregator_listeners_queue': 0,
+         'aggregator_listeners_overflow': 'block',
+         'aggregator_allowed_lateness': 0,
+         'aggregator_late_data': 'drop',
+         'event_driven': True,
+         'plugins_poll_period': 0.5,
+         'aggregator_max_latency': 0.5,
          'aggregator_max_wait': 31,
          'skip_generator_check': False
      },
@@ -124,6 +138,8 @@ PHANTOM_SCHEMA_V_G = {
          'affinity': '',
          'enum_ammo': False,
          'phout_file': '',
+         'phout_tail': False,
+         'send_delay': False,
          'phantom_modules_path': '/usr/lib/phantom',
          'threads': None,
          'writelog': '0',
@@ -153,6 +169,10 @@ PHANTOM_SCHEMA_V_G = {
          'connection_test': True,
          'file_cache': 8192,
          'force_stepping': 0,
+         'stepping_workers': 0,
+         'stream_stpd': False,
+         'stream_max_lead': 10,
+         'compiled_ammo': False,
          'headers': [],
          'loop': -1,
          'port': '',
@@ -187,6 +207,8 @@ PHANTOM_SCHEMA_V_G = {
          'affinity': '',
          'enum_ammo': False,
          'phout_file': '',
+         'phout_tail': False,
+         'send_delay': False,
          'phantom_modules_path': '/usr/lib/phantom',
          'threads': None,
          'writelog': '0',
@@ -215,6 +237,10 @@ PHANTOM_SCHEMA_V_G = {
          'connection_test': True,
          'file_cache': 8192,
          'force_stepping': 0,
+         'stepping_workers': 0,
+         'stream_stpd': False,
+         'stream_max_lead': 10,
+         'compiled_ammo': False,
          'headers': [],
          'port': '',
          'use_caching': True,
@@ -228,6 +254,20 @@ PHANTOM_SCHEMA_V_G = {
           'ignore_lock': False,
           'debug': False,
           'aggregator_max_termination_timeout': 60,
+          'aggregator_workers': 0,
+          'aggregator_max_tags': 0,
+          'aggregator_windows': [10, 60],
+          'aggregator_quantiles': [50, 75, 80, 85, 90, 95, 98, 99, 100],
+          'aggregator_tag_quantiles': {},
+          'aggregator_corrected_latency': False,
+          'aggregator_verbose_histogram': True,
+          'aggregator_listeners_queue': 0,
+          'aggregator_listeners_overflow': 'block',
+          'aggregator_allowed_lateness': 0,
+          'aggregator_late_data': 'drop',
+          'event_driven': True,
+          'plugins_poll_period': 0.5,
+          'aggregator_max_latency': 0.5,
           'aggregator_max_wait': 31,
           'skip_generator_check': False}}
      )
@@ -258,6 +298,8 @@ def test_validate_core(config, expected):
          'affinity': '',
          'enum_ammo': False,
          'phout_file': '',
+         'phout_tail': False,
+         'send_delay': False,
          'config': '',
          'gatling_ip': '',
          'instances': 1000,
@@ -392,6 +434,20 @@ def test_load_multiple(configs, expected):
                 'ignore_lock': False,
                 'debug': False,
                 'aggregator_max_termination_timeout': 60,
+                'aggregator_workers': 0,
+                'aggregator_max_tags': 0,
+                'aggregator_windows': [10, 60],
+                'aggregator_quantiles': [50, 75, 80, 85, 90, 95, 98, 99, 100],
+                'aggregator_tag_quantiles': {},
+                'aggregator_corrected_latency': False,
+                'aggregator_verbose_histogram': True,
+                'aggregator_listeners_queue': 0,
+                'aggregator_listeners_overflow': 'block',
+                'aggregator_allowed_lateness': 0,
+                'aggregator_late_data': 'drop',
+                'event_driven': True,
+                'plugins_poll_period': 0.5,
+                'aggregator_max_latency': 0.5,
                 'aggregator_max_wait': 31,
                 'skip_generator_check': False,
             },
@@ -415,6 +471,8 @@ def test_load_multiple(configs, expected):
                 'affinity': '',
                 'enum_ammo': False,
                 'phout_file': '',
+                'phout_tail': False,
+                'send_delay': False,
                 'phantom_modules_path': '/usr/lib/phantom',
                 'threads': None,
                 'writelog': '0',
@@ -444,6 +502,10 @@ def test_load_multiple(configs, expected):
                 'connection_test': True,
                 'file_cache': 8192,
                 'force_stepping': 0,
+                'stepping_workers': 0,
+                'stream_stpd': False,
+                'stream_max_lead': 10,
+                'compiled_ammo': False,
                 'headers': [],
                 'loop': -1,
                 'port': '',